@@ -1,16 +1,22 @@
+import base64
 import configparser
+import json
 import logging
 import os
+import threading
+import time
 from configparser import ConfigParser
 from functools import partial, wraps
-
-import component_registry_bindings
-import osidb_bindings
-from osidb_bindings.bindings.python_client.models import Affect, Flaw, Tracker
-from pkg_resources import resource_filename  # type: ignore
-from rich.logging import RichHandler
-
-from griffon.output import console
+from importlib.resources import files
+from urllib.parse import urlparse
+
+from griffon.cache import (
+    CACHE_TTLS,
+    DEFAULT_CACHE_MAX_SIZE,
+    CachedSession,
+    configure_cache,
+)
+from griffon.timings import install_requests_hook, timings
 
 __version__ = "0.2.7"
 
@@ -41,14 +47,25 @@ GRIFFON_DEFAULT_LOG_FILE = os.getenv("GRIFFON_DEFAULT_LOG_FILE", "~/.griffon/his
 
 logger = logging.getLogger("griffon")
 
-RELATED_MODELS_MAPPING = {Flaw: {"affects": Affect}, Affect: {"trackers": Tracker}}
+# heavy modules (bindings, requests, rich) are imported on first use, keeping cli startup fast
+
+
+def get_related_models(model):
+    """related models of a bindings model, keyed by field name"""
+    from osidb_bindings.bindings.python_client.models import Affect, Flaw, Tracker
+
+    return {Flaw: {"affects": Affect}, Affect: {"trackers": Tracker}}.get(model, {})
 
 
 def config_logging(level="INFO"):
+    from rich.logging import RichHandler
+
     message_format = "%(asctime)s %(name)s %(levelname)s %(message)s"
     logging.basicConfig(
         level=level, format=message_format, datefmt="[%X]", handlers=[RichHandler()]
     )
+    # basicConfig only configures once, commands run by the daemon set their own level
+    logging.getLogger().setLevel(level)
     # file_handler = logging.FileHandler(os.path.expanduser(GRIFFON_DEFAULT_LOG_FILE))
     # file_handler.setFormatter(formatter)
     # logger.addHandler(file_handler)
@@ -57,7 +74,7 @@ def config_logging(level="INFO"):
 def get_config():
     """read ~/.griffonrc ini file, if it does not exist then return some default config"""
     if not os.path.exists(os.path.expanduser(GRIFFON_RC_FILE)):
-        default_griffonrc = resource_filename(__name__, "static/default_griffonrc")
+        default_griffonrc = files(__name__).joinpath("static/default_griffonrc")
         config = configparser.ConfigParser(allow_no_value=True)
         config.read(default_griffonrc)
         return config
@@ -81,6 +98,118 @@ def list_config_sections():
     return griffon_config.sections()
 
 
+# parallel requests of a single fan-out
+GRIFFON_MAX_WORKERS = int(
+    os.getenv("GRIFFON_MAX_WORKERS", get_config_option("default", "max_workers", 8))
+)
+# concurrent requests to a single upstream host, across all fan-outs of the process, also the
+# size of the per host http connection pool so requests within the limit never wait for it
+GRIFFON_MAX_PER_HOST = int(
+    os.getenv(
+        "GRIFFON_MAX_PER_HOST", get_config_option("default", "max_per_host", GRIFFON_MAX_WORKERS)
+    )
+)
+HTTP_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.5
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def create_http_session(pool_size=GRIFFON_MAX_PER_HOST):
+    """requests session with keep-alive connection pool, gzip and retry with backoff"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+def get_http_session():
+    """process wide pooled http session used by all direct (non bindings) requests"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        if timings.enabled:
+            install_requests_hook(_http_session)
+        return _http_session
+
+
+class HostLimiter:
+    """
+    process wide limit of concurrent requests per upstream host
+
+    Shared by the worker threads of all fan-outs (paginators, query engine). Slots are
+    only held for the duration of a single request, so nested fan-outs can not deadlock.
+    """
+
+    def __init__(self, limit=GRIFFON_MAX_PER_HOST):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    def limit_for(self, url):
+        """semaphore (context manager) guarding requests to the host of url"""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.limit)
+            return self._slots[host]
+
+
+host_limits = HostLimiter()
+
+
+def setup_cache(no_cache=False, refresh=False):
+    """configure response cache from cli options and [default] cache_* options"""
+    enabled = not no_cache and get_config_option("default", "cache", "true").lower() != "false"
+    ttls = {}
+    for entity in CACHE_TTLS:
+        ttl = get_config_option("default", f"cache_ttl_{entity}")
+        if ttl:
+            ttls[entity] = int(ttl)
+    configure_cache(
+        enabled=enabled,
+        refresh=refresh,
+        path=os.path.join(GRIFFON_CONFIG_DIR, "cache.db"),
+        max_size=int(get_config_option("default", "cache_max_size", DEFAULT_CACHE_MAX_SIZE)),
+        ttls=ttls,
+    )
+
+
+class SessionRegistry:
+    """service sessions built lazily once per process, shared by queries and worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def get(self, name, factory):
+        with self._lock:
+            if name not in self._sessions:
+                self._sessions[name] = factory()
+            return self._sessions[name]
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+service_sessions = SessionRegistry()
+
+
 class CorgiService:
     name = "component-registry"
     description = "Red Hat component registry"
@@ -88,18 +217,32 @@ class CorgiService:
 
     @staticmethod
     def create_session():
+        """shared corgi session"""
+        return service_sessions.get(CorgiService.name, CorgiService.new_session)
+
+    @staticmethod
+    def new_session():
         """init corgi session"""
+        import component_registry_bindings
+
         try:
-            return component_registry_bindings.new_session(
-                component_registry_server_uri=CORGI_API_URL
+            return CachedSession(
+                component_registry_bindings.new_session(
+                    component_registry_server_uri=CORGI_API_URL
+                ),
+                CORGI_API_URL,
             )
         except:  # noqa
+            from griffon.output import console
+
             console.log(f"{CORGI_API_URL} is not accessible.")
             exit(1)
 
     @staticmethod
     def get_component_types():
         """get component type enum"""
+        import component_registry_bindings
+
         return (
             component_registry_bindings.bindings.python_client.models.component_type_enum.ComponentTypeEnum  # noqa
         )
@@ -107,6 +250,8 @@ class CorgiService:
     @staticmethod
     def get_component_namespaces():
         """get component namespaces enum"""
+        import component_registry_bindings
+
         return (
             component_registry_bindings.bindings.python_client.models.namespace_enum.NamespaceEnum
         )
@@ -139,12 +284,86 @@ class CorgiService:
 
         # get rid of the self attribute
         fields = [f"{prefix}{field}" for field in model.get_fields().keys()]
-        for name, related_model in RELATED_MODELS_MAPPING.get(model, {}).items():
+        for name, related_model in get_related_models(model).items():
             fields.extend(CorgiService.get_fields(related_model, prefix=f"{prefix}{name}."))
 
         return fields
 
 
+class OSIDBAccessToken:
+    """
+    osidb access token shared by all operations of a session
+
+    The bindings request a new access token for every single operation, instead the
+    token is kept and refreshed by the first operation after it (nearly) expired.
+    """
+
+    # seconds before expiry to refresh the token
+    REFRESH_MARGIN = 30
+    # assumed lifetime of a token which does not carry its expiry
+    DEFAULT_LIFETIME = 300
+    # private token handling of the bindings (osidb-bindings 3.x) used by refresh()
+    PRIVATE_ATTRIBUTES = ("_Session__get_access_token", "_Session__client")
+
+    def __init__(self, session):
+        self.session = session
+        self._lock = threading.Lock()
+        self._client = None
+        # time.monotonic() after which the token is refreshed
+        self._refresh_at = 0.0
+
+    @staticmethod
+    def lifetime(token):
+        """seconds until (jwt) token expires"""
+        try:
+            payload = token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+            return claims["exp"] - time.time()
+        except (IndexError, KeyError, ValueError):
+            return OSIDBAccessToken.DEFAULT_LIFETIME
+
+    def refresh(self):
+        # the bindings keep token handling private
+        token = self.session._Session__get_access_token()
+        self._client = self.session._Session__client.with_headers(
+            {"Authorization": f"Bearer {token}"}
+        )
+        self._refresh_at = time.monotonic() + self.lifetime(token) - self.REFRESH_MARGIN
+        return self._client
+
+    def client(self):
+        # concurrent first operations wait for a single token request
+        with self._lock:
+            if self._client is None or time.monotonic() >= self._refresh_at:
+                return self.refresh()
+            return self._client
+
+    def supported(self):
+        """whether the bindings still have the private token handling refresh() relies on"""
+        if not all(hasattr(self.session, name) for name in self.PRIVATE_ATTRIBUTES):
+            return False
+        return hasattr(self.session._Session__client, "with_headers")
+
+    def install(self):
+        """make all operation groups of the session use this token"""
+        if not self.supported():
+            from importlib.metadata import PackageNotFoundError, version
+
+            try:
+                bindings_version = version("osidb-bindings")
+            except PackageNotFoundError:
+                bindings_version = "unknown"
+            logger.warning(
+                f"osidb-bindings {bindings_version} token handling is not supported, "
+                "requesting an access token for every osidb operation"
+            )
+            return self
+        for group in vars(self.session).values():
+            if hasattr(group, "resource_name") and callable(getattr(group, "client", None)):
+                group.client = self.client
+        return self
+
+
 class OSIDBService:
     name = "osidb"
     description = "Open Source Incident database"
@@ -152,25 +371,40 @@ class OSIDBService:
 
     @staticmethod
     def create_session():
+        """shared osidb session"""
+        return service_sessions.get(OSIDBService.name, OSIDBService.new_session)
+
+    @staticmethod
+    def new_session():
         """init osidb session"""
+        import osidb_bindings
+
         try:
             credentials = {}
             if OSIDB_AUTH_METHOD == "credentials":
                 credentials["username"] = OSIDB_USERNAME
                 credentials["password"] = OSIDB_PASSWORD
-            return osidb_bindings.new_session(osidb_server_uri=OSIDB_API_URL, **credentials)
+            session = osidb_bindings.new_session(osidb_server_uri=OSIDB_API_URL, **credentials)
+            OSIDBAccessToken(session).install()
+            return CachedSession(session, OSIDB_API_URL)
         except:  # noqa
+            from griffon.output import console
+
             console.log(f"{OSIDB_API_URL} is not accessible (or krb ticket has expired).")
             exit(1)
 
     @staticmethod
     def get_flaw_states():
         """get flaw states enum"""
+        import osidb_bindings
+
         return osidb_bindings.bindings.python_client.models.FlawClassificationState
 
     @staticmethod
     def get_flaw_resolutions():
         """get flaw resolution enum"""
+        import osidb_bindings
+
         # TODO: FlawResolutionEnum changed to Resolution01FEnum in OSIDB schema
         # due to some weird drf-spectacular naming clash resolution, there is
         # a way ho to set this to a immutable name however this would require
@@ -183,16 +417,22 @@ class OSIDBService:
     @staticmethod
     def get_flaw_impacts():
         """get flaw impacts enum"""
+        import osidb_bindings
+
         return osidb_bindings.bindings.python_client.models.ImpactEnum
 
     @staticmethod
     def get_affect_affectedness():
         """get affect affectedness enum"""
+        import osidb_bindings
+
         return osidb_bindings.bindings.python_client.models.AffectednessEnum
 
     @staticmethod
     def get_affect_resolution():
         """get affect affectedness enum"""
+        import osidb_bindings
+
         # TODO: AffectResolutionEnum changed to Resolution3AcEnum in OSIDB schema
         # due to some weird drf-spectacular naming clash resolution, there is
         # a way ho to set this to a immutable name however this would require
@@ -205,11 +445,15 @@ class OSIDBService:
     @staticmethod
     def get_affect_impact():
         """get affect impact enum"""
+        import osidb_bindings
+
         return osidb_bindings.bindings.python_client.models.ImpactEnum
 
     @staticmethod
     def get_flaw_meta_type():
         """get flaw meta type enum"""
+        import osidb_bindings
+
         return osidb_bindings.bindings.python_client.models.MetaTypeEnum
 
     @staticmethod
@@ -223,7 +467,7 @@ class OSIDBService:
 
         # get rid of the self attribute
         fields = [f"{prefix}{field}" for field in model.get_fields().keys()]
-        for name, related_model in RELATED_MODELS_MAPPING.get(model, {}).items():
+        for name, related_model in get_related_models(model).items():
             fields.extend(OSIDBService.get_fields(related_model, prefix=f"{prefix}{name}."))
 
         return fields
@@ -242,7 +486,7 @@ class OSIDBService:
 
         # get rid of the self attribute and add additional wildcard
         fields = [f"{prefix}{field}" for field in model_meta_attr.get_fields().keys() | {"*"}]
-        for name, related_model in RELATED_MODELS_MAPPING.get(model, {}).items():
+        for name, related_model in get_related_models(model).items():
             fields.extend(
                 OSIDBService.get_meta_attr_fields(related_model, prefix=f"{prefix}{name}.")
             )
@@ -257,18 +501,34 @@ class CommunityComponentService:
 
     @staticmethod
     def create_session():
-        """init corgi session"""
+        """shared community component registry session"""
+        return service_sessions.get(
+            CommunityComponentService.name, CommunityComponentService.new_session
+        )
+
+    @staticmethod
+    def new_session():
+        """init community component registry session"""
+        import component_registry_bindings
+
         try:
-            return component_registry_bindings.new_session(
-                component_registry_server_uri=COMMUNITY_COMPONENTS_API_URL
+            return CachedSession(
+                component_registry_bindings.new_session(
+                    component_registry_server_uri=COMMUNITY_COMPONENTS_API_URL
+                ),
+                COMMUNITY_COMPONENTS_API_URL,
             )
         except:  # noqa
+            from griffon.output import console
+
             console.log(f"{COMMUNITY_COMPONENTS_API_URL} is not accessible.")
             exit(1)
 
     @staticmethod
     def get_component_types():
         """get component type enum"""
+        import component_registry_bindings
+
         return (
             component_registry_bindings.bindings.python_client.models.component_type_enum.ComponentTypeEnum  # noqa
         )
@@ -276,6 +536,8 @@ class CommunityComponentService:
     @staticmethod
     def get_component_namespaces():
         """get component namespaces enum"""
+        import component_registry_bindings
+
         return (
             component_registry_bindings.bindings.python_client.models.namespace_enum.NamespaceEnum
         )
@@ -308,7 +570,7 @@ class CommunityComponentService:
 
         # get rid of the self attribute
         fields = [f"{prefix}{field}" for field in model.get_fields().keys()]
-        for name, related_model in RELATED_MODELS_MAPPING.get(model, {}).items():
+        for name, related_model in get_related_models(model).items():
             fields.extend(CorgiService.get_fields(related_model, prefix=f"{prefix}{name}."))
 
         return fields
@@ -327,6 +589,8 @@ def progress_bar(
         if obj.get("NO_PROGRESS_BAR"):
             func(*args, **kwargs)
         else:
+            from griffon.output import console
+
             with console.status("griffoning", spinner="line"):
                 func(*args, **kwargs)
 
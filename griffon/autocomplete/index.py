@@ -0,0 +1,264 @@
+"""
+    local prefix index for shell completion
+
+    Each kind of value (component names, purls, ...) is kept as a sorted, newline
+    separated file under ~/.griffon/index, lookups bisect the memory mapped file.
+
+    Only osidb flaws can be synced incrementally (changed_after, cut off at the start
+    of the last successful sync of the source kept in meta.json). The component
+    registry list endpoints for components, product streams and product versions have
+    no filter on last change, so those sources are fetched fully on every refresh.
+
+"""
+import bisect
+import json
+import logging
+import mmap
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from griffon import (
+    CORGI_API_URL,
+    GRIFFON_CONFIG_DIR,
+    OSIDB_API_URL,
+    get_config_option,
+    get_http_session,
+)
+from griffon.services.pagination import Paginator
+
+logger = logging.getLogger("griffon")
+
+INDEX_DIR = os.path.join(GRIFFON_CONFIG_DIR, "index")
+# seconds after which completion triggers a background refresh
+INDEX_MAX_AGE = int(get_config_option("default", "index_max_age", 24 * 3600))
+# a refresh holding the lock longer than this is considered dead
+INDEX_LOCK_TIMEOUT = 3600
+
+# source: (list url, params, {kind: field}, incremental change filter), None when the
+# endpoint cannot filter by last change (component registry lists)
+INDEX_SOURCES: Dict[str, Tuple[str, Dict[str, str], Dict[str, str], Optional[str]]] = {
+    "product_streams": (
+        f"{CORGI_API_URL}/api/v1/product_streams",
+        {"include_fields": "name,ofuri"},
+        {"product_stream_names": "name", "product_stream_ofuris": "ofuri"},
+        None,
+    ),
+    "product_versions": (
+        f"{CORGI_API_URL}/api/v1/product_versions",
+        {"include_fields": "name,ofuri"},
+        {"product_version_names": "name", "product_version_ofuris": "ofuri"},
+        None,
+    ),
+    "components": (
+        f"{CORGI_API_URL}/api/v1/components",
+        {"latest_components": "True", "include_fields": "name,purl"},
+        {"component_names": "name", "component_purls": "purl"},
+        None,
+    ),
+    "flaws": (
+        f"{OSIDB_API_URL}/osidb/api/v1/flaws",
+        {"include_fields": "cve_id"},
+        {"cve_ids": "cve_id"},
+        "changed_after",
+    ),
+}
+
+# kinds the index holds only part of (purls of latest components), values missing from
+# the index are completed by the live lookup
+PARTIAL_KINDS = {"component_purls"}
+
+
+class CompletionIndex:
+    """sorted prefix index files, one per kind"""
+
+    def __init__(self, directory: str = INDEX_DIR, keep_in_memory: bool = False) -> None:
+        self.directory = os.path.expanduser(directory)
+        # long running processes (griffon serve) keep index files loaded, reloading them
+        # once they change on disk
+        self.keep_in_memory = keep_in_memory
+        self._loaded: Dict[str, Tuple[float, List[str]]] = {}
+
+    def path(self, kind: str) -> str:
+        return os.path.join(self.directory, f"{kind}.idx")
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def meta(self) -> Dict[str, float]:
+        """source -> timestamp of its last successful sync"""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_meta(self, meta: Dict[str, float]) -> None:
+        self._write_atomic(self.meta_path, json.dumps(meta).encode())
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def search(self, kind: str, prefix: str, limit: int = 100) -> Optional[List[str]]:
+        """values starting with prefix, None if kind is not indexed yet"""
+        if self.keep_in_memory:
+            return self.search_loaded(kind, prefix, limit)
+        try:
+            f = open(self.path(kind), "rb")
+        except OSError:
+            return None
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                key = prefix.encode()
+                # bisect for the start of the first line >= key
+                lo, hi = 0, len(data)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    start = data.rfind(b"\n", 0, mid) + 1
+                    end = data.find(b"\n", start)
+                    if end == -1:
+                        end = len(data)
+                    if data[start:end] < key:
+                        lo = end + 1
+                    else:
+                        hi = start
+                results: List[str] = []
+                while lo < len(data) and len(results) < limit:
+                    end = data.find(b"\n", lo)
+                    if end == -1:
+                        end = len(data)
+                    line = data[lo:end]
+                    if not line.startswith(key):
+                        break
+                    results.append(line.decode())
+                    lo = end + 1
+                return results
+
+    def search_loaded(self, kind: str, prefix: str, limit: int = 100) -> Optional[List[str]]:
+        try:
+            mtime = os.path.getmtime(self.path(kind))
+        except OSError:
+            return None
+        if kind not in self._loaded or self._loaded[kind][0] != mtime:
+            self._loaded[kind] = (mtime, self.values(kind))
+        values = self._loaded[kind][1]
+        results: List[str] = []
+        for value in values[bisect.bisect_left(values, prefix) :]:
+            if not value.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(value)
+        return results
+
+    def values(self, kind: str) -> List[str]:
+        try:
+            with open(self.path(kind), encoding="utf-8") as f:
+                return f.read().splitlines()
+        except OSError:
+            return []
+
+    def write(self, kind: str, values: Iterable[str]) -> int:
+        """store values (sorted, deduplicated) of kind"""
+        lines = sorted({value for value in values if value and "\n" not in value})
+        self._write_atomic(self.path(kind), "\n".join(lines).encode())
+        return len(lines)
+
+    def is_stale(self) -> bool:
+        meta = self.meta()
+        if not meta:
+            return True
+        return time.time() - min(meta.values()) > INDEX_MAX_AGE
+
+
+completion_index = CompletionIndex()
+
+
+def _list(url: str, **params) -> dict:
+    response = get_http_session().get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def refresh_index(index: CompletionIndex = completion_index) -> Dict[str, int]:
+    """sync all index sources, sources with a change filter only fetch changes"""
+    meta = index.meta()
+    counts = {}
+    for source, (url, params, kinds, change_filter) in INDEX_SOURCES.items():
+        started = time.time()
+        params = dict(params)
+        incremental = False
+        if change_filter is not None and source in meta:
+            incremental = True
+            params[change_filter] = datetime.fromtimestamp(meta[source], timezone.utc).isoformat()
+        try:
+            rows = Paginator(lambda **kwargs: _list(url, **kwargs), params, endpoint=url).results()
+        except Exception as exc:
+            logger.warning(f"could not refresh {source} completion index: {exc}")
+            continue
+        for kind, field in kinds.items():
+            values = [row.get(field) for row in rows]
+            if incremental:
+                values.extend(index.values(kind))
+            counts[kind] = index.write(kind, values)
+        meta[source] = started
+        index.save_meta(meta)
+    return counts
+
+
+def _lock_path(index: CompletionIndex) -> str:
+    return os.path.join(index.directory, "refresh.lock")
+
+
+def refresh_in_background(index: CompletionIndex = completion_index) -> bool:
+    """start detached refresh unless one is already running"""
+    lock_path = _lock_path(index)
+    os.makedirs(index.directory, exist_ok=True)
+    try:
+        if time.time() - os.path.getmtime(lock_path) > INDEX_LOCK_TIMEOUT:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return False
+    subprocess.Popen(
+        [sys.executable, "-m", "griffon.autocomplete.index"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
+def complete(kind: str, incomplete: str) -> Optional[List[str]]:
+    """
+    completions from the local index, None when kind is not indexed or (for partially
+    indexed kinds) has no match, callers then fall back to the live lookup
+    """
+    results = completion_index.search(kind, incomplete)
+    if results is not None and completion_index.is_stale():
+        refresh_in_background()
+    if not results and kind in PARTIAL_KINDS:
+        return None
+    return results
+
+
+if __name__ == "__main__":
+    try:
+        refresh_index()
+    finally:
+        try:
+            os.remove(_lock_path(completion_index))
+        except OSError:
+            pass
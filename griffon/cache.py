@@ -0,0 +1,450 @@
+"""
+    persistent cache of service responses
+
+"""
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, List, Optional
+from urllib.parse import urlparse
+
+from griffon.timings import service_stage, timings
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger("griffon")
+
+DEFAULT_CACHE_FILE = "~/.griffon/cache.db"
+DEFAULT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHE_TTL = 3600
+
+# seconds a cached response stays fresh, per entity
+CACHE_TTLS = {
+    "components": 6 * 3600,
+    "builds": 24 * 3600,
+    "channels": 24 * 3600,
+    "products": 24 * 3600,
+    "product_versions": 24 * 3600,
+    "product_streams": 24 * 3600,
+    "product_variants": 24 * 3600,
+    "manifest": 24 * 3600,
+    "flaws": 15 * 60,
+    "affects": 15 * 60,
+    "trackers": 15 * 60,
+}
+
+
+def normalise_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """drop unset params and make values comparable"""
+    normalised = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = [str(v) for v in value]
+        normalised[name] = value
+    return normalised
+
+
+def entity_from_url(url: str) -> str:
+    """guess cached entity from a service url, eg. .../api/v1/components/<uuid> -> components"""
+    for segment in reversed(urlparse(url).path.strip("/").split("/")):
+        if segment in CACHE_TTLS:
+            return segment
+    return "default"
+
+
+class ResponseCache:
+    """
+    sqlite backed response cache
+
+    Entries are keyed by endpoint and normalised params, expire after a per entity ttl
+    and least recently used entries are evicted once max_size (bytes) is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_FILE,
+        max_size: int = DEFAULT_CACHE_MAX_SIZE,
+        ttls: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.ttls = {**CACHE_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._size = 0
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # responses may hold embargoed flaw data, only the owner may read them, sqlite
+            # creates the wal files with the permissions of the database
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+            os.chmod(self.path, 0o600)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, entity TEXT, "
+                "created REAL, accessed REAL, size INTEGER, body BLOB)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            self._size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def ttl(self, entity: str) -> int:
+        return self.ttls.get(entity, DEFAULT_CACHE_TTL)
+
+    @staticmethod
+    def key(endpoint: str, params: Dict[str, Any]) -> str:
+        normalised = json.dumps(normalise_params(params), sort_keys=True, default=str)
+        return hashlib.sha256(f"{endpoint}?{normalised}".encode()).hexdigest()
+
+    def get(self, endpoint: str, params: Dict[str, Any], entity: str) -> Optional[bytes]:
+        """return cached body or None if missing or expired"""
+        key = self.key(endpoint, params)
+        try:
+            with self._lock:
+                connection = self.connection()
+                row = connection.execute(
+                    "SELECT created, body FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                created, body = row
+                if time.time() - created > self.ttl(entity):
+                    self._delete(key)
+                    return None
+                connection.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+                )
+            logger.debug(f"cache hit {endpoint} {params}")
+            return zlib.decompress(body)
+        except (sqlite3.Error, zlib.error) as exc:
+            logger.debug(f"cache read failed: {exc}")
+            return None
+
+    def set(self, endpoint: str, params: Dict[str, Any], entity: str, body: bytes) -> None:
+        """store body, evicting least recently used entries when over max_size"""
+        key = self.key(endpoint, params)
+        compressed = zlib.compress(body)
+        if len(compressed) > self.max_size:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self.connection()
+                self._delete(key)
+                connection.execute(
+                    "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, entity, now, now, len(compressed), compressed),
+                )
+                self._size += len(compressed)
+                self.evict()
+        except sqlite3.Error as exc:
+            logger.debug(f"cache write failed: {exc}")
+
+    def delete(self, endpoint: str, params: Dict[str, Any]) -> None:
+        try:
+            with self._lock:
+                self._delete(self.key(endpoint, params))
+        except sqlite3.Error as exc:
+            logger.debug(f"cache delete failed: {exc}")
+
+    def _delete(self, key: str) -> None:
+        connection = self.connection()
+        row = connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def evict(self) -> None:
+        if self._size <= self.max_size:
+            return
+        connection = self.connection()
+        evicted = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall():
+            if self._size <= self.max_size:
+                break
+            evicted.append((key,))
+            self._size -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.debug(f"evicted {len(evicted)} cached responses")
+
+    def clear(self) -> None:
+        with self._lock:
+            self.connection().execute("DELETE FROM responses")
+            self._size = 0
+
+    def get_json(self, endpoint: str, params: Dict[str, Any], entity: str) -> Any:
+        body = self.get(endpoint, params, entity)
+        if body is None:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError as exc:
+            logger.debug(f"cache entry of {endpoint} is not json: {exc}")
+            return None
+
+    def set_json(self, endpoint: str, params: Dict[str, Any], entity: str, value: Any) -> None:
+        self.set(endpoint, params, entity, json.dumps(value, default=str).encode())
+
+
+class CacheSettings:
+    """process wide cache settings, set once from cli options"""
+
+    enabled = True
+    # ignore cached responses, but still store fresh ones
+    refresh = False
+    cache: Optional[ResponseCache] = None
+
+
+def configure_cache(
+    enabled: bool = True,
+    refresh: bool = False,
+    path: str = DEFAULT_CACHE_FILE,
+    max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    ttls: Optional[Dict[str, int]] = None,
+) -> None:
+    CacheSettings.enabled = enabled
+    CacheSettings.refresh = refresh
+    cache = CacheSettings.cache
+    # keep an open cache across commands of a long running process (griffon serve)
+    if cache is None or (cache.path, cache.max_size) != (os.path.expanduser(path), max_size):
+        CacheSettings.cache = ResponseCache(path, max_size, ttls)
+    else:
+        cache.ttls = {**CACHE_TTLS, **(ttls or {})}
+
+
+def response_cache() -> Optional[ResponseCache]:
+    """active response cache, None when caching is disabled"""
+    if not CacheSettings.enabled:
+        return None
+    if CacheSettings.cache is None:
+        CacheSettings.cache = ResponseCache()
+    return CacheSettings.cache
+
+
+@lru_cache(maxsize=None)
+def _package_version(module: str) -> str:
+    """installed version of the distribution (eg. osidb-bindings) of a top level module"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version(module.replace("_", "-"))
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def _model_path(model: type) -> str:
+    # entries carry the bindings version, models of other versions may not decode
+    package_version = _package_version(model.__module__.split(".")[0])
+    return f"{model.__module__}:{model.__qualname__}@{package_version}"
+
+
+def encode_value(value: Any) -> Optional[dict]:
+    """json serialisable form of a bindings model (or raw json) response"""
+    if value is None:
+        return None
+    if hasattr(value, "to_dict"):
+        return {"model": _model_path(type(value)), "data": value.to_dict()}
+    return {"model": None, "data": value}
+
+
+def _model_class(path: Optional[str]):
+    if path is None:
+        return None
+    path, _, package_version = path.partition("@")
+    module, name = path.split(":")
+    if package_version != _package_version(module.split(".")[0]):
+        raise ValueError(f"cached {name} was written by {module} {package_version or 'unknown'}")
+    return getattr(importlib.import_module(module), name)
+
+
+def decode_value(entry: dict) -> Any:
+    model = _model_class(entry["model"])
+    if model is None:
+        return entry["data"]
+    return model.from_dict(entry["data"])
+
+
+def encode_rows(rows: List[Any]) -> dict:
+    model = type(rows[0]) if rows and hasattr(rows[0], "to_dict") else None
+    return {
+        "model": _model_path(model) if model else None,
+        "rows": [row.to_dict() for row in rows] if model else rows,
+    }
+
+
+def decode_rows(entry: dict) -> List[Any]:
+    model = _model_class(entry["model"])
+    if model is None:
+        return entry["rows"]
+    return [model.from_dict(row) for row in entry["rows"]]
+
+
+class CachedCall:
+    """
+    Read operation served from the response cache.
+
+    Call arguments together with endpoint make up the cache key. Paginator stores whole
+    result sets through lookup_all/store_all instead of caching single pages, page
+    sizes are adaptive so page boundaries differ between runs.
+
+    Calls of bindings operations are timed as a whole (see timed), bindings do not
+    send their requests through the pooled session whose response hook times them.
+    """
+
+    def __init__(self, call: Callable, endpoint: str, entity: str, bindings: bool = False) -> None:
+        self.call = call
+        self.endpoint = endpoint
+        self.entity = entity
+        self.bindings = bindings
+
+    def __call__(self, *args, **kwargs):
+        cache = response_cache()
+        if cache is None:
+            return self.request(*args, **kwargs)
+        params = {"args": list(args), **kwargs}
+        if not CacheSettings.refresh:
+            entry = cache.get_json(self.endpoint, params, self.entity)
+            if entry is not None:
+                try:
+                    value = decode_value(entry)
+                except Exception as exc:
+                    # eg. written by other bindings versions, refetch it
+                    logger.debug(f"dropping cached {self.endpoint} {params}: {exc}")
+                    cache.delete(self.endpoint, params)
+                else:
+                    timings.count(service_stage(self.endpoint), "cache_hits")
+                    return value
+        value = self.request(*args, **kwargs)
+        entry = encode_value(value)
+        if entry is not None:
+            cache.set_json(self.endpoint, params, self.entity, entry)
+        return value
+
+    def request(self, *args, **kwargs):
+        """call the operation, within the request limit of its host"""
+        from griffon import host_limits
+
+        with host_limits.limit_for(self.endpoint), self.timed():
+            return self.call(*args, **kwargs)
+
+    def timed(self) -> ContextManager[None]:
+        """record a call against the service of endpoint, unless it is timed by the session"""
+        if not self.bindings:
+            return nullcontext()
+        return timings.timed(service_stage(self.endpoint))
+
+    def lookup_all(self, params: Dict[str, Any]) -> Optional[List[Any]]:
+        cache = response_cache()
+        if cache is None or CacheSettings.refresh:
+            return None
+        entry = cache.get_json(f"{self.endpoint}#all", params, self.entity)
+        if entry is None:
+            return None
+        try:
+            rows = decode_rows(entry)
+        except Exception as exc:
+            logger.debug(f"dropping cached {self.endpoint} {params}: {exc}")
+            cache.delete(f"{self.endpoint}#all", params)
+            return None
+        timings.count(service_stage(self.endpoint), "cache_hits")
+        return rows
+
+    def store_all(self, params: Dict[str, Any], rows: List[Any]) -> None:
+        cache = response_cache()
+        if cache is not None:
+            cache.set_json(f"{self.endpoint}#all", params, self.entity, encode_rows(rows))
+
+
+class CachedOperationsGroup:
+    """bindings operations group (eg. session.components) with cached read operations"""
+
+    READ_OPERATIONS = ("retrieve", "retrieve_list", "retrieve_manifest")
+
+    def __init__(self, group, endpoint: str, entity: str) -> None:
+        self._group = group
+        for operation in self.READ_OPERATIONS:
+            if hasattr(group, operation):
+                call = CachedCall(
+                    getattr(group, operation),
+                    f"{endpoint}:{operation}",
+                    "manifest" if operation == "retrieve_manifest" else entity,
+                    bindings=True,
+                )
+                setattr(self, operation, call)
+
+    def __getattr__(self, name):
+        return getattr(self._group, name)
+
+
+class CachedSession:
+    """bindings session serving read operations from the response cache"""
+
+    def __init__(self, session, endpoint: str) -> None:
+        self._session = session
+        self._endpoint = endpoint
+        self._groups: Dict[str, CachedOperationsGroup] = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if not hasattr(attr, "retrieve_list"):
+            return attr
+        if name not in self._groups:
+            self._groups[name] = CachedOperationsGroup(attr, f"{self._endpoint}/{name}", name)
+        return self._groups[name]
+
+
+def cached_get(url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> "requests.Response":
+    """
+    GET through the pooled http session, served from the response cache
+
+    only successful responses are stored
+    """
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    from griffon import get_http_session, host_limits
+
+    http = get_http_session()
+    cache = response_cache()
+    if cache is None:
+        with host_limits.limit_for(url):
+            return http.get(url, params=params, **kwargs)
+    entity = entity_from_url(url)
+    key_params = params or {}
+    if not CacheSettings.refresh:
+        body = cache.get(url, key_params, entity)
+        if body is not None:
+            timings.count(service_stage(url), "cache_hits")
+            response = requests.Response()
+            response.status_code = 200
+            response.url = url
+            response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+            response.encoding = "utf-8"
+            response._content = body
+            return response
+    with host_limits.limit_for(url):
+        response = http.get(url, params=params, **kwargs)
+    if response.status_code == 200:
+        cache.set(url, key_params, entity, response.content)
+    return response
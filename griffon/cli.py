@@ -1,73 +1,89 @@
 """
 
 """
+import importlib
 import logging
 
 import click
 import click_completion
+from click.shell_completion import CompletionItem
 
 from griffon import (
     config_logging,
     get_config_option,
     list_config_sections,
     print_version,
+    setup_cache,
 )
 
-from .commands.configure import configure_grp
-from .commands.docs import docs_grp
-from .commands.entities import entities_grp
 from .commands.plugin_commands import plugin_commands
-from .commands.queries import queries_grp
-from .output import OUTPUT_FORMAT
+from .formats import OUTPUT_FORMAT, TABLE_FORMATS
+from .timings import timings
 
 logger = logging.getLogger("griffon")
 
 click_completion.init()
 
 
-@click.group()
-@click.pass_context
-def configure(ctx):
-    pass
-
-
-configure.add_command(configure_grp)
-
-
-@click.group()
-@click.pass_context
-def entities(ctx):
-    pass
-
-
-entities.add_command(entities_grp)
-
-
-@click.group()
-@click.pass_context
-def services_grp(ctx):
-    pass
-
-
-services_grp.add_command(queries_grp)
-
-
-@click.group()
-@click.pass_context
-def docs(ctx):
-    pass
-
-
-docs.add_command(docs_grp)
-
-
-@click.group()
-@click.pass_context
-def plugins(ctx):
-    pass
-
-
-@plugins.command(name="plugins", help="3rd party plugins.", cls=plugin_commands)
+class LazyGroup(click.Group):
+    """
+    Group which imports its subcommands only once they are invoked.
+
+    lazy_subcommands maps command name to (import path, short help), the short help
+    is used to list commands so that --help and completion import no command module.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = dict(lazy_subcommands or {})
+
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            import_path, _ = self.lazy_subcommands.pop(cmd_name)
+            module_name, attr = import_path.split(":")
+            self.add_command(getattr(importlib.import_module(module_name), attr), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def invoke(self, ctx):
+        from griffon.services.pagination import PageError
+
+        try:
+            return super().invoke(ctx)
+        except PageError as exc:
+            # results missing a page are not printed as complete, fail the command
+            raise click.ClickException(str(exc)) from exc
+
+    def short_helps(self, ctx, incomplete=""):
+        """(name, short help) of visible subcommands, without importing lazy ones"""
+        for name in self.list_commands(ctx):
+            if not name.startswith(incomplete):
+                continue
+            if name in self.lazy_subcommands:
+                yield name, self.lazy_subcommands[name][1]
+            else:
+                command = super().get_command(ctx, name)
+                if command is not None and not command.hidden:
+                    yield name, command.get_short_help_str()
+
+    def format_commands(self, ctx, formatter):
+        rows = list(self.short_helps(ctx))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+    def shell_complete(self, ctx, incomplete):
+        results = [
+            CompletionItem(name, help=short_help)
+            for name, short_help in self.short_helps(ctx, incomplete)
+        ]
+        results.extend(click.Command.shell_complete(self, ctx, incomplete))
+        return results
+
+
+@click.command(name="plugins", help="3rd party plugins.", cls=plugin_commands)
 @click.pass_context
 def plugins_grp(ctx):
     pass
@@ -75,13 +91,19 @@ def plugins_grp(ctx):
 
 # CLI entry point
 #
-#   A click.CommandCollection is used to aggregate up all CLI sub commands.
-#   Top level CLI options (germane to all commands) are included here.
+#   A LazyGroup is used to aggregate up all CLI sub commands, command modules are only
+#   imported when invoked. Top level CLI options (germane to all commands) are included here.
 
 
 @click.group(
-    cls=click.CommandCollection,
-    sources=(configure, entities, services_grp, docs, plugins),
+    cls=LazyGroup,
+    lazy_subcommands={
+        "configure": ("griffon.commands.configure:configure_grp", "Configure griffon."),
+        "docs": ("griffon.commands.docs:docs_grp", "Links to useful docs."),
+        "entities": ("griffon.commands.entities:entities_grp", "Entity operations."),
+        "serve": ("griffon.commands.serve:serve", "Run griffon daemon."),
+        "service": ("griffon.commands.queries:queries_grp", "Service operations."),
+    },
 )
 @click.option(
     "--version",
@@ -100,6 +122,17 @@ def plugins_grp(ctx):
     default=get_config_option("default", "format", "text"),
     help="Result format (default is text format).",
 )
+@click.option(
+    "--table-format",
+    type=click.Choice(TABLE_FORMATS),
+    default=get_config_option("default", "table_format"),
+    help="Table format (default is taken from --table-file extension, otherwise csv).",
+)
+@click.option(
+    "--table-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write table format output to file (default is stdout).",
+)
 @click.option(
     "-v",
     "verbose",
@@ -127,9 +160,37 @@ def plugins_grp(ctx):
     help="Activate profile, defined in .griffonrc.",
 )
 @click.option("--editor/--no-editor", default=True, help="Allow text editor prompt.")
+@click.option("--no-cache", is_flag=True, help="Do not use cached service responses.")
+@click.option("--refresh", is_flag=True, help="Refresh cached service responses.")
+@click.option(
+    "--timings",
+    "show_timings",
+    is_flag=True,
+    help="Print time spent per service, query and rendering stage on exit (stderr).",
+)
+@click.option(
+    "--timings-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write timings as json to file instead.",
+)
 @click.pass_context
 def cli(
-    ctx, debug, format, verbose, no_progress_bar, no_color, no_wrap, terminal_width, profile, editor
+    ctx,
+    debug,
+    format,
+    table_format,
+    table_file,
+    verbose,
+    no_progress_bar,
+    no_color,
+    no_wrap,
+    terminal_width,
+    profile,
+    editor,
+    no_cache,
+    refresh,
+    show_timings,
+    timings_file,
 ):
     """Red Hat product security CLI"""
 
@@ -141,12 +202,20 @@ def cli(
     else:
         config_logging(level="DEBUG")
 
+    setup_cache(no_cache=no_cache, refresh=refresh)
+
+    if show_timings or timings_file:
+        timings.enable()
+        ctx.call_on_close(lambda: timings.write_report(timings_file))
+
     ctx.ensure_object(dict)
     ctx.obj["DEBUG"] = debug
     ctx.obj["SHOW_INACTIVE"] = False
     ctx.obj["SHOW_PURL"] = False
     ctx.obj["SHOW_UPSTREAM"] = False
     ctx.obj["FORMAT"] = format
+    ctx.obj["TABLE_FORMAT"] = table_format
+    ctx.obj["TABLE_FILE"] = table_file
     ctx.obj["VERBOSE"] = verbose
     ctx.obj["NO_PROGRESS_BAR"] = no_progress_bar
     ctx.obj["NO_COLOR"] = no_color
@@ -159,6 +228,9 @@ def cli(
     ctx.obj["PROFILE"] = profile
     ctx.obj["SHORT_VERSION_VALUES"] = True
     ctx.obj["EDITOR"] = editor
+    ctx.obj["NO_CACHE"] = no_cache
+
 
+cli.add_command(plugins_grp)
 
 cli.help = "Red Hat Product Security CLI"
@@ -5,11 +5,12 @@ import configparser
 import logging
 import os
 import subprocess
+from importlib.resources import files
 
 import click
-from pkg_resources import resource_filename  # type: ignore
 
 from griffon import GRIFFON_CONFIG_DIR, GRIFFON_RC_FILE
+from griffon.autocomplete.index import refresh_in_background, refresh_index
 
 logger = logging.getLogger("griffon")
 
@@ -42,8 +43,22 @@ def setup():
         logger.warning(f"{GRIFFON_CONFIG_DIR} already exists")
 
     logger.warning(__name__)
-    default_griffonrc = resource_filename("griffon", "static/default_griffonrc")
+    default_griffonrc = files("griffon").joinpath("static/default_griffonrc")
     config = configparser.ConfigParser(allow_no_value=True)
     config.read(default_griffonrc)
     with open(os.path.expanduser(GRIFFON_RC_FILE), "w") as configfile:
         config.write(configfile)
+
+
+@configure_grp.command(
+    name="refresh-index", help="Refresh local shell completion index (in background)."
+)
+@click.option("--foreground", is_flag=True, help="Wait for the refresh to finish.")
+def refresh_completion_index(foreground):
+    if foreground:
+        for kind, count in refresh_index().items():
+            logger.info(f"{kind}: {count} entries")
+    elif refresh_in_background():
+        logger.info("refreshing completion index in background")
+    else:
+        logger.info("completion index refresh already running")
@@ -2,11 +2,9 @@
 corgi entity operations
 
 """
-import concurrent.futures
 import logging
 
 import click
-import requests
 from component_registry_bindings.bindings.python_client.api.v1 import (
     v1_builds_list,
     v1_builds_retrieve,
@@ -45,11 +43,14 @@ from griffon.autocomplete import (
     get_product_stream_ofuris,
     get_product_version_ofuris,
 )
+from griffon.cache import cached_get
 from griffon.commands.entities.helpers import (
+    LazyChoice,
     multivalue_params_to_csv,
     query_params_options,
 )
-from griffon.output import console, cprint
+from griffon.output import console, cprint, streamed_output
+from griffon.services.pagination import retrieve_all, stream_all
 
 logger = logging.getLogger("griffon")
 
@@ -84,7 +85,7 @@ def components(ctx):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -109,33 +110,14 @@ def list_components(ctx, strict_name_search, component_name, **params):
     session = CommunityComponentService.create_session()
     params = multivalue_params_to_csv(params)
 
+    if streamed_output(ctx):
+        # written in server order as pages arrive
+        return cprint(stream_all(session.components.retrieve_list, **params), ctx=ctx)
+
     logger.debug("starting parallel http requests")
-    component_cnt = session.components.retrieve_list(**params).count
-    logger.debug(component_cnt)
-    if component_cnt < 3000000:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            components = list()
-            for batch in range(0, component_cnt, 1200):
-                params["offset"] = batch
-                params["limit"] = 1200
-                futures.append(
-                    executor.submit(
-                        session.components.retrieve_list,
-                        **params,
-                    )
-                )
-
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    components.extend(future.result().results)
-                except Exception as exc:
-                    logger.warning("%r generated an exception: %s" % (future, exc))
-
-            data = sorted(components, key=lambda d: d.purl)
-            return cprint(data, ctx=ctx)
-    else:
-        console.warning("Too many components.")
+    components = retrieve_all(session.components.retrieve_list, **params)
+    data = sorted(components, key=lambda d: d.purl)
+    return cprint(data, ctx=ctx)
 
 
 @components.command(name="get")
@@ -145,7 +127,7 @@ def list_components(ctx, strict_name_search, component_name, **params):
     entity="Component",
     endpoint_module=v1_components_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -193,7 +175,7 @@ def get_component(ctx, component_id, purl, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -273,7 +255,7 @@ def get_component_summary(ctx, component_name, strict_name_search, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -309,7 +291,7 @@ def get_component_provides(ctx, component_uuid, purl, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -386,9 +368,7 @@ def product_streams(ctx):
     entity="ProductStream",
     endpoint_module=v1_product_streams_list,
     options_overrides={
-        "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductStream))
-        },
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, ProductStream)},
     },
 )
 @click.pass_context
@@ -421,9 +401,7 @@ def list_product_streams(ctx, product_stream_name, **params):
     entity="ProductStream",
     endpoint_module=v1_product_streams_retrieve,
     options_overrides={
-        "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductStream))
-        },
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, ProductStream)},
     },
 )
 @click.pass_context
@@ -455,7 +433,7 @@ def get_product_stream(ctx, product_stream_name, inactive, ofuri, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -511,7 +489,7 @@ def get_product_stream_manifest(ctx, product_stream_name, ofuri, spdx_json_forma
         ps = session.product_streams.retrieve_list(name=product_stream_name).additional_properties
     if not ps:
         logger.warning("could not find active product stream.")
-    data = requests.get(ps["manifest"])
+    data = cached_get(ps["manifest"])
     cprint(data.json(), ctx=ctx)
 
 
@@ -530,9 +508,7 @@ def builds(ctx):
     entity="SoftwareBuild",
     endpoint_module=v1_builds_list,
     options_overrides={
-        "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(SoftwareBuild))
-        },
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, SoftwareBuild)},
     },
 )
 @click.pass_context
@@ -556,9 +532,7 @@ def list_software_builds(ctx, software_build_name, **params):
     entity="SoftwareBuild",
     endpoint_module=v1_builds_retrieve,
     options_overrides={
-        "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(SoftwareBuild))
-        },
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, SoftwareBuild)},
     },
 )
 @click.pass_context
@@ -591,7 +565,7 @@ def products(ctx):
     entity="Product",
     endpoint_module=v1_products_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Product))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Product)},
     },
 )
 @click.pass_context
@@ -617,7 +591,7 @@ def list_products(ctx, product_name, **params):
     entity="Product",
     endpoint_module=v1_products_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Product))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Product)},
     },
 )
 @click.pass_context
@@ -651,7 +625,7 @@ def product_versions(ctx):
     endpoint_module=v1_product_versions_list,
     options_overrides={
         "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductVersion))
+            "type": LazyChoice(CommunityComponentService.get_fields, ProductVersion)
         },
     },
 )
@@ -679,7 +653,7 @@ def list_product_versions(ctx, product_version_name, **params):
     endpoint_module=v1_product_versions_retrieve,
     options_overrides={
         "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductVersion))
+            "type": LazyChoice(CommunityComponentService.get_fields, ProductVersion)
         },
     },
 )
@@ -714,7 +688,7 @@ def product_variants(ctx):
     endpoint_module=v1_product_variants_list,
     options_overrides={
         "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductVariant))
+            "type": LazyChoice(CommunityComponentService.get_fields, ProductVariant)
         },
     },
 )
@@ -742,7 +716,7 @@ def list_product_variants(ctx, product_variant_name, **params):
     endpoint_module=v1_product_variants_retrieve,
     options_overrides={
         "include_fields": {
-            "type": click.Choice(CommunityComponentService.get_fields(ProductVariant))
+            "type": LazyChoice(CommunityComponentService.get_fields, ProductVariant)
         },
     },
 )
@@ -776,7 +750,7 @@ def channels(ctx):
     entity="Channel",
     endpoint_module=v1_channels_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Channel))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Channel)},
     },
 )
 @click.pass_context
@@ -802,7 +776,7 @@ def list_channels(ctx, channel_name, **params):
     entity="Channel",
     endpoint_module=v1_channels_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CommunityComponentService.get_fields(Channel))},
+        "include_fields": {"type": LazyChoice(CommunityComponentService.get_fields, Channel)},
     },
 )
 @click.pass_context
@@ -2,11 +2,9 @@
 corgi entity operations
 
 """
-import concurrent.futures
 import logging
 
 import click
-import requests
 from component_registry_bindings.bindings.python_client.api.v1 import (
     v1_builds_list,
     v1_builds_retrieve,
@@ -40,11 +38,23 @@ from griffon.autocomplete import (
     get_product_stream_ofuris,
     get_product_version_ofuris,
 )
+from griffon.cache import CacheSettings, cached_get
 from griffon.commands.entities.helpers import (
+    LazyChoice,
+    manifest_filter_options,
     multivalue_params_to_csv,
     query_params_options,
 )
-from griffon.output import console, cprint
+from griffon.manifests import manifest_mirror, open_manifest_url
+from griffon.output import (
+    OUTPUT_FORMAT,
+    console,
+    cprint,
+    manifest_output,
+    streamed_output,
+)
+from griffon.services.pagination import retrieve_all, stream_all
+from griffon.spdx import ManifestFilter
 
 logger = logging.getLogger("griffon")
 
@@ -79,7 +89,7 @@ def components(ctx):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -104,33 +114,14 @@ def list_components(ctx, strict_name_search, component_name, **params):
     session = CorgiService.create_session()
     params = multivalue_params_to_csv(params)
 
+    if streamed_output(ctx):
+        # written in server order as pages arrive
+        return cprint(stream_all(session.components.retrieve_list, **params), ctx=ctx)
+
     logger.debug("starting parallel http requests")
-    component_cnt = session.components.retrieve_list(**params).count
-    logger.debug(component_cnt)
-    if component_cnt < 3000000:
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            components = list()
-            for batch in range(0, component_cnt, 1200):
-                params["offset"] = batch
-                params["limit"] = 1200
-                futures.append(
-                    executor.submit(
-                        session.components.retrieve_list,
-                        **params,
-                    )
-                )
-
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    components.extend(future.result().results)
-                except Exception as exc:
-                    logger.warning("%r generated an exception: %s" % (future, exc))
-
-            data = sorted(components, key=lambda d: d.purl)
-            return cprint(data, ctx=ctx)
-    else:
-        console.warning("Too many components.")
+    components = retrieve_all(session.components.retrieve_list, **params)
+    data = sorted(components, key=lambda d: d.purl)
+    return cprint(data, ctx=ctx)
 
 
 @components.command(name="get")
@@ -140,7 +131,7 @@ def list_components(ctx, strict_name_search, component_name, **params):
     entity="Component",
     endpoint_module=v1_components_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -188,7 +179,7 @@ def get_component(ctx, component_id, purl, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -268,7 +259,7 @@ def get_component_summary(ctx, component_name, strict_name_search, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -304,7 +295,7 @@ def get_component_provides(ctx, component_uuid, purl, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -342,9 +333,12 @@ def get_component_sources(ctx, component_uuid, purl, **params):
     default=False,
     help="Generate spdx manifest (json).",
 )
+@manifest_filter_options
 @click.pass_context
 @progress_bar
-def get_component_manifest(ctx, component_uuid, purl, spdx_json_format):
+def get_component_manifest(
+    ctx, component_uuid, purl, spdx_json_format, purl_type, name_regex, max_depth
+):
     """Retrieve Component manifest."""
     if not component_uuid and not purl:
         click.echo(ctx.get_help())
@@ -353,14 +347,19 @@ def get_component_manifest(ctx, component_uuid, purl, spdx_json_format):
         ctx.ensure_object(dict)
         ctx.obj["FORMAT"] = "json"  # TODO - investigate if we need yaml format.
     session = CorgiService.create_session()
-    if component_uuid:
+    if not component_uuid:
+        c = session.components.retrieve_list(purl=purl)
+        if not c:
+            return
+        component_uuid = c["uuid"]
+    manifest_filter = ManifestFilter(purl_type, name_regex, max_depth)
+    if ctx.obj["FORMAT"] == OUTPUT_FORMAT.JSON.value and not manifest_filter:
         data = session.components.retrieve_manifest(component_uuid)
         return cprint(data, ctx=ctx)
-    else:
-        c = session.components.retrieve_list(purl=purl)
-        if c:
-            data = session.components.retrieve_manifest(c["uuid"])
-            return cprint(data, ctx=ctx)
+    url = f"{CORGI_API_URL}/api/v1/components/{component_uuid}/manifest"
+    if spdx_json_format:
+        return cprint(manifest_filter.document(lambda: open_manifest_url(url)), ctx=ctx)
+    manifest_output(ctx, manifest_filter.packages(lambda: open_manifest_url(url)))
 
 
 @components.command(name="tree")
@@ -392,7 +391,7 @@ def get_component_tree(ctx, component_uuid, nvr, purl, show_purl):
         component_uuid = c.results[0].uuid
     c = session.components.retrieve(component_uuid, include_fields="uuid,nvr,arch")
     if c.arch == "src" or c.arch == "noarch":
-        data = requests.get(f"{CORGI_API_URL}/api/v1/components/{component_uuid}/taxonomy")
+        data = cached_get(f"{CORGI_API_URL}/api/v1/components/{component_uuid}/taxonomy")
         return cprint(data.json(), ctx=ctx)
     else:
         logger.info(f"{c.nvr},{c.arch} not a root component.")
@@ -416,7 +415,7 @@ def product_streams(ctx):
     entity="ProductStream",
     endpoint_module=v1_product_streams_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductStream))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductStream)},
     },
 )
 @click.pass_context
@@ -449,7 +448,7 @@ def list_product_streams(ctx, product_stream_name, **params):
     entity="ProductStream",
     endpoint_module=v1_product_streams_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductStream))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductStream)},
     },
 )
 @click.pass_context
@@ -481,7 +480,7 @@ def get_product_stream(ctx, product_stream_name, inactive, ofuri, **params):
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.pass_context
@@ -519,9 +518,12 @@ def get_product_stream_components(ctx, product_stream_name, ofuri, **params):
     default=False,
     help="Generate spdx manifest (json).",
 )
+@manifest_filter_options
 @click.pass_context
 @progress_bar
-def get_product_stream_manifest(ctx, product_stream_name, ofuri, spdx_json_format):
+def get_product_stream_manifest(
+    ctx, product_stream_name, ofuri, spdx_json_format, purl_type, name_regex, max_depth
+):
     """Retrieve Product Stream manifest."""
     if not ofuri and not product_stream_name:
         click.echo(ctx.get_help())
@@ -541,8 +543,44 @@ def get_product_stream_manifest(ctx, product_stream_name, ofuri, spdx_json_forma
     if not ps["manifest"]:
         logger.error(f"could not find manifest for {product_stream_name}.")
         ctx.exit()
-    data = requests.get(ps["manifest"])
-    cprint(data.json(), ctx=ctx)
+    manifest_mirror.sync(ps["name"], ps["manifest"], force=CacheSettings.refresh)
+    manifest_filter = ManifestFilter(purl_type, name_regex, max_depth)
+    if ctx.obj["FORMAT"] == OUTPUT_FORMAT.JSON.value and not manifest_filter:
+        cprint(manifest_mirror.load(ps["name"]), ctx=ctx)
+    if spdx_json_format:
+        cprint(manifest_filter.document(lambda: manifest_mirror.open(ps["name"])), ctx=ctx)
+    manifest_output(ctx, manifest_filter.packages(lambda: manifest_mirror.open(ps["name"])))
+
+
+@product_streams.command(name="manifest-diff")
+@click.argument(
+    "product_stream_name",
+    required=False,
+    type=click.STRING,
+    shell_complete=get_product_stream_names,
+)
+@click.option("--ofuri", "ofuri", type=click.STRING, shell_complete=get_product_stream_ofuris)
+@click.pass_context
+@progress_bar
+def get_product_stream_manifest_diff(ctx, product_stream_name, ofuri):
+    """Sync Product Stream manifest, list packages added and removed by its last change."""
+    if not ofuri and not product_stream_name:
+        click.echo(ctx.get_help())
+        exit(0)
+    session = CorgiService.create_session()
+    ps = None
+    if ofuri:
+        ps = session.product_streams.retrieve_list(ofuri=ofuri).additional_properties
+    if product_stream_name:
+        ps = session.product_streams.retrieve_list(name=product_stream_name).additional_properties
+    if not ps:
+        logger.error("could not find active product stream.")
+        ctx.exit()
+    if not ps["manifest"]:
+        logger.error(f"could not find manifest for {product_stream_name}.")
+        ctx.exit()
+    manifest_mirror.sync(ps["name"], ps["manifest"], force=CacheSettings.refresh)
+    cprint(manifest_mirror.diff(ps["name"]), ctx=ctx)
 
 
 # BUILDS
@@ -560,7 +598,7 @@ def builds(ctx):
     entity="SoftwareBuild",
     endpoint_module=v1_builds_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(SoftwareBuild))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, SoftwareBuild)},
     },
 )
 @click.pass_context
@@ -584,7 +622,7 @@ def list_software_builds(ctx, software_build_name, **params):
     entity="SoftwareBuild",
     endpoint_module=v1_builds_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(SoftwareBuild))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, SoftwareBuild)},
     },
 )
 @click.pass_context
@@ -617,7 +655,7 @@ def products(ctx):
     entity="Product",
     endpoint_module=v1_products_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Product))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Product)},
     },
 )
 @click.pass_context
@@ -643,7 +681,7 @@ def list_products(ctx, product_name, **params):
     entity="Product",
     endpoint_module=v1_products_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Product))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Product)},
     },
 )
 @click.pass_context
@@ -676,7 +714,7 @@ def product_versions(ctx):
     entity="ProductVersion",
     endpoint_module=v1_product_versions_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductVersion))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductVersion)},
     },
 )
 @click.pass_context
@@ -702,7 +740,7 @@ def list_product_versions(ctx, product_version_name, **params):
     entity="ProductVersion",
     endpoint_module=v1_product_versions_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductVersion))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductVersion)},
     },
 )
 @click.pass_context
@@ -735,7 +773,7 @@ def product_variants(ctx):
     entity="ProductVariant",
     endpoint_module=v1_product_variants_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductVariant))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductVariant)},
     },
 )
 @click.pass_context
@@ -761,7 +799,7 @@ def list_product_variants(ctx, product_variant_name, **params):
     entity="ProductVariant",
     endpoint_module=v1_product_variants_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(ProductVariant))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, ProductVariant)},
     },
 )
 @click.pass_context
@@ -794,7 +832,7 @@ def channels(ctx):
     entity="Channel",
     endpoint_module=v1_channels_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Channel))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Channel)},
     },
 )
 @click.pass_context
@@ -820,7 +858,7 @@ def list_channels(ctx, channel_name, **params):
     entity="Channel",
     endpoint_module=v1_channels_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Channel))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Channel)},
     },
 )
 @click.pass_context
@@ -1,14 +1,36 @@
+import atexit
+import importlib
 import inspect
+import json
+import logging
+import os
+import re
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
 from itertools import chain
 from types import ModuleType
-from typing import Callable, Optional, Union, get_args, get_origin
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Union,
+    get_args,
+    get_origin,
+)
 
 import click
 from osidb_bindings.bindings.python_client.types import OSIDBModel
 
-from griffon import get_config_option
+from griffon import GRIFFON_CONFIG_DIR, __version__, get_config_option
+
+logger = logging.getLogger("griffon")
+
+OPTION_SPECS_FILE = os.path.join(GRIFFON_CONFIG_DIR, "option_specs.json")
 
 
 def abort_if_false(ctx, param, value: bool):
@@ -17,6 +39,31 @@ def abort_if_false(ctx, param, value: bool):
         ctx.abort()
 
 
+class LazyChoice(click.Choice):
+    """
+    click.Choice with choices resolved on first use
+
+    choices derived from bindings models and enums are then only computed
+    for commands which are actually invoked or completed
+    """
+
+    def __init__(self, get_choices: Callable, *args, case_sensitive: bool = True) -> None:
+        self.get_choices = get_choices
+        self.get_choices_args = args
+        self._choices: Optional[Sequence[str]] = None
+        self.case_sensitive = case_sensitive
+
+    @property
+    def choices(self) -> Sequence[str]:
+        if self._choices is None:
+            self._choices = list(self.get_choices(*self.get_choices_args))
+        return self._choices
+
+    @choices.setter
+    def choices(self, choices: Sequence[str]) -> None:
+        self._choices = choices
+
+
 def multivalue_params_to_csv(params: dict) -> dict:
     """
     convert multivalue params represented as tuples or lists
@@ -58,6 +105,142 @@ def to_option_type(type_):
     return option_type, is_multiple
 
 
+def _import_path(obj) -> str:
+    return f"{obj.__module__}:{obj.__qualname__}"
+
+
+@lru_cache(maxsize=None)
+def _import_object(path: str):
+    module, name = path.split(":")
+    obj: Any = importlib.import_module(module)
+    for attr in name.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def encode_option_type(option_type) -> Optional[str]:
+    """
+    compact form of a to_option_type result, None if it has none
+
+    eg. builtins:str, datetime, choice:module:EnumA,module:EnumB
+    """
+    if isinstance(option_type, click.Choice):
+        enums: List[type] = []
+        for choice in option_type.choices:
+            if not isinstance(choice, Enum):
+                return None
+            if type(choice) not in enums:
+                enums.append(type(choice))
+        return "choice:" + ",".join(_import_path(enum) for enum in enums)
+    if isinstance(option_type, click.DateTime):
+        return "datetime"
+    if inspect.isclass(option_type):
+        return _import_path(option_type)
+    return None
+
+
+@lru_cache(maxsize=None)
+def decode_option_type(spec: str):
+    if spec.startswith("choice:"):
+        enums = spec[len("choice:") :].split(",")
+        return click.Choice(list(chain.from_iterable(list(_import_object(e)) for e in enums)))
+    if spec == "datetime":
+        return click.DateTime()
+    return _import_object(spec)
+
+
+def bindings_versions() -> Dict[str, Optional[str]]:
+    """installed versions of griffon and the bindings generated options depend on"""
+    versions: Dict[str, Optional[str]] = {"griffon": __version__}
+    for package in ("osidb-bindings", "component-registry-bindings"):
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+class OptionSpecCache:
+    """
+    option specs generated from bindings endpoint modules, persisted in ~/.griffon
+
+    Specs are rebuilt into click options without introspecting the bindings types, the
+    whole cache is dropped once versions of the installed bindings change.
+    """
+
+    def __init__(self, path: str = OPTION_SPECS_FILE) -> None:
+        self.path = os.path.expanduser(path)
+        self.specs: Optional[Dict[str, list]] = None
+        self.versions: Dict[str, Optional[str]] = {}
+        self.dirty = False
+
+    def load(self) -> Dict[str, list]:
+        if self.specs is not None:
+            return self.specs
+        self.versions = bindings_versions()
+        specs: Dict[str, list] = {}
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            if cached.get("versions") == self.versions and isinstance(cached["specs"], dict):
+                specs = cached["specs"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            # missing or corrupt cache file, specs are rebuilt
+            pass
+        self.specs = specs
+        return specs
+
+    FIELDS = ("option", "variable", "type", "help", "multiple")
+
+    def get(self, key: str, build: Callable[[], List[dict]]) -> List[dict]:
+        """return option specs stored under key, building and storing them on a miss"""
+        specs = self.load()
+        if key in specs:
+            try:
+                return [
+                    {**dict(zip(self.FIELDS, row)), "type": decode_option_type(row[2])}
+                    for row in specs[key]
+                ]
+            except (ImportError, AttributeError, ValueError):
+                logger.debug(f"stale option spec {key}, rebuilding")
+        built = build()
+        rows = [
+            [spec[field] for field in self.FIELDS[:2]]
+            + [encode_option_type(spec["type"]), spec["help"], spec["multiple"]]
+            for spec in built
+        ]
+        if all(row[2] is not None for row in rows):
+            specs[key] = rows
+            if not self.dirty:
+                self.dirty = True
+                atexit.register(self.save)
+        return built
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"versions": self.versions, "specs": self.specs}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as exc:
+            logger.debug(f"could not write option specs cache: {exc}")
+
+
+option_spec_cache = OptionSpecCache()
+
+
+def apply_option_specs(fn: Callable, specs: List[dict]) -> Callable:
+    wrapper = fn
+    for spec in specs:
+        option_params = dict(spec)
+        wrapper = click.option(
+            option_params.pop("option"), option_params.pop("variable"), **option_params
+        )(wrapper)
+    return wrapper
+
+
 def filter_request_fields(fields: dict, exclude: list[str]):
     keep = {}
     for field, field_type in fields.items():
@@ -98,28 +281,30 @@ def query_params_options(
     if options_overrides is None:
         options_overrides = {}
 
-    def inner(fn):
-        wrapper = fn
+    def build() -> List[dict]:
+        specs = []
         for query_param, param_type in endpoint_module.QUERY_PARAMS.items():
             option_type, is_multiple = to_option_type(param_type)
-            option_params = {
-                "option": f"--{query_param.replace('_','-')}",
-                "variable": query_param,
-                "type": option_type,
-                "help": f"{entity.capitalize()} {query_param.replace('_',' ')}",
-                "multiple": is_multiple,
-            }
-            option_override = options_overrides.get(query_param, {})
-            option_params.update(
+            specs.append(
+                {
+                    "option": f"--{query_param.replace('_','-')}",
+                    "variable": query_param,
+                    "type": option_type,
+                    "help": f"{entity.capitalize()} {query_param.replace('_',' ')}",
+                    "multiple": is_multiple,
+                }
+            )
+        return specs
+
+    def inner(fn):
+        specs = option_spec_cache.get(f"query:{endpoint_module.__name__}:{entity}", build)
+        for spec in specs:
+            option_override = options_overrides.get(spec["variable"], {})
+            spec.update(
                 (override, option_override[override])
-                for override in option_params.keys() & option_override.keys()
+                for override in spec.keys() & option_override.keys()
             )
-            wrapper = (
-                click.option(
-                    option_params.pop("option"), option_params.pop("variable"), **option_params
-                )
-            )(wrapper)
-        return wrapper
+        return apply_option_specs(fn, specs)
 
     return inner
 
@@ -138,32 +323,58 @@ def request_body_options(
 
     List of the excluded fields may be supplied
     """
-    if exclude is None:
-        exclude = []
-
-    def inner(fn):
-        wrapper = fn
+    # narrowed once, closures do not keep the narrowing of exclude
+    excluded: List[str] = [] if exclude is None else exclude
 
+    def build() -> List[dict]:
         request_body_type = getattr(endpoint_module, "REQUEST_BODY_TYPE", None)
         if request_body_type is None:
-            return wrapper
+            return []
 
-        fields = filter_request_fields(request_body_type.get_fields(), exclude=exclude)
+        specs = []
+        fields = filter_request_fields(request_body_type.get_fields(), exclude=excluded)
         for field, field_type in fields.items():
             option_type, is_multiple = to_option_type(field_type)
-            option_params = {
-                "option": f"--{field.replace('_','-')}",
-                "variable": field,
-                "type": option_type,
-                "help": f"{request_body_type.__name__} {field.replace('_',' ')}",
-                "multiple": is_multiple,
-            }
-
-            wrapper = (
-                click.option(
-                    option_params.pop("option"), option_params.pop("variable"), **option_params
-                )
-            )(wrapper)
-        return wrapper
+            specs.append(
+                {
+                    "option": f"--{field.replace('_','-')}",
+                    "variable": field,
+                    "type": option_type,
+                    "help": f"{request_body_type.__name__} {field.replace('_',' ')}",
+                    "multiple": is_multiple,
+                }
+            )
+        return specs
+
+    def inner(fn):
+        key = f"body:{endpoint_module.__name__}:{','.join(sorted(excluded))}"
+        return apply_option_specs(fn, option_spec_cache.get(key, build))
 
     return inner
+
+
+def validate_regex(ctx, param, value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        try:
+            re.compile(value)
+        except re.error as exc:
+            raise click.BadParameter(f"invalid regex: {exc}")
+    return value
+
+
+def manifest_filter_options(fn: Callable) -> Callable:
+    """options selecting manifest packages (see griffon.spdx.ManifestFilter)"""
+    options = [
+        click.option("--purl-type", help="Only packages of purl type (eg. rpm, oci, npm)."),
+        click.option(
+            "--name-regex", callback=validate_regex, help="Only packages with name matching regex."
+        ),
+        click.option(
+            "--max-depth",
+            type=click.IntRange(min=0),
+            help="Only packages at most max depth relationships below the manifest root.",
+        ),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
@@ -23,6 +23,7 @@ from requests import HTTPError
 
 from griffon import OSIDB_API_URL, OSIDBService, progress_bar
 from griffon.commands.entities.helpers import (
+    LazyChoice,
     abort_if_false,
     filter_request_fields,
     get_editor,
@@ -55,9 +56,9 @@ def flaws(ctx):
     entity="Flaw",
     endpoint_module=osidb_api_v1_flaws_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Flaw))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Flaw))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Flaw))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Flaw)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Flaw)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Flaw)},
     },
 )
 @click.pass_context
@@ -83,9 +84,9 @@ def list_flaws(ctx, **params):
     entity="Flaw",
     endpoint_module=osidb_api_v1_flaws_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Flaw))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Flaw))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Flaw))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Flaw)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Flaw)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Flaw)},
     },
 )
 @click.pass_context
@@ -214,9 +215,9 @@ def affects(ctx):
     entity="Affect",
     endpoint_module=osidb_api_v1_affects_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Affect))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Affect))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Affect))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Affect)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Affect)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Affect)},
     },
 )
 @click.pass_context
@@ -237,9 +238,9 @@ def list_affects(ctx, **params):
     entity="Affect",
     endpoint_module=osidb_api_v1_affects_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Affect))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Affect))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Affect))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Affect)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Affect)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Affect)},
     },
 )
 @click.pass_context
@@ -387,9 +388,9 @@ def trackers(ctx):
     entity="Tracker",
     endpoint_module=osidb_api_v1_trackers_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Tracker))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Tracker))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Tracker))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Tracker)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Tracker)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Tracker)},
     },
 )
 @click.pass_context
@@ -409,9 +410,9 @@ def list_trackers(ctx, **params):
     entity="Tracker",
     endpoint_module=osidb_api_v1_trackers_retrieve,
     options_overrides={
-        "include_fields": {"type": click.Choice(OSIDBService.get_fields(Tracker))},
-        "exclude_fields": {"type": click.Choice(OSIDBService.get_fields(Tracker))},
-        "include_meta_attr": {"type": click.Choice(OSIDBService.get_meta_attr_fields(Tracker))},
+        "include_fields": {"type": LazyChoice(OSIDBService.get_fields, Tracker)},
+        "exclude_fields": {"type": LazyChoice(OSIDBService.get_fields, Tracker)},
+        "include_meta_attr": {"type": LazyChoice(OSIDBService.get_meta_attr_fields, Tracker)},
     },
 )
 @click.pass_context
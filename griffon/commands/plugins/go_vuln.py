@@ -4,8 +4,8 @@ vuln.go.dev plugin:
 
 """
 import click
-import requests
 
+from griffon import get_http_session, host_limits
 from griffon.output import cprint
 
 api_url = "https://vuln.go.dev"
@@ -29,10 +29,14 @@ def get(ctx, go_id, cve_id):
         exit(0)
 
     if cve_id:
-        res = requests.get(f"https://pkg.go.dev/search?q={cve_id}")
+        search_url = f"https://pkg.go.dev/search?q={cve_id}"
+        with host_limits.limit_for(search_url):
+            res = get_http_session().get(search_url)
         go_id = res.url.split("/")[-1]
     if go_id:
-        res = requests.get(f"{api_url}/ID/{go_id}.json")
+        vuln_url = f"{api_url}/ID/{go_id}.json"
+        with host_limits.limit_for(vuln_url):
+            res = get_http_session().get(vuln_url)
         cprint(res.json(), ctx=ctx)
 
 
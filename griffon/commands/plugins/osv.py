@@ -8,8 +8,8 @@ import json
 import logging
 
 import click
-import requests
 
+from griffon import get_http_session, host_limits
 from griffon.output import cprint
 
 logger = logging.getLogger("griffon")
@@ -37,11 +37,12 @@ def query_by_version(ctx, package_version, package_name, ecosystem):
     data = json.dumps(
         {"version": package_version, "package": {"name": package_name, "ecosystem": ecosystem}}
     )
-    res = requests.post(
-        api_url,
-        data=data,
-        headers={"Content-type": "application/json"},
-    )
+    with host_limits.limit_for(api_url):
+        res = get_http_session().post(
+            api_url,
+            data=data,
+            headers={"Content-type": "application/json"},
+        )
     cprint(res.json(), ctx=ctx)
 
 
@@ -53,11 +54,12 @@ def query_by_commit_hash(ctx, commit_hash):
         click.echo(ctx.get_help())
         exit(0)
     data = json.dumps({"commit": commit_hash})
-    res = requests.post(
-        api_url,
-        data=data,
-        headers={"Content-type": "application/json"},
-    )
+    with host_limits.limit_for(api_url):
+        res = get_http_session().post(
+            api_url,
+            data=data,
+            headers={"Content-type": "application/json"},
+        )
     cprint(res.json(), ctx=ctx)
 
 
@@ -2,6 +2,7 @@
 
 """
 import copy
+import json
 import logging
 import subprocess
 from json import loads
@@ -28,21 +29,37 @@ from griffon.commands.entities.corgi import (
     get_component_manifest,
     get_component_summary,
     get_product_stream_manifest,
+    get_product_stream_manifest_diff,
     list_components,
 )
-from griffon.commands.entities.helpers import query_params_options
+from griffon.commands.entities.helpers import (
+    LazyChoice,
+    manifest_filter_options,
+    query_params_options,
+)
 from griffon.commands.reports import (
     generate_affects_report,
     generate_entity_report,
     generate_license_report,
 )
-from griffon.output import console, cprint, raw_json_transform
+from griffon.output import console, cprint, output_fields, raw_json_transform
 from griffon.services import QueryService, core_queries  # , exp
+from griffon.services.batch import read_inputs, run_batch
+from griffon.services.engine import query_engine
+from griffon.timings import timings
 
 logger = logging.getLogger("griffon")
 
 query_service = QueryService()
 
+BATCH_SEARCH_OPTIONS = (
+    "search_latest",
+    "search_related_url",
+    "search_all",
+    "search_all_roots",
+    "search_upstreams",
+)
+
 
 @click.group(name="service", help="Service operations.")
 @click.pass_context
@@ -153,12 +170,10 @@ def retrieve_component_summary(ctx, component_name, strict_name_search):
 @click.option(
     "--arch",
     default="src",
-    type=click.Choice(CorgiService.get_component_arches()),
-)
-@click.option(
-    "--namespace", default=None, type=click.Choice(CorgiService.get_component_namespaces())
+    type=LazyChoice(CorgiService.get_component_arches),
 )
-@click.option("--type", "component_type", type=click.Choice(CorgiService.get_component_types()))
+@click.option("--namespace", default=None, type=LazyChoice(CorgiService.get_component_namespaces))
+@click.option("--type", "component_type", type=LazyChoice(CorgiService.get_component_types))
 @click.option(
     "-s",
     "strict_name_search",
@@ -318,7 +333,10 @@ def get_product_contain_component(
         params.pop("flaw_mode")
         params.pop("affect_mode")
         if component_name:
-            q = query_service.invoke(core_queries.products_containing_component_query, params)
+            q = query_service.invoke(
+                core_queries.products_containing_component_query,
+                {**params, "output_fields": output_fields(ctx)},
+            )
         if purl:
             q = query_service.invoke(
                 core_queries.products_containing_specific_component_query, params
@@ -329,11 +347,12 @@ def get_product_contain_component(
             mw_command = [MIDDLEWARE_CLI, component_name, "-e", "maven", "--json"]
             if strict_name_search:
                 mw_command.append("-s")
-            proc = subprocess.run(
-                mw_command,
-                capture_output=True,
-                text=True,
-            )
+            with timings.timed("middleware cli"):
+                proc = subprocess.run(
+                    mw_command,
+                    capture_output=True,
+                    text=True,
+                )
             mw_json = loads(proc.stdout)
             mw_components = mw_json["deps"]
             # TODO: need to determine if we use "build" or "deps"
@@ -508,15 +527,15 @@ def get_product_contain_component(
 )
 @click.argument("component_name", required=False)
 @click.option("--purl")
-@click.option("--type", "component_type", type=click.Choice(CorgiService.get_component_types()))
+@click.option("--type", "component_type", type=LazyChoice(CorgiService.get_component_types))
 @click.option("--version", "component_version")
 @click.option(
     "--arch",
     "component_arch",
-    type=click.Choice(CorgiService.get_component_arches()),
+    type=LazyChoice(CorgiService.get_component_arches),
     help="Default arch=src.",
 )
-@click.option("--namespace", type=click.Choice(CorgiService.get_component_namespaces()))
+@click.option("--namespace", type=LazyChoice(CorgiService.get_component_namespaces))
 @click.option(
     "-s",
     "strict_name_search",
@@ -573,8 +592,18 @@ def get_component_contain_component(
     default=False,
     help="Generate spdx manifest (json).",
 )
+@click.option(
+    "--diff",
+    "manifest_diff",
+    is_flag=True,
+    default=False,
+    help="List packages added and removed by the last manifest change.",
+)
+@manifest_filter_options
 @click.pass_context
-def get_product_manifest_query(ctx, product_stream_name, ofuri, spdx_json_format):
+def get_product_manifest_query(
+    ctx, product_stream_name, ofuri, spdx_json_format, manifest_diff, **filters
+):
     """List components of a specific product version."""
     if not ofuri and not product_stream_name:
         click.echo(ctx.get_help())
@@ -589,7 +618,9 @@ def get_product_manifest_query(ctx, product_stream_name, ofuri, spdx_json_format
         cond["ofuri"] = ofuri
     if product_stream_name:
         cond["product_stream_name"] = product_stream_name
-    ctx.invoke(get_product_stream_manifest, **cond)
+    if manifest_diff:
+        return ctx.invoke(get_product_stream_manifest_diff, **cond)
+    ctx.invoke(get_product_stream_manifest, **cond, spdx_json_format=spdx_json_format, **filters)
 
 
 @queries_grp.command(
@@ -602,7 +633,7 @@ def get_product_manifest_query(ctx, product_stream_name, ofuri, spdx_json_format
     entity="Component",
     endpoint_module=v1_components_list,
     options_overrides={
-        "include_fields": {"type": click.Choice(CorgiService.get_fields(Component))},
+        "include_fields": {"type": LazyChoice(CorgiService.get_fields, Component)},
     },
 )
 @click.option(
@@ -647,8 +678,9 @@ def get_product_latest_components_query(ctx, product_stream_name, ofuri, verbose
     default=False,
     help="Generate spdx manifest (json).",
 )
+@manifest_filter_options
 @click.pass_context
-def retrieve_component_manifest(ctx, component_uuid, purl, spdx_json_format):
+def retrieve_component_manifest(ctx, component_uuid, purl, spdx_json_format, **filters):
     """Retrieve Component manifest."""
     if not component_uuid and not purl:
         click.echo(ctx.get_help())
@@ -658,10 +690,10 @@ def retrieve_component_manifest(ctx, component_uuid, purl, spdx_json_format):
         ctx.obj["FORMAT"] = "json"
     cond = {}
     if component_uuid:
-        cond["uuid"] = component_uuid
+        cond["component_uuid"] = component_uuid
     if purl:
         cond["purl"] = purl
-    ctx.invoke(get_component_manifest, **cond)
+    ctx.invoke(get_component_manifest, **cond, spdx_json_format=spdx_json_format, **filters)
 
 
 @queries_grp.command(
@@ -672,29 +704,29 @@ def retrieve_component_manifest(ctx, component_uuid, purl, spdx_json_format):
 @click.option(
     "--affectedness",
     help="Filter by Affect affectedness.",
-    type=click.Choice(OSIDBService.get_affect_affectedness()),
+    type=LazyChoice(OSIDBService.get_affect_affectedness),
 )
 @click.option(
     "--resolution",
     "affect_resolution",
     help="Filter by Affect resolution.",
-    type=click.Choice(OSIDBService.get_affect_resolution()),
+    type=LazyChoice(OSIDBService.get_affect_resolution),
 )
 @click.option(
     "--impact",
     "affect_impact",
     help="Filter by Affect impact.",
-    type=click.Choice(OSIDBService.get_affect_impact()),
+    type=LazyChoice(OSIDBService.get_affect_impact),
 )
 @click.option(
     "--type",
     "component_type",
-    type=click.Choice(CorgiService.get_component_types()),
+    type=LazyChoice(CorgiService.get_component_types),
     help="Filter by Component type.",
 )
 @click.option(
     "--namespace",
-    type=click.Choice(CorgiService.get_component_namespaces()),
+    type=LazyChoice(CorgiService.get_component_namespaces),
     help="filter by Component namespace.",
 )
 @click.pass_context
@@ -728,6 +760,82 @@ def product_versions_affected_by_cve_query(ctx, cve_id):
     cprint(q, ctx=ctx)
 
 
+@queries_grp.command(
+    name="batch",
+    help="Query many Component names, purls or CVE IDs at once (one per line, - for stdin).",
+)
+@click.argument("input_file", type=click.File("r"), default="-")
+@click.option(
+    "-s",
+    "strict_name_search",
+    is_flag=True,
+    default=False,
+    help="Strict search, exact match of component name.",
+)
+@click.option(
+    "--search-latest",
+    "search_latest",
+    is_flag=True,
+    default=False,
+    help="Search root Components (\033[1menabled by default\033[0m).",
+)
+@click.option(
+    "--search-related-url",
+    "search_related_url",
+    is_flag=True,
+    default=False,
+    help="Search related url.",
+)
+@click.option(
+    "--search-all",
+    "search_all",
+    is_flag=True,
+    default=False,
+    help="Search all Components and dependencies.",
+)
+@click.option(
+    "--search-all-roots",
+    "search_all_roots",
+    is_flag=True,
+    default=False,
+    help="Search all ROOT Components and dependencies.",
+)
+@click.option(
+    "--search-upstreams",
+    "search_upstreams",
+    is_flag=True,
+    default=False,
+    help="Search for Components by upstream.",
+)
+@click.option(
+    "--no-community",
+    "no_community",
+    is_flag=True,
+    default=False,
+    help="Do not search community.",
+)
+@click.pass_context
+def run_batch_query(ctx, input_file, **params):
+    """
+    Run products-contain-component for each Component name or purl and
+    products-affected-by-flaw for each CVE ID, writing one json line per input.
+    """
+    keys = read_inputs(input_file)
+    if not keys:
+        click.echo(ctx.get_help())
+        exit(0)
+    if not any(params[option] for option in BATCH_SEARCH_OPTIONS):
+        params["search_latest"] = True
+
+    def emit(record):
+        click.echo(json.dumps(record, default=str))
+
+    failed = query_engine.run(run_batch(keys, params, emit))
+    if failed:
+        logger.warning(f"{failed} of {len(keys)} inputs failed")
+        exit(1)
+
+
 @queries_grp.command(name="component-flaws", help="List Flaws affecting a Component.")
 @click.argument("component_name", required=False)
 @click.option("--purl")
@@ -735,36 +843,36 @@ def product_versions_affected_by_cve_query(ctx, cve_id):
     "--flaw-state",
     "flaw_state",
     help="Filter by Flaw state.",
-    type=click.Choice(OSIDBService.get_flaw_states()),
+    type=LazyChoice(OSIDBService.get_flaw_states),
 )
 @click.option(
     "--flaw-impact",
     "flaw_impact",
     help="Filter by Flaw impact.",
-    type=click.Choice(OSIDBService.get_flaw_impacts()),
+    type=LazyChoice(OSIDBService.get_flaw_impacts),
 )
 @click.option(
     "--flaw-resolution",
     "flaw_resolution",
     help="Filter by Flaw resolution.",
-    type=click.Choice(OSIDBService.get_flaw_resolutions()),
+    type=LazyChoice(OSIDBService.get_flaw_resolutions),
 )
 @click.option(
     "--affectedness",
     help="Filter by Affect affectedness.",
-    type=click.Choice(OSIDBService.get_affect_affectedness()),
+    type=LazyChoice(OSIDBService.get_affect_affectedness),
 )
 @click.option(
     "--affect-resolution",
     "affect_resolution",
     help="Filter by Affect resolution.",
-    type=click.Choice(OSIDBService.get_affect_resolution()),
+    type=LazyChoice(OSIDBService.get_affect_resolution),
 )
 @click.option(
     "--affect-impact",
     "affect_impact",
     help="Filter by Affect impact.",
-    type=click.Choice(OSIDBService.get_affect_impact()),
+    type=LazyChoice(OSIDBService.get_affect_impact),
 )
 @click.option(
     "-s",
@@ -792,7 +900,10 @@ def cves_for_specific_component_query(
         click.echo(ctx.get_help())
         exit(0)
 
-    q = query_service.invoke(core_queries.cves_for_specific_component_query, ctx.params)
+    q = query_service.invoke(
+        core_queries.cves_for_specific_component_query,
+        {**ctx.params, "output_fields": output_fields(ctx)},
+    )
     cprint(q, ctx=ctx)
 
 
@@ -811,36 +922,36 @@ def cves_for_specific_component_query(
     "--flaw-state",
     "flaw_state",
     help="Filter by Flaw state.",
-    type=click.Choice(OSIDBService.get_flaw_states()),
+    type=LazyChoice(OSIDBService.get_flaw_states),
 )
 @click.option(
     "--flaw-impact",
     "flaw_impact",
     help="Filter by Flaw impact.",
-    type=click.Choice(OSIDBService.get_flaw_impacts()),
+    type=LazyChoice(OSIDBService.get_flaw_impacts),
 )
 @click.option(
     "--flaw-resolution",
     "flaw_resolution",
     help="Filter by Flaw resolution.",
-    type=click.Choice(OSIDBService.get_flaw_resolutions()),
+    type=LazyChoice(OSIDBService.get_flaw_resolutions),
 )
 @click.option(
     "--affectedness",
     help="Filter by Affect affectedness.",
-    type=click.Choice(OSIDBService.get_affect_affectedness()),
+    type=LazyChoice(OSIDBService.get_affect_affectedness),
 )
 @click.option(
     "--affect-resolution",
     "affect_resolution",
     help="Filter by Affect resolution.",
-    type=click.Choice(OSIDBService.get_affect_resolution()),
+    type=LazyChoice(OSIDBService.get_affect_resolution),
 )
 @click.option(
     "--affect-impact",
     "affect_impact",
     help="Filter by Affect impact.",
-    type=click.Choice(OSIDBService.get_affect_impact()),
+    type=LazyChoice(OSIDBService.get_affect_impact),
 )
 @click.option(
     "-s",
@@ -867,5 +978,8 @@ def cves_for_specific_product_query(
     if not product_version_name and not ofuri:
         click.echo(ctx.get_help())
         exit(0)
-    q = query_service.invoke(core_queries.cves_for_specific_product_query, ctx.params)
+    q = query_service.invoke(
+        core_queries.cves_for_specific_product_query,
+        {**ctx.params, "output_fields": output_fields(ctx)},
+    )
     cprint(q, ctx=ctx)
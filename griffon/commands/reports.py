@@ -5,14 +5,15 @@ import logging
 
 import click
 
-from griffon import progress_bar
+from griffon import CorgiService, progress_bar
 from griffon.autocomplete import (
     get_component_names,
     get_component_purls,
     get_product_stream_names,
     get_product_stream_ofuris,
 )
-from griffon.output import cprint
+from griffon.commands.entities.helpers import LazyChoice
+from griffon.output import cprint, streamed_output
 from griffon.services import ReportService, core_reports
 
 logger = logging.getLogger("griffon")
@@ -52,9 +53,27 @@ def generate_affects_report(
 
 @reports_grp.command(name="report-entities", help="Generate Entity report (with counts).")
 @click.option("--all", is_flag=True, default=True, help="Show summary report on all entities.")
+@click.option(
+    "--exact",
+    is_flag=True,
+    default=False,
+    help="Count distinct components exactly instead of estimating them.",
+)
+@click.option(
+    "--type",
+    "component_types",
+    multiple=True,
+    type=LazyChoice(CorgiService.get_component_types),
+    help="Count distinct components of this type (repeatable, default RPM, OCI, NPM, GOLANG).",
+)
+@click.option(
+    "--arch",
+    type=LazyChoice(CorgiService.get_component_arches),
+    help="Count distinct components of this arch only.",
+)
 @click.pass_context
 @progress_bar
-def generate_entity_report(ctx, all):
+def generate_entity_report(ctx, all, exact, component_types, arch):
     """A report operation"""
     if not all:
         click.echo(ctx.get_help())
@@ -80,5 +99,8 @@ def generate_license_report(ctx, product_stream_name, purl, exclude_children):
     if not product_stream_name and not purl:
         click.echo(ctx.get_help())
         exit(0)
+    if streamed_output(ctx):
+        # one line (or row) per component, written as soon as its children are resolved
+        cprint(report_service.stream(core_reports.license_report, ctx.params), ctx=ctx)
     ctx.obj["FORMAT"] = "json"
     cprint(report_service.invoke(core_reports.license_report, ctx.params), ctx=ctx)
@@ -0,0 +1,29 @@
+"""
+
+"""
+import logging
+
+import click
+
+from griffon.daemon import SOCKET_PATH, DaemonServer, warm_up
+
+logger = logging.getLogger("griffon")
+
+
+@click.command(name="serve", help="Run griffon daemon, griffon commands are forwarded to it.")
+@click.option(
+    "--socket",
+    "socket_path",
+    default=SOCKET_PATH,
+    show_default=True,
+    help="Unix domain socket to listen on (GRIFFON_SOCKET).",
+)
+@click.pass_context
+def serve(ctx, socket_path):
+    warm_up()
+    with DaemonServer(socket_path) as server:
+        logger.info(f"griffon daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("griffon daemon stopped")
@@ -0,0 +1,378 @@
+"""
+    griffon daemon
+
+    `griffon serve` keeps imported command modules, service sessions, the response
+    cache and the completion index warm behind a unix domain socket. The griffon
+    console script (main) forwards its arguments to a running daemon before importing
+    click or rich, and only falls back to running the command itself when there is none.
+
+    Protocol: the client sends a single json line (argv, cwd, stdin, whitelisted env,
+    service settings), the daemon answers with frames of a channel byte (o: stdout,
+    e: stderr, x: exit status, l: run the command locally), a 4 byte big endian length
+    and the payload.
+
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple, cast
+
+from griffon import GRIFFON_CONFIG_DIR
+
+logger = logging.getLogger("griffon")
+
+SOCKET_PATH = os.path.expanduser(
+    os.getenv("GRIFFON_SOCKET", os.path.join(GRIFFON_CONFIG_DIR, "griffon.sock"))
+)
+# client environment passed to the daemon, shell completion runs through it as well
+FORWARDED_ENV = ("_GRIFFON_COMPLETE", "COMP_WORDS", "COMP_CWORD")
+# environment read once by griffon (service urls, credentials) besides GRIFFON_* variables,
+# the daemon hands back commands of clients whose settings differ from its own
+SETTINGS_ENV = (
+    "CORGI_API_URL",
+    "OSIDB_API_URL",
+    "COMMUNITY_COMPONENTS_API_URL",
+    "OSIDB_USERNAME",
+    "OSIDB_PASSWORD",
+    "OSIDB_AUTH_METHOD",
+    "REQUESTS_CA_BUNDLE",
+)
+# GRIFFON_* variables only read by the client
+CLIENT_ENV = ("GRIFFON_NO_DAEMON", "GRIFFON_SOCKET")
+FRAME_HEADER = struct.Struct(">cI")
+# commands which are never run by the daemon, the client runs them itself
+LOCAL_COMMANDS = {"serve"}
+
+
+def send_frame(sock: socket.socket, channel: bytes, payload: bytes) -> None:
+    sock.sendall(FRAME_HEADER.pack(channel, len(payload)) + payload)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class FrameWriter(io.RawIOBase):
+    """binary stream writing frames of a channel to the client"""
+
+    def __init__(self, sock: socket.socket, channel: bytes, tty: bool) -> None:
+        self.sock = sock
+        self.channel = channel
+        self.tty = tty
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    def write(self, data) -> int:
+        send_frame(self.sock, self.channel, bytes(data))
+        return len(data)
+
+
+def text_writer(sock: socket.socket, channel: bytes, tty: bool) -> io.TextIOWrapper:
+    return io.TextIOWrapper(
+        io.BufferedWriter(FrameWriter(sock, channel, tty)),
+        encoding="utf-8",
+        line_buffering=True,
+        write_through=True,
+    )
+
+
+@contextlib.contextmanager
+def client_environment(request: dict, stdout: io.TextIOWrapper, stderr: io.TextIOWrapper):
+    """process wide state (cwd, env, std streams) of a forwarded command"""
+    from griffon.output import console
+
+    cwd = os.getcwd()
+    env = {name: os.environ.get(name) for name in FORWARDED_ENV}
+    # commands change the shared console for good (eg. --no-color, --width)
+    console_state = {
+        name: getattr(console, name)
+        for name in ("_color_system", "no_color", "highlighter", "_width")
+    }
+    stdin = io.TextIOWrapper(io.BytesIO(request.get("stdin", "").encode()), encoding="utf-8")
+    try:
+        os.chdir(request.get("cwd") or cwd)
+        for name in FORWARDED_ENV:
+            os.environ.pop(name, None)
+        os.environ.update(request.get("env", {}))
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            sys.stdin = stdin
+            # rich detects colors once, redo it for the client terminal
+            console._color_system = console._detect_color_system()
+            yield
+    finally:
+        sys.stdin = sys.__stdin__
+        for name, value in console_state.items():
+            setattr(console, name, value)
+        for name, value in env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        os.chdir(cwd)
+
+
+def completion_args(shell: str, env: Dict[str, str]) -> Tuple[List[str], str]:
+    """args and incomplete word of a completion request, read from env as click does"""
+    from click.shell_completion import split_arg_string
+
+    cwords = split_arg_string(env.get("COMP_WORDS", ""))
+    if shell == "fish":
+        # fish passes the incomplete word in both COMP_WORDS and COMP_CWORD
+        incomplete = env.get("COMP_CWORD", "")
+        if incomplete:
+            incomplete = split_arg_string(incomplete)[0]
+        args = cwords[1:]
+        if incomplete and args and args[-1] == incomplete:
+            args.pop()
+        return args, incomplete
+    cword = int(env.get("COMP_CWORD") or 0)
+    return cwords[1:cword], cwords[cword] if cword < len(cwords) else ""
+
+
+def complete(env: Dict[str, str]) -> Tuple[int, str]:
+    """
+    exit status and output of a shell completion request
+
+    completion runs without redirecting process wide state (std streams, environment),
+    so it does not wait for commands running on the daemon
+    """
+    from click.shell_completion import get_completion_class
+
+    from griffon.cli import cli
+
+    shell, _, instruction = env["_GRIFFON_COMPLETE"].partition("_")
+    completion_class = get_completion_class(shell)
+    if completion_class is None or instruction not in ("source", "complete"):
+        return 1, ""
+
+    class ForwardedComplete(completion_class):  # type: ignore
+        def get_completion_args(self) -> Tuple[List[str], str]:
+            return completion_args(shell, env)
+
+    completion = ForwardedComplete(cli, {}, "griffon", "_GRIFFON_COMPLETE")
+    if instruction == "source":
+        return 0, completion.source()
+    return 0, f"{completion.complete()}\n"
+
+
+def service_settings(environ) -> Dict[str, str]:
+    """settings of environ a command depends on, but which the daemon can not change"""
+    return {
+        name: value
+        for name, value in environ.items()
+        if name in SETTINGS_ENV or (name.startswith("GRIFFON_") and name not in CLIENT_ENV)
+    }
+
+
+def subcommand(argv: List[str]) -> Optional[str]:
+    """name of the command in argv, following any global options"""
+    import click
+
+    from griffon.cli import cli
+
+    try:
+        ctx = cli.make_context("griffon", list(argv), resilient_parsing=True)
+    except click.ClickException:
+        return None
+    args = [*ctx.protected_args, *ctx.args]
+    return args[0] if args else None
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    """run a single forwarded command"""
+
+    def handle(self) -> None:
+        from griffon.cli import cli
+
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if request.get("settings") != self.server.settings:  # type: ignore
+            # eg. another service url, the client runs the command itself
+            logger.debug("client settings differ from the daemon, running command locally")
+            self.run_locally()
+            return
+        env = request.get("env", {})
+        if env.get("_GRIFFON_COMPLETE"):
+            self.handle_completion(env)
+            return
+        if subcommand(request.get("argv", [])) in LOCAL_COMMANDS:
+            # eg. griffon -d serve, a nested daemon would take over the socket
+            self.run_locally()
+            return
+        tty = bool(request.get("tty"))
+        stdout = text_writer(self.connection, b"o", tty)
+        stderr = text_writer(self.connection, b"e", tty)
+        status = 0
+        # commands share process wide state, they run one at a time (completion does not)
+        with self.server.command_lock:  # type: ignore
+            with client_environment(request, stdout, stderr):
+                try:
+                    cli.main(args=request.get("argv", []), prog_name="griffon")
+                except SystemExit as exc:
+                    status = exc.code if isinstance(exc.code, int) else int(exc.code is not None)
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.debug("client went away")
+                    return
+                except Exception:
+                    logger.exception("forwarded command failed")
+                    status = 1
+                with contextlib.suppress(OSError, ValueError):
+                    stdout.flush()
+                    stderr.flush()
+        with contextlib.suppress(OSError):
+            send_frame(self.connection, b"x", str(status).encode())
+
+    def run_locally(self) -> None:
+        with contextlib.suppress(OSError):
+            send_frame(self.connection, b"l", b"")
+
+    def handle_completion(self, env: Dict[str, str]) -> None:
+        try:
+            status, output = complete(env)
+        except Exception:
+            logger.exception("forwarded completion failed")
+            status, output = 1, ""
+        with contextlib.suppress(OSError):
+            if output:
+                send_frame(self.connection, b"o", output.encode())
+            send_frame(self.connection, b"x", str(status).encode())
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str = SOCKET_PATH) -> None:
+        self.command_lock = threading.Lock()
+        self.settings = service_settings(os.environ)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        # commands run with the credentials of the owner, the socket must never be
+        # accessible to others, not even between bind and chmod
+        umask = os.umask(0o077)
+        try:
+            super().__init__(path, CommandHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(path, 0o600)
+
+    def server_close(self) -> None:
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.server_address)  # type: ignore
+
+
+def warm_up() -> None:
+    """import command modules and keep completion index in memory"""
+    import click
+
+    from griffon.autocomplete.index import completion_index
+    from griffon.cli import LazyGroup, cli
+
+    group = cast(LazyGroup, cli)
+    for name in list(group.lazy_subcommands):
+        group.get_command(click.Context(group), name)
+    completion_index.keep_in_memory = True
+
+
+def client_stdin(argv: List[str]) -> Optional[str]:
+    """
+    stdin forwarded with the command, None if the command has to run locally
+
+    Commands may read stdin without a - argument (eg. service batch). Reading stdin
+    which is not a terminal for every command would consume input meant for others
+    (eg. a while read loop), so only commands given - explicitly read it, other
+    commands with a piped or redirected stdin run locally. Prompts read an empty stdin.
+    """
+    try:
+        if sys.stdin.isatty():
+            return ""
+        devnull = os.path.samestat(os.fstat(sys.stdin.fileno()), os.stat(os.devnull))
+    except (AttributeError, OSError, ValueError):
+        # no, closed or replaced stdin
+        return ""
+    if "-" in argv or devnull:
+        return sys.stdin.read()
+    return None
+
+
+def forward(argv: List[str], path: str = SOCKET_PATH) -> Optional[int]:
+    """
+    run command on a running daemon, return its exit status
+
+    None when no daemon is listening on path (or it hands the command back, eg. serve
+    after global options or other service settings) or stdin can not be forwarded, the
+    command should run locally then
+    """
+    if os.getenv("GRIFFON_NO_DAEMON") or argv[:1] == ["serve"] or not os.path.exists(path):
+        return None
+    stdin = client_stdin(argv)
+    if stdin is None:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    env: Dict[str, str] = {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ}
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": env,
+        "settings": service_settings(os.environ),
+        "tty": sys.stdout.isatty(),
+        "stdin": stdin,
+    }
+    # streams of the client, taken before the daemon may redirect them (in process)
+    streams = {b"o": sys.stdout.buffer, b"e": sys.stderr.buffer}
+    with sock:
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        while True:
+            header = recv_exactly(sock, FRAME_HEADER.size)
+            if header is None:
+                return 1
+            channel, size = FRAME_HEADER.unpack(header)
+            payload = recv_exactly(sock, size) if size else b""
+            if payload is None:
+                return 1
+            if channel == b"x":
+                return int(payload)
+            if channel == b"l":
+                return None
+            try:
+                streams[channel].write(payload)
+                streams[channel].flush()
+            except BrokenPipeError:
+                # reader (eg. head) went away, closing the socket stops the command
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                return 0
+
+
+def main() -> None:
+    """griffon console script"""
+    status = forward(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+    from griffon.cli import cli
+
+    cli()
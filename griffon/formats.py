@@ -0,0 +1,18 @@
+"""
+    output formats
+
+    Choices of the --format and --table-format options, kept apart from griffon.output
+    so that the cli can declare them without importing rich.
+
+"""
+import enum
+
+
+class OUTPUT_FORMAT(enum.Enum):
+    JSON = "json"
+    JSONL = "jsonl"
+    TEXT = "text"
+    TABLE = "table"
+
+
+TABLE_FORMATS = ("csv", "tsv", "parquet", "arrow")
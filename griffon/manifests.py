@@ -0,0 +1,209 @@
+"""
+    local product stream manifest mirror
+
+    Manifests (spdx json, often tens of MB) are kept gzip compressed on disk together
+    with the ETag/Last-Modified of their last download. Every sync revalidates with a
+    conditional request, an unchanged manifest is answered with 304 and read locally.
+    When a manifest changes, packages added and removed since the previous sync are
+    recorded with it, both manifests are streamed (griffon.spdx) to compare them.
+
+"""
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from griffon import GRIFFON_CONFIG_DIR
+from griffon.spdx import iter_packages, package_purl
+
+logger = logging.getLogger("griffon")
+
+DEFAULT_MIRROR_DIR = os.path.join(GRIFFON_CONFIG_DIR, "manifests")
+CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 300
+
+
+def package_key(package: dict) -> str:
+    """purl of a manifest package, SPDXID when it has none"""
+    return (
+        package_purl(package)
+        or package.get("SPDXID")
+        or f"{package.get('name')}-{package.get('versionInfo')}"
+    )
+
+
+def package_keys(path: str) -> Set[str]:
+    with gzip.open(path, "rb") as f:
+        return {package_key(package) for package in iter_packages(f)}
+
+
+def isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+class ManifestMirror:
+    """
+    product stream manifests mirrored to directory
+
+    <stream>.json.gz holds the manifest, <stream>.meta.json its validators (etag,
+    last_modified, sha256), sync times and the diff to the previous manifest
+    """
+
+    def __init__(self, directory: str = DEFAULT_MIRROR_DIR) -> None:
+        self.directory = os.path.expanduser(directory)
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", name) + suffix)
+
+    def metadata(self, name: str) -> Dict[str, Any]:
+        try:
+            with open(self._path(name, ".meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_metadata(self, name: str, metadata: Dict[str, Any]) -> None:
+        path = self._path(name, ".meta.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(metadata, f)
+        os.replace(f"{path}.tmp", path)
+
+    def open(self, name: str) -> gzip.GzipFile:
+        """binary stream of the mirrored manifest, see griffon.spdx to read it incrementally"""
+        return gzip.open(self._path(name, ".json.gz"), "rb")
+
+    def load(self, name: str) -> Optional[dict]:
+        """mirrored manifest of product stream, None when never synced"""
+        try:
+            with self.open(name) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.debug(f"no mirrored manifest of {name}: {exc}")
+            return None
+
+    def sync(self, name: str, url: str, force: bool = False) -> None:
+        """
+        mirror manifest of product stream, downloading it only when it changed
+
+        force skips revalidation and downloads the manifest, the mirrored copy is
+        kept (with a warning) when the manifest service can not be reached
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = self.metadata(name)
+        mirrored = os.path.exists(self._path(name, ".json.gz")) and metadata.get("url") == url
+        headers = {}
+        if mirrored and not force:
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+        tmp = self._path(name, ".json.gz.tmp")
+        try:
+            self._fetch(name, url, headers, metadata, mirrored)
+        finally:
+            # failed (or unchanged) downloads leave no partial file in the mirror
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+
+    def _fetch(
+        self, name: str, url: str, headers: Dict[str, str], metadata: Dict[str, Any], mirrored: bool
+    ) -> None:
+        """download manifest into its temporary file, replacing the mirrored one if changed"""
+        import requests
+
+        from griffon import get_http_session, host_limits
+
+        try:
+            with host_limits.limit_for(url):
+                response = get_http_session().get(
+                    url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT
+                )
+                if response.status_code == 304:
+                    logger.debug(f"{name} manifest not modified")
+                    response.close()
+                    self._unchanged(name, metadata, response)
+                    return
+                response.raise_for_status()
+                digest = self._download(name, response)
+        except requests.RequestException as exc:
+            if not mirrored:
+                raise
+            logger.warning(f"could not sync {name} manifest, using mirrored copy: {exc}")
+            return
+
+        tmp = self._path(name, ".json.gz.tmp")
+        if mirrored and digest == metadata.get("sha256"):
+            self._unchanged(name, metadata, response)
+            return
+        if mirrored:
+            current_keys = package_keys(tmp)
+            previous_keys = package_keys(self._path(name, ".json.gz"))
+            metadata["added"] = sorted(current_keys - previous_keys)
+            metadata["removed"] = sorted(previous_keys - current_keys)
+            metadata["previous_sync"] = metadata.get("synced")
+        else:
+            # changes of a previous download (eg. of another url) are not this manifest's
+            for key in ("added", "removed", "previous_sync"):
+                metadata.pop(key, None)
+        os.replace(tmp, self._path(name, ".json.gz"))
+        now = time.time()
+        metadata.update(
+            url=url,
+            sha256=digest,
+            synced=now,
+            checked=now,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self._write_metadata(name, metadata)
+
+    def _download(self, name: str, response) -> str:
+        """stream response body into compressed temporary file, return its sha256"""
+        digest = hashlib.sha256()
+        with gzip.open(self._path(name, ".json.gz.tmp"), "wb", compresslevel=6) as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    def _unchanged(self, name: str, metadata: Dict[str, Any], response) -> None:
+        metadata["checked"] = time.time()
+        # servers may only send validators with full responses
+        metadata["etag"] = response.headers.get("ETag") or metadata.get("etag")
+        metadata["last_modified"] = response.headers.get("Last-Modified") or metadata.get(
+            "last_modified"
+        )
+        self._write_metadata(name, metadata)
+
+    def diff(self, name: str) -> Dict[str, Any]:
+        """packages added and removed by the last change of the mirrored manifest"""
+        metadata = self.metadata(name)
+        return {
+            "product_stream": name,
+            "synced": isoformat(metadata.get("synced")),
+            "previous_sync": isoformat(metadata.get("previous_sync")),
+            "added": metadata.get("added", []),
+            "removed": metadata.get("removed", []),
+        }
+
+
+manifest_mirror = ManifestMirror()
+
+
+def open_manifest_url(url: str):
+    """binary stream of a manifest downloaded without mirroring it (eg. component manifests)"""
+    from griffon import get_http_session, host_limits
+
+    with host_limits.limit_for(url):
+        response = get_http_session().get(url, stream=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    return response.raw
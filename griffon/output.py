@@ -1,7 +1,9 @@
 import enum
 import json
 import logging
+import os
 import re
+import sys
 
 import click
 from packageurl import PackageURL
@@ -9,22 +11,93 @@ from rich.console import Console
 from rich.text import Text
 from rich.tree import Tree
 
+from griffon.formats import OUTPUT_FORMAT
+from griffon.spdx import package_purl
+from griffon.table import Table
+from griffon.timings import timings
+
 console = Console(color_system="auto")
 
 logger = logging.getLogger("griffon")
 
 
-class OUTPUT_FORMAT(enum.Enum):
-    JSON = "json"
-    TEXT = "text"
-    TABLE = "table"
-
-
 class DEST(enum.Enum):
     CONSOLE = "console"
     FILE = "file"
 
 
+class ExclusionMatcher:
+    """
+    profile exclude entries compiled into a single pattern
+
+    Entries are matched literally, except for .* matching any characters (eg. amq-.*),
+    entries prefixed with re: are regexes (eg. re:rhel-[78]). With full_match whole
+    names are compared (product versions), otherwise entries match anywhere in the name
+    (component name suffixes). Results are memoised, rows of large result sets share few
+    distinct names.
+    """
+
+    REGEX_PREFIX = "re:"
+
+    def __init__(self, entries, full_match=False):
+        self.entries = [entry.strip() for entry in entries if entry and entry.strip()]
+        self.full_match = full_match
+        alternatives = [self.alternative(entry) for entry in self.entries]
+        try:
+            self.pattern = re.compile("|".join(alternatives))
+        except re.error as exc:
+            # eg. regex entries reusing a group name
+            logger.warning(f"invalid exclude entries {self.entries} ({exc}), matching literally")
+            self.pattern = re.compile(
+                "|".join(
+                    self.literal(entry.removeprefix(self.REGEX_PREFIX)) for entry in self.entries
+                )
+            )
+        self._matches = {}
+
+    @staticmethod
+    def literal(entry):
+        """entry matched literally, .* matching any characters"""
+        return "(?:" + ".*".join(re.escape(part) for part in entry.split(".*")) + ")"
+
+    @classmethod
+    def alternative(cls, entry):
+        """pattern matching entry, an invalid regex entry is matched literally"""
+        if not entry.startswith(cls.REGEX_PREFIX):
+            return cls.literal(entry)
+        regex = entry.removeprefix(cls.REGEX_PREFIX)
+        try:
+            re.compile(f"(?:{regex})")
+        except re.error as exc:
+            logger.warning(f"invalid exclude regex {entry!r} ({exc}), matching it literally")
+            return cls.literal(regex)
+        return f"(?:{regex})"
+
+    @classmethod
+    def from_config(cls, profile, option, full_match=False):
+        from griffon import get_config_option
+
+        value = get_config_option(profile, option)
+        return cls(value.split("\n") if value else [], full_match=full_match)
+
+    def __contains__(self, name):
+        """True if name is excluded"""
+        if not self.entries or not name:
+            return False
+        if name not in self._matches:
+            if self.full_match:
+                self._matches[name] = self.pattern.fullmatch(name) is not None
+            else:
+                self._matches[name] = self.pattern.search(name) is not None
+        return self._matches[name]
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.entries})"
+
+
 def raw_json_transform(data, show_count: bool) -> dict:
     """normalise all data to dict"""
     if type(data) is list:
@@ -47,6 +120,88 @@ def raw_json_transform(data, show_count: bool) -> dict:
     return output
 
 
+# result fields read by text renderers, as (from verbosity, fields), queries request
+# only these (see griffon.services.project_fields) for text output
+OUTPUT_FIELDS = {
+    "products-contain-component": [
+        (0, ["name", "nvr", "product_streams.name", "product_streams.product_versions"]),
+        (1, ["related_url", "upstreams.name", "sources.name"]),
+        (2, ["software_build"]),
+        (4, ["upstreams.nvr", "sources.nvr"]),
+    ],
+    "component-flaws": [(0, ["name", "affects"]), (2, ["title"])],
+    "product-flaws": [(0, ["name", "affects"]), (2, ["title"])],
+}
+
+# nested lists exploded into one table row per item
+TABLE_ROWS = {
+    "component-flaws": "affects",
+    "product-flaws": "affects",
+}
+
+
+def output_fields(ctx):
+    """result fields the text renderer reads, None when all fields are output"""
+    if ctx.obj.get("FORMAT") != OUTPUT_FORMAT.TEXT.value or ctx.info_name not in OUTPUT_FIELDS:
+        return None
+    verbosity = ctx.obj.get("VERBOSE", 0)
+    if ctx.params.get("affect_mode"):
+        verbosity = 0
+    return [
+        field
+        for min_verbosity, fields in OUTPUT_FIELDS[ctx.info_name]
+        if verbosity >= min_verbosity
+        for field in fields
+    ]
+
+
+def streamed_output(ctx) -> bool:
+    """True if results are consumed page by page (jsonl, table) rather than collected"""
+    return bool(
+        ctx and ctx.obj.get("FORMAT") in (OUTPUT_FORMAT.JSONL.value, OUTPUT_FORMAT.TABLE.value)
+    )
+
+
+def iter_pages(data):
+    """pages of results from a single result, a list of results or an iterable of pages"""
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+    elif isinstance(data, dict) or hasattr(data, "to_dict"):
+        data = [data]
+    if isinstance(data, list):
+        yield data
+        return
+    yield from data
+
+
+def jsonl_output(data, file=None) -> None:
+    """
+    write one json document per line, flushed as soon as each page is written
+
+    data may be a single result, a list of results or an iterable of result pages
+    (eg. Paginator), pages are written as they arrive and never collected
+    """
+    out = file or sys.stdout
+    try:
+        for page in iter_pages(data):
+            for record in page if isinstance(page, list) else [page]:
+                if not isinstance(record, dict):
+                    record = record.to_dict()
+                out.write(json.dumps(record, default=str))
+                out.write("\n")
+            out.flush()
+    except BrokenPipeError:
+        # reader (eg. head) went away, silence the error on interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+
+
+def table_output(ctx, data) -> None:
+    """write results as a csv/tsv/parquet/arrow table"""
+    table = Table.from_records(iter_pages(data), explode=TABLE_ROWS.get(ctx.info_name))
+    logger.debug(f"writing table of {len(table)} rows, {len(table.columns)} columns")
+    table.write(ctx.obj.get("TABLE_FORMAT"), ctx.obj.get("TABLE_FILE"))
+
+
 def entity_type(data):
     entity_type = "unknown"
     if "cve_id" in data:
@@ -155,6 +310,29 @@ def text_output_product_summary(ctx, output, format, exclude_products, no_wrap=F
     ctx.exit()
 
 
+def group_rows(rows, keys):
+    """
+    group rows into nested dicts, one level per key, in a single pass
+
+    all levels but the last are sorted, the last level maps its key to the row in
+    arrival order (a later row with the same key replaces the earlier one)
+    """
+    *branch_keys, leaf_key = keys
+    tree: dict = {}
+    for row in rows:
+        node = tree
+        for key in branch_keys:
+            node = node.setdefault(row[key], {})
+        node[row[leaf_key]] = row
+    return _sort_levels(tree, len(branch_keys))
+
+
+def _sort_levels(node, depth):
+    if depth == 0:
+        return node
+    return {key: _sort_levels(node[key], depth - 1) for key in sorted(node)}
+
+
 def text_output_products_contain_component(
     ctx, output, exclude_products, exclude_components, no_wrap=False
 ):
@@ -183,7 +361,7 @@ def text_output_products_contain_component(
             for item in output["results"]:
                 for ps in item["product_streams"]:
                     if ps["product_versions"][0]["name"] not in exclude_products:
-                        if not any([match in item["name"] for match in exclude_components]):
+                        if item["name"] not in exclude_components:
                             c = {
                                 "product_version": ps["product_versions"][0]["name"],
                                 "product_stream": ps.get("name"),
@@ -201,46 +379,14 @@ def text_output_products_contain_component(
                             if "software_build" in item:
                                 c["build_source_url"] = item["software_build"].get("source")
                             normalised_results.append(c)
-        product_versions = sorted(
-            list(set([item["product_version"] for item in normalised_results]))
+        # product_version -> product_stream -> component name -> nvr -> component
+        result_tree = group_rows(
+            normalised_results, ("product_version", "product_stream", "name", "nvr")
         )
-        result_tree = {}
-        for pv in product_versions:
-            result_tree[pv] = {}
-            product_streams = sorted(
-                list(
-                    set(
-                        [
-                            item["product_stream"]
-                            for item in normalised_results
-                            if item["product_version"] == pv
-                        ]
-                    )
-                )
-            )
-            for ps in product_streams:
-                result_tree[pv][ps] = {}
-                component_names = sorted(
-                    list(
-                        set(
-                            [
-                                item["name"]
-                                for item in normalised_results
-                                if item["product_stream"] == ps
-                            ]
-                        )
-                    )
-                )
-                for cn in component_names:
-                    result_tree[pv][ps][cn] = {}
-                    nvrs = [
-                        item
-                        for item in normalised_results
-                        if item["product_stream"] == ps and item["name"] == cn
-                    ]
 
-                    for nvr in nvrs:
-                        result_tree[pv][ps][cn][nvr["nvr"]] = nvr
+        component_names_by_version = {
+            pv: {cn for ps in streams.values() for cn in ps} for pv, streams in result_tree.items()
+        }
 
         # TODO - MAVEN component type will require special handling
         if ctx.params["affect_mode"]:
@@ -255,9 +401,7 @@ def text_output_products_contain_component(
                 flaw_operation = "update"
 
             for pv in result_tree.keys():
-                component_names = set()
-                for ps in result_tree[pv].keys():
-                    component_names.update(result_tree[pv][ps].keys())
+                component_names = set(component_names_by_version[pv])
                 # we should only show component name if both {component name} and {component name-container} exists # noqa
                 if (
                     search_component_name in component_names
@@ -265,19 +409,17 @@ def text_output_products_contain_component(
                 ):
                     component_names.remove(f"{search_component_name}-container")
                 for cn in component_names:
-                    # ensure {component name} is not in profile exclude components enum
-                    if not any([match in cn for match in exclude_components]):
-                        console.print(
-                            f"{pv}/{cn}={flaw_operation}",
-                            no_wrap=no_wrap,
-                        )
+                    console.print(
+                        f"{pv}/{cn}={flaw_operation}",
+                        no_wrap=no_wrap,
+                    )
         else:
 
             if ctx.obj["VERBOSE"] == 0:  # product_version X component_name
+                # component names repeat across product versions, highlight each once
+                deps = {}
                 for pv in result_tree.keys():
-                    component_names = set()
-                    for ps in result_tree[pv].keys():
-                        component_names.update(result_tree[pv][ps].keys())
+                    component_names = set(component_names_by_version[pv])
                     # we should only show component name if both {component name} and {component name-container} exists # noqa
                     if (
                         search_component_name in component_names
@@ -285,313 +427,297 @@ def text_output_products_contain_component(
                     ):
                         component_names.remove(f"{search_component_name}-container")
                     for cn in component_names:
-                        # ensure {component name} is not in profile exclude components enum
-                        if not any([match in cn for match in exclude_components]):
-                            # highlight search term
+                        # highlight search term
+                        if cn not in deps:
                             dep_name = re.sub(cn, f"[b]{cn}[/b]", cn)
-                            dep = f"[grey93]{dep_name}[/grey93]"
-                            console.print(
-                                Text(pv, style="magenta b u"),
-                                dep,
-                                no_wrap=no_wrap,
-                            )
+                            deps[cn] = f"[grey93]{dep_name}[/grey93]"
+                        console.print(
+                            Text(pv, style="magenta b u"),
+                            deps[cn],
+                            no_wrap=no_wrap,
+                        )
             if ctx.obj["VERBOSE"] == 1:  # product_stream X nvr x related_url
                 for pv in result_tree.keys():
                     for ps in result_tree[pv].keys():
                         for cn in result_tree[pv][ps].keys():
-                            # ensure {component name} is not in profile exclude components enum
-                            if not any([match in cn for match in exclude_components]):
-                                # select the latest nvr (from sorted list)
-                                nvr = list(result_tree[pv][ps][cn].keys())[-1]
-                                # highlight search term
-                                dep_name = re.sub(
+                            # select the latest nvr (from sorted list)
+                            nvr = next(reversed(result_tree[pv][ps][cn]))
+                            # highlight search term
+                            dep_name = re.sub(
+                                search_component_name,
+                                f"[b]{search_component_name}[/b]",
+                                nvr,
+                            )
+                            dep = f"[grey93]{dep_name}[/grey93]"
+                            related_url = ""
+                            if result_tree[pv][ps][cn][nvr]["related_url"]:
+                                related_url = re.sub(
                                     search_component_name,
                                     f"[b]{search_component_name}[/b]",
-                                    nvr,
+                                    result_tree[pv][ps][cn][nvr]["related_url"],
+                                )
+                            upstream_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["upstreams"]
+                                    ]
                                 )
-                                dep = f"[grey93]{dep_name}[/grey93]"
-                                related_url = ""
-                                if result_tree[pv][ps][cn][nvr]["related_url"]:
-                                    related_url = re.sub(
-                                        search_component_name,
-                                        f"[b]{search_component_name}[/b]",
-                                        result_tree[pv][ps][cn][nvr]["related_url"],
-                                    )
-                                upstream_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["upstreams"]
-                                        ]
-                                    )
+                            )
+                            if len(upstream_component_names) > 0:
+                                upstream_component_name = (
+                                    f"[cyan]{upstream_component_names[0]}[/cyan]"
+                                )
+                                if len(upstream_component_names) > 1:
+                                    upstream_component_name = f"[cyan]{upstream_component_names[0]} and {len(upstream_component_names) - 1} more[/cyan]"  # noqa
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    upstream_component_name,
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                if len(upstream_component_names) > 0:
-                                    upstream_component_name = (
-                                        f"[cyan]{upstream_component_names[0]}[/cyan]"
-                                    )
-                                    if len(upstream_component_names) > 1:
-                                        upstream_component_name = f"[cyan]{upstream_component_names[0]} and {len(upstream_component_names) - 1} more[/cyan]"  # noqa
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        upstream_component_name,
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                source_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["sources"]
-                                        ]
-                                    )
+                            source_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["sources"]
+                                    ]
+                                )
+                            )
+                            if len(source_component_names) > 0:
+                                source_component_name = f"[red]{source_component_names[0]}[/red]"
+                                if len(source_component_names) > 1:
+                                    source_component_name = f"[red]{source_component_names[0]} and {len(source_component_names) - 1} more[/red]"  # noqa
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    source_component_name,
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            if (
+                                len(result_tree[pv][ps][cn][nvr]["upstreams"]) == 0
+                                and len(result_tree[pv][ps][cn][nvr]["sources"]) == 0
+                            ):
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                if len(source_component_names) > 0:
-                                    source_component_name = (
-                                        f"[red]{source_component_names[0]}[/red]"
-                                    )
-                                    if len(source_component_names) > 1:
-                                        source_component_name = f"[red]{source_component_names[0]} and {len(source_component_names) - 1} more[/red]"  # noqa
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        source_component_name,
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                if (
-                                    len(result_tree[pv][ps][cn][nvr]["upstreams"]) == 0
-                                    and len(result_tree[pv][ps][cn][nvr]["sources"]) == 0
-                                ):
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
             if ctx.obj["VERBOSE"] == 2:  # product_stream X nvr x related_url x build_source_url
                 for pv in result_tree.keys():
                     for ps in result_tree[pv].keys():
                         for cn in result_tree[pv][ps].keys():
-                            if not any([match in cn for match in exclude_components]):
-                                # select the latest nvr (from sorted list)
-                                nvr = list(result_tree[pv][ps][cn].keys())[-1]
-                                dep_name = re.sub(
+                            # select the latest nvr (from sorted list)
+                            nvr = next(reversed(result_tree[pv][ps][cn]))
+                            dep_name = re.sub(
+                                search_component_name,
+                                f"[b]{search_component_name}[/b]",
+                                nvr,
+                            )
+                            dep = f"[grey93]{dep_name}[/grey93]"
+                            related_url = ""
+                            if result_tree[pv][ps][cn][nvr]["related_url"]:
+                                related_url = re.sub(
                                     search_component_name,
                                     f"[b]{search_component_name}[/b]",
-                                    nvr,
+                                    result_tree[pv][ps][cn][nvr]["related_url"],
+                                )
+                            build_source_url = ""
+                            if result_tree[pv][ps][cn][nvr]["build_source_url"]:
+                                build_source_url = result_tree[pv][ps][cn][nvr]["build_source_url"]
+                            upstream_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["upstreams"]
+                                    ]
+                                )
+                            )
+                            if len(upstream_component_names) > 0:
+                                upstream_component_name = (
+                                    f"[cyan]{upstream_component_names[0]}[/cyan]"
+                                )
+                                if len(upstream_component_names) > 1:
+                                    upstream_component_name = f"[cyan]{upstream_component_names[0]} and {len(upstream_component_names) - 1} more[/cyan]"  # noqa
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    upstream_component_name,
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                dep = f"[grey93]{dep_name}[/grey93]"
-                                related_url = ""
-                                if result_tree[pv][ps][cn][nvr]["related_url"]:
-                                    related_url = re.sub(
-                                        search_component_name,
-                                        f"[b]{search_component_name}[/b]",
-                                        result_tree[pv][ps][cn][nvr]["related_url"],
-                                    )
-                                build_source_url = ""
-                                if result_tree[pv][ps][cn][nvr]["build_source_url"]:
-                                    build_source_url = result_tree[pv][ps][cn][nvr][
-                                        "build_source_url"
+                            source_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["sources"]
                                     ]
-                                upstream_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["upstreams"]
-                                        ]
-                                    )
                                 )
-                                if len(upstream_component_names) > 0:
-                                    upstream_component_name = (
-                                        f"[cyan]{upstream_component_names[0]}[/cyan]"
-                                    )
-                                    if len(upstream_component_names) > 1:
-                                        upstream_component_name = f"[cyan]{upstream_component_names[0]} and {len(upstream_component_names) - 1} more[/cyan]"  # noqa
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        upstream_component_name,
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                source_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["sources"]
-                                        ]
-                                    )
+                            )
+                            if len(source_component_names) > 0:
+                                source_component_name = f"[red]{source_component_names[0]}[/red]"
+                                if len(source_component_names) > 1:
+                                    source_component_name = f"[red]{source_component_names[0]} and {len(source_component_names) - 1} more[/red]"  # noqa
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    source_component_name,
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            if (
+                                len(result_tree[pv][ps][cn][nvr]["upstreams"]) == 0
+                                and len(result_tree[pv][ps][cn][nvr]["sources"]) == 0
+                            ):
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                if len(source_component_names) > 0:
-                                    source_component_name = (
-                                        f"[red]{source_component_names[0]}[/red]"
-                                    )
-                                    if len(source_component_names) > 1:
-                                        source_component_name = f"[red]{source_component_names[0]} and {len(source_component_names) - 1} more[/red]"  # noqa
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        source_component_name,
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                if (
-                                    len(result_tree[pv][ps][cn][nvr]["upstreams"]) == 0
-                                    and len(result_tree[pv][ps][cn][nvr]["sources"]) == 0
-                                ):
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
             if (
                 ctx.obj["VERBOSE"] == 3
             ):  # product_stream X nvr (full source/upstreams) x related_url x build_source_url
                 for pv in result_tree.keys():
                     for ps in result_tree[pv].keys():
                         for cn in result_tree[pv][ps].keys():
-                            if not any([match in cn for match in exclude_components]):
-                                # select the latest nvr (from sorted list)
-                                nvr = list(result_tree[pv][ps][cn].keys())[-1]
-                                dep_name = re.sub(
+                            # select the latest nvr (from sorted list)
+                            nvr = next(reversed(result_tree[pv][ps][cn]))
+                            dep_name = re.sub(
+                                search_component_name,
+                                f"[b]{search_component_name}[/b]",
+                                nvr,
+                            )
+                            dep = f"[grey93]{dep_name}[/grey93]"
+                            related_url = ""
+                            if result_tree[pv][ps][cn][nvr]["related_url"]:
+                                related_url = re.sub(
                                     search_component_name,
                                     f"[b]{search_component_name}[/b]",
-                                    nvr,
+                                    result_tree[pv][ps][cn][nvr]["related_url"],
                                 )
-                                dep = f"[grey93]{dep_name}[/grey93]"
-                                related_url = ""
-                                if result_tree[pv][ps][cn][nvr]["related_url"]:
-                                    related_url = re.sub(
-                                        search_component_name,
-                                        f"[b]{search_component_name}[/b]",
-                                        result_tree[pv][ps][cn][nvr]["related_url"],
-                                    )
-                                build_source_url = ""
-                                if result_tree[pv][ps][cn][nvr]["build_source_url"]:
-                                    build_source_url = result_tree[pv][ps][cn][nvr][
-                                        "build_source_url"
+                            build_source_url = ""
+                            if result_tree[pv][ps][cn][nvr]["build_source_url"]:
+                                build_source_url = result_tree[pv][ps][cn][nvr]["build_source_url"]
+                            upstream_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["upstreams"]
                                     ]
-                                upstream_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["upstreams"]
-                                        ]
-                                    )
                                 )
-                                for upstream_name in upstream_component_names:
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        f"[cyan]{upstream_name}[/cyan]",
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                source_component_names = list(
-                                    set(
-                                        [
-                                            source["name"]
-                                            for source in result_tree[pv][ps][cn][nvr]["sources"]
-                                        ]
-                                    )
+                            )
+                            for upstream_name in upstream_component_names:
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    f"[cyan]{upstream_name}[/cyan]",
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            source_component_names = list(
+                                set(
+                                    [
+                                        source["name"]
+                                        for source in result_tree[pv][ps][cn][nvr]["sources"]
+                                    ]
+                                )
+                            )
+                            for source_name in source_component_names:
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    f"[light_blue]{source_name}[/light_blue]",
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            if (
+                                not result_tree[pv][ps][cn][nvr]["upstreams"]
+                                and not result_tree[pv][ps][cn][nvr]["sources"]
+                            ):
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                for source_name in source_component_names:
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        f"[light_blue]{source_name}[/light_blue]",
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                if (
-                                    not result_tree[pv][ps][cn][nvr]["upstreams"]
-                                    and not result_tree[pv][ps][cn][nvr]["sources"]
-                                ):
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
             if (
                 ctx.obj["VERBOSE"] > 3
             ):  # product_stream X nvr (full source/upstreams) x related_url x build_source_url
                 for pv in result_tree.keys():
                     for ps in result_tree[pv].keys():
                         for cn in result_tree[pv][ps].keys():
-                            if not any([match in cn for match in exclude_components]):
-                                # select the latest nvr (from sorted list)
-                                nvr = list(result_tree[pv][ps][cn].keys())[-1]
-                                dep_name = re.sub(
+                            # select the latest nvr (from sorted list)
+                            nvr = next(reversed(result_tree[pv][ps][cn]))
+                            dep_name = re.sub(
+                                search_component_name,
+                                f"[b]{search_component_name}[/b]",
+                                nvr,
+                            )
+                            dep = f"[grey93]{dep_name}[/grey93]"
+                            related_url = ""
+                            if result_tree[pv][ps][cn][nvr]["related_url"]:
+                                related_url = re.sub(
                                     search_component_name,
                                     f"[b]{search_component_name}[/b]",
-                                    nvr,
+                                    result_tree[pv][ps][cn][nvr]["related_url"],
                                 )
-                                dep = f"[grey93]{dep_name}[/grey93]"
-                                related_url = ""
-                                if result_tree[pv][ps][cn][nvr]["related_url"]:
-                                    related_url = re.sub(
-                                        search_component_name,
-                                        f"[b]{search_component_name}[/b]",
-                                        result_tree[pv][ps][cn][nvr]["related_url"],
-                                    )
-                                build_source_url = ""
-                                if result_tree[pv][ps][cn][nvr]["build_source_url"]:
-                                    build_source_url = result_tree[pv][ps][cn][nvr][
-                                        "build_source_url"
+                            build_source_url = ""
+                            if result_tree[pv][ps][cn][nvr]["build_source_url"]:
+                                build_source_url = result_tree[pv][ps][cn][nvr]["build_source_url"]
+                            upstream_component_names = list(
+                                set(
+                                    [
+                                        source["nvr"]
+                                        for source in result_tree[pv][ps][cn][nvr]["upstreams"]
                                     ]
-                                upstream_component_names = list(
-                                    set(
-                                        [
-                                            source["nvr"]
-                                            for source in result_tree[pv][ps][cn][nvr]["upstreams"]
-                                        ]
-                                    )
                                 )
-                                for upstream_name in upstream_component_names:
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        f"[cyan]{upstream_name}[/cyan]",
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                source_component_names = list(
-                                    set(
-                                        [
-                                            source["nvr"]
-                                            for source in result_tree[pv][ps][cn][nvr]["sources"]
-                                        ]
-                                    )
+                            )
+                            for upstream_name in upstream_component_names:
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    f"[cyan]{upstream_name}[/cyan]",
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            source_component_names = list(
+                                set(
+                                    [
+                                        source["nvr"]
+                                        for source in result_tree[pv][ps][cn][nvr]["sources"]
+                                    ]
+                                )
+                            )
+                            for source_name in source_component_names:
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    f"[light_blue]{source_name}[/light_blue]",
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
+                                )
+                            if (
+                                not result_tree[pv][ps][cn][nvr]["upstreams"]
+                                and not result_tree[pv][ps][cn][nvr]["sources"]
+                            ):
+                                console.print(
+                                    Text(ps, style="magenta b u"),
+                                    dep,
+                                    f"([grey]{related_url}[/grey])",
+                                    f"([grey]{build_source_url}[/grey])",
+                                    no_wrap=no_wrap,
                                 )
-                                for source_name in source_component_names:
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        f"[light_blue]{source_name}[/light_blue]",
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
-                                if (
-                                    not result_tree[pv][ps][cn][nvr]["upstreams"]
-                                    and not result_tree[pv][ps][cn][nvr]["sources"]
-                                ):
-                                    console.print(
-                                        Text(ps, style="magenta b u"),
-                                        dep,
-                                        f"([grey]{related_url}[/grey])",
-                                        f"([grey]{build_source_url}[/grey])",
-                                        no_wrap=no_wrap,
-                                    )
 
         ctx.exit()
 
@@ -606,7 +732,7 @@ def text_output_components_contain_component(
             related_url = item["related_url"]
             download_url = item["download_url"]
             arch = item["arch"]
-            if not any([match in component_name for match in exclude_components]):
+            if component_name not in exclude_components:
                 if ctx.obj["VERBOSE"] == 0:
                     ordered_sources = sorted(item["sources"], key=lambda d: d["purl"])
                     for source in ordered_sources:
@@ -722,6 +848,7 @@ def text_output_components_affected_by_cve(ctx, output, format, no_wrap=False):
                     Text(component["download_url"], style="i"),
                     no_wrap=no_wrap,
                 )
+    text_output_lookup_errors(output)
     ctx.exit()
 
 
@@ -743,29 +870,77 @@ def text_output_products_affected_by_cve(ctx, output, format, exclude_products,
         ordered_product_streams = sorted(output["product_streams"])
         for product_stream in ordered_product_streams:
             console.print(Text(product_stream, style="bold magenta u"), no_wrap=True)
+    text_output_lookup_errors(output)
     ctx.exit()
 
 
-def text_output_get_manifest(ctx, output, format, no_wrap=False):
-    if not ctx.obj["SHOW_PURL"]:
-        for component in output["packages"]:
-            if "pkg:" in component["externalRefs"][0]["referenceLocator"]:
-                purl = PackageURL.from_string(component["externalRefs"][0]["referenceLocator"])
-                ns = "[cyan]UPSTREAM[/cyan]"
-                component = f"([bold turquoise2]{ns}[/bold turquoise2] [white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
-                if purl.namespace == "redhat":
-                    ns = f"[red]{purl.namespace.upper()}[/red]"
-                    component = f"([white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
-                else:
-                    if purl.namespace:
-                        ns = f"[white]{purl.namespace.upper()}[/white]"
-                    component = f"([white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
-                console.print(ns, component, no_wrap=no_wrap)  # noqa
+def text_output_lookup_errors(output):
+    """report components which could not be looked up, results are incomplete"""
+    for error in output.get("errors", []):
+        console.print(
+            f"[red]could not look up {error['ps_component']}:[/red] {error['error']}",
+            highlight=False,
+        )
+
+
+def text_output_manifest_package(ctx, component, no_wrap=False):
+    locator = package_purl(component)
+    if not locator:
+        return
+    if ctx.obj["SHOW_PURL"]:
+        console.print(locator, no_wrap=no_wrap)  # noqa
+        return
+    purl = PackageURL.from_string(locator)
+    ns = "[cyan]UPSTREAM[/cyan]"
+    component = f"([bold turquoise2]{ns}[/bold turquoise2] [white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
+    if purl.namespace == "redhat":
+        ns = f"[red]{purl.namespace.upper()}[/red]"
+        component = f"([white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
     else:
-        for component in output["packages"]:
-            purl = component["externalRefs"][0]["referenceLocator"]
-            console.print(purl, no_wrap=no_wrap)  # noqa
+        if purl.namespace:
+            ns = f"[white]{purl.namespace.upper()}[/white]"
+        component = f"([white]{purl.name}-{purl.version}[/white],{component_type_style(purl.type.upper())})"  # noqa
+    console.print(ns, component, no_wrap=no_wrap)  # noqa
 
+
+def text_output_get_manifest(ctx, output, format, no_wrap=False):
+    for component in output["packages"]:
+        text_output_manifest_package(ctx, component, no_wrap=no_wrap)
+    ctx.exit()
+
+
+def manifest_output(ctx, packages) -> None:
+    """
+    output manifest packages as they are read (eg. griffon.spdx.ManifestFilter)
+
+    text, jsonl and table output never collect packages
+    """
+    if ctx.obj["FORMAT"] != OUTPUT_FORMAT.TEXT.value:
+        cprint(packages if streamed_output(ctx) else list(packages), ctx=ctx)
+    if ctx.obj["NO_COLOR"]:
+        console.no_color = True
+    console.width = int(ctx.obj["TERMINAL_WIDTH"])
+    for package in packages:
+        text_output_manifest_package(ctx, package, no_wrap=ctx.obj["NO_WRAP"])
+    ctx.exit()
+
+
+def text_output_manifest_diff(ctx, output, format, no_wrap=False):
+    if not output["previous_sync"]:
+        console.print(
+            f"{output['product_stream']} manifest synced {output['synced']}, no earlier sync",
+            highlight=False,
+        )
+        ctx.exit()
+    console.print(
+        f"{output['product_stream']} manifest changed {output['previous_sync']} -> "
+        f"{output['synced']}: {len(output['added'])} added, {len(output['removed'])} removed",
+        highlight=False,
+    )
+    for purl in output["added"]:
+        console.print(f"[green]+ {purl}[/green]", no_wrap=no_wrap, highlight=False)
+    for purl in output["removed"]:
+        console.print(f"[red]- {purl}[/red]", no_wrap=no_wrap, highlight=False)
     ctx.exit()
 
 
@@ -863,7 +1038,7 @@ def text_output_list(ctx, output, format, exclude_components, no_wrap=False):
         if "purl" in output["results"][0]:
             ordered_components = sorted(output["results"], key=lambda d: d["name"])
             for row in ordered_components:
-                if not any([match in row["purl"] for match in exclude_components]):
+                if row["purl"] not in exclude_components:
                     if "purl" in row:
                         purl = PackageURL.from_string(row["purl"])
                         if purl.type == "oci":
@@ -1002,6 +1177,7 @@ def text_output_generic(ctx, output, format, no_wrap=False):
         console.print(key_name, " : ", v, no_wrap=no_wrap)
 
 
+@timings.timed("render")
 def cprint(
     data,
     dest=DEST.CONSOLE,
@@ -1010,16 +1186,17 @@ def cprint(
     show_count: bool = True,
 ):
     """handle format and output"""
-    from griffon import get_config_option
+    if streamed_output(ctx):
+        if ctx.obj["FORMAT"] == OUTPUT_FORMAT.TABLE.value:
+            table_output(ctx, data)
+        else:
+            jsonl_output(data)
+        exit(0)
 
-    exclude_products = []
-    if get_config_option(ctx.obj["PROFILE"], "exclude"):
-        exclude_products = get_config_option(ctx.obj["PROFILE"], "exclude").split("\n")
+    exclude_products = ExclusionMatcher.from_config(ctx.obj["PROFILE"], "exclude", full_match=True)
     logger.debug(f"exclude products = {exclude_products}")
 
-    exclude_components = []
-    if get_config_option(ctx.obj["PROFILE"], "exclude_components"):
-        exclude_components = get_config_option(ctx.obj["PROFILE"], "exclude_components").split("\n")
+    exclude_components = ExclusionMatcher.from_config(ctx.obj["PROFILE"], "exclude_components")
     logger.debug(f"exclude_components = {exclude_components}")
 
     output = raw_json_transform(data, show_count)
@@ -1050,6 +1227,8 @@ def cprint(
             )
         if ctx.info_name == "get-manifest":
             text_output_get_manifest(ctx, output, format, no_wrap=no_wrap)
+        if ctx.info_name == "manifest-diff":
+            text_output_manifest_diff(ctx, output, format, no_wrap=no_wrap)
         if ctx.info_name == "list":
             text_output_list(ctx, output, format, exclude_components, no_wrap=no_wrap)
         if ctx.info_name == "component-flaws":
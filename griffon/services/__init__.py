@@ -1,7 +1,18 @@
 # define interface for query which is asserted by mypy as well as runtime checking
 import logging
 import typing
-from typing import Any, Dict, List, Protocol, runtime_checkable
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    runtime_checkable,
+)
+
+from griffon.timings import timings
 
 logger = logging.getLogger("griffon")
 
@@ -19,7 +30,12 @@ class Query(Protocol):
         pass
 
     def execute(self) -> typing.Union[dict, List[Dict[str, Any]]]:
-        """execute() uses a generic ctx dict to pass in all parameters"""
+        """
+        execute() uses a generic ctx dict to pass in all parameters
+
+        queries fanning out to many requests also define execute_async(), which
+        QueryService runs on the shared query engine (griffon.services.engine)
+        """
         return {}
 
 
@@ -67,16 +83,63 @@ def check_allowed_params(allowed_params, params):
 class QueryService:
     def invoke(self, obj, params: dict):
         check_allowed_params(obj.allowed_params, params)
-        return obj(params).execute()
+        query = obj(params)
+        with timings.timed(f"query {obj.name}"):
+            if hasattr(query, "execute_async"):
+                from griffon.services.engine import query_engine
+
+                return query_engine.run(query.execute_async())
+            return query.execute()
 
 
 class ReportService:
     def invoke(self, obj, params: dict):
         check_allowed_params(obj.allowed_params, params)
-        return obj(params).generate()
+        report = obj(params)
+        with timings.timed(f"report {obj.name}"):
+            if hasattr(report, "generate_async"):
+                from griffon.services.engine import query_engine
+
+                return query_engine.run(report.generate_async())
+            return report.generate()
+
+    def stream(self, obj, params: dict) -> Iterator:
+        """entries of a report (async entries()) as soon as they are generated"""
+        from griffon.services.engine import query_engine
+
+        check_allowed_params(obj.allowed_params, params)
+        report = obj(params)
+        with timings.timed(f"report {obj.name}"):
+            yield from query_engine.stream(report.entries())
 
 
 class ProcessService:
     def invoke(self, obj, params: dict):
         check_allowed_params(obj.allowed_params, params)
-        return obj(params).process()
+        with timings.timed(f"process {obj.name}"):
+            return obj(params).process()
+
+
+def project_fields(
+    include_fields: str, output_fields: Optional[Iterable[str]], required: Iterable[str] = ()
+) -> str:
+    """
+    Narrow a query's include_fields to the entries needed for output.
+
+    output_fields are the result fields read by the renderer (see
+    griffon.output.output_fields), None keeps all include_fields. An entry is kept
+    when it is, contains or is contained by a requested or required field, eg.
+    sources.name keeps sources.name and software_build.source keeps software_build.
+    """
+    if output_fields is None:
+        return include_fields
+    wanted = set(output_fields) | set(required)
+    projected = [
+        entry
+        for entry in include_fields.split(",")
+        if any(
+            entry == field or entry.startswith(f"{field}.") or field.startswith(f"{entry}.")
+            for field in wanted
+        )
+    ]
+    return ",".join(projected)
@@ -0,0 +1,111 @@
+"""
+    batch queries
+
+    Many component names, purls or CVE IDs are queried in a single invocation, sharing
+    service sessions, the response cache and the query engine instead of paying
+    startup, imports and authentication once per input.
+
+"""
+import asyncio
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from griffon import GRIFFON_MAX_WORKERS
+from griffon.services import check_allowed_params, core_queries
+from griffon.services.engine import query_engine
+
+logger = logging.getLogger("griffon")
+
+CVE_ID_RE = re.compile(r"^CVE-\d{4}-\d+$", re.IGNORECASE)
+# comments start a line or follow whitespace, # within a purl is its subpath
+COMMENT_RE = re.compile(r"(?:^|\s)#")
+
+# input kind: (reported query name, query, param receiving the input)
+BATCH_QUERIES: Dict[str, Tuple[str, Any, str]] = {
+    "cve_id": (
+        "products-affected-by-flaw",
+        core_queries.products_versions_affected_by_specific_cve_query,
+        "cve_id",
+    ),
+    "purl": (
+        "products-contain-component",
+        core_queries.products_containing_specific_component_query,
+        "purl",
+    ),
+    "component_name": (
+        "products-contain-component",
+        core_queries.products_containing_component_query,
+        "component_name",
+    ),
+}
+
+
+def input_kind(key: str) -> str:
+    """cve_id, purl or component_name"""
+    if CVE_ID_RE.match(key):
+        return "cve_id"
+    if key.startswith("pkg:"):
+        return "purl"
+    return "component_name"
+
+
+def read_inputs(lines: Iterable[str]) -> List[str]:
+    """distinct inputs in order of appearance, blank lines and # comments are skipped"""
+    keys: Dict[str, None] = {}
+    for line in lines:
+        key = COMMENT_RE.split(line, 1)[0].strip()
+        if key:
+            keys.setdefault(key.upper() if CVE_ID_RE.match(key) else key)
+    return list(keys)
+
+
+def to_json(result: Any) -> Any:
+    """json serialisable form of a query result (bindings models, lists of them)"""
+    if hasattr(result, "to_dict"):
+        return result.to_dict()
+    if isinstance(result, list):
+        return [to_json(item) for item in result]
+    return result
+
+
+async def run_batch(
+    keys: List[str],
+    params: Dict[str, Any],
+    emit: Callable[[dict], None],
+    max_in_flight: int = GRIFFON_MAX_WORKERS,
+) -> int:
+    """
+    run the query of each input concurrently, emit a record tagged with its input
+
+    records are emitted as queries finish, a failing input emits an error record
+    without affecting the others, returns the number of failed inputs
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def run(key: str) -> bool:
+        name, query_class, param = BATCH_QUERIES[input_kind(key)]
+        query_params = {
+            option: value
+            for option, value in params.items()
+            if option in query_class.allowed_params
+        }
+        query_params[param] = key
+        async with in_flight:
+            try:
+                check_allowed_params(query_class.allowed_params, query_params)
+                query = await query_engine.call(query_class, query_params)
+                if hasattr(query, "execute_async"):
+                    result = await query.execute_async()
+                else:
+                    result = await query_engine.call(query.execute)
+            # exit() of a failing service must not end the whole batch
+            except (Exception, SystemExit) as exc:
+                logger.warning(f"{name} {key} failed: {exc}")
+                emit({"input": key, "query": name, "error": str(exc) or type(exc).__name__})
+                return False
+        emit({"input": key, "query": name, "results": to_json(result)})
+        return True
+
+    outcomes = await asyncio.gather(*[run(key) for key in keys])
+    return outcomes.count(False)
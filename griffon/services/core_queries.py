@@ -2,12 +2,11 @@
     read only queries
 
 """
-import concurrent
+import asyncio
 import logging
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Set, Tuple
 
-import requests
 from component_registry_bindings.bindings.python_client.models import Component
 
 from griffon import (
@@ -17,11 +16,101 @@ from griffon import (
     CommunityComponentService,
     CorgiService,
     OSIDBService,
+    get_http_session,
 )
+from griffon.cache import CachedCall
+from griffon.services import project_fields
+from griffon.services.engine import AsyncSession, query_engine
+from griffon.services.pagination import Paginator, retrieve_all, stream_all
 
 logger = logging.getLogger("griffon")
 
 
+def _osidb_flaws_list(**params) -> dict:
+    """raw osidb flaws list, bindings do not support filtering on affects fields"""
+    response = get_http_session().get(f"{OSIDB_API_URL}/osidb/api/v1/flaws", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+osidb_flaws_list = CachedCall(_osidb_flaws_list, f"{OSIDB_API_URL}/osidb/api/v1/flaws", "flaws")
+
+# distinct component names looked up by a single re_name request
+COMPONENT_LOOKUP_BATCH = 20
+
+
+async def latest_components_of_flaw(
+    cve_id, include_fields: str, batch_size: int = COMPONENT_LOOKUP_BATCH
+) -> Tuple[List[Any], List[Dict[str, str]]]:
+    """
+    latest components (by streams) of all ps_components affected by a flaw
+
+    Affects are paged in and each page starts lookups of its not yet seen
+    ps_components right away, while further pages are still being fetched. Names are
+    looked up in batches of a single re_name alternation, a failed batch is retried
+    name by name. Returns components and errors of names which could not be looked up.
+    """
+    # sessions are created off the engine loop, create_session() may block or exit()
+    corgi_session, osidb_session = await asyncio.gather(
+        query_engine.call(CorgiService.create_session),
+        query_engine.call(OSIDBService.create_session),
+    )
+    corgi = AsyncSession(corgi_session)
+    affects = stream_all(
+        osidb_session.affects.retrieve_list,
+        flaw_cve_id=cve_id,
+        include_fields="ps_component",
+    )
+
+    async def lookup(names: List[str]) -> Tuple[List[Any], List[Dict[str, str]]]:
+        params = {"latest_components_by_streams": True, "include_fields": f"name,{include_fields}"}
+        if len(names) == 1:
+            params["name"] = names[0]
+        else:
+            params["re_name"] = f"^({'|'.join(re.escape(name) for name in names)})$"
+        try:
+            components = await corgi.components.retrieve_all(**params)
+        except Exception as exc:
+            if len(names) == 1:
+                logger.warning(f"looking up {names[0]} failed: {exc}")
+                return [], [{"ps_component": names[0], "error": str(exc)}]
+            found: List[Any] = []
+            failed: List[Dict[str, str]] = []
+            for batch_found, batch_failed in await asyncio.gather(
+                *[lookup([name]) for name in names]
+            ):
+                found.extend(batch_found)
+                failed.extend(batch_failed)
+            return found, failed
+        # re_name is a case insensitive regex, keep exact matches only
+        wanted = set(names)
+        return [c for c in components if c.name in wanted], []
+
+    seen: Set[str] = set()
+    lookups: List[asyncio.Future] = []
+    try:
+        async for page in query_engine.iterate(affects):
+            names = []
+            for affect in page:
+                if affect.ps_component and affect.ps_component not in seen:
+                    seen.add(affect.ps_component)
+                    names.append(affect.ps_component)
+            for start in range(0, len(names), batch_size):
+                lookups.append(asyncio.ensure_future(lookup(names[start : start + batch_size])))
+        looked_up = await asyncio.gather(*lookups)
+    finally:
+        # lookups already started are not left running when affects fail to page in
+        for task in lookups:
+            task.cancel()
+
+    components: List[Any] = []
+    errors: List[Dict[str, str]] = []
+    for found, failed in looked_up:
+        components.extend(found)
+        errors.extend(failed)
+    return components, errors
+
+
 class product_stream_summary:
     """retrieve product_stream summary"""
 
@@ -110,6 +199,9 @@ class products_versions_affected_by_specific_cve_query:
         self.namespace = self.params.get("namespace")
 
     def execute(self) -> dict:
+        return query_engine.run(self.execute_async())
+
+    async def execute_async(self) -> dict:
         cond = {}
         if self.affectedness:
             cond["affectedness"] = self.affectedness
@@ -124,35 +216,20 @@ class products_versions_affected_by_specific_cve_query:
         if self.component_type:
             component_cond["type"] = self.component_type
 
-        flaw = self.osidb_session.flaws.retrieve(self.cve_id)
-        affects = flaw.affects
-        results = list()
+        osidb = AsyncSession(self.osidb_session)
+        flaw, (components, errors) = await asyncio.gather(
+            osidb.flaws.retrieve(self.cve_id, include_fields="cve_id,title,description"),
+            latest_components_of_flaw(self.cve_id, "product_streams.name,product_versions.name"),
+        )
+        results = [c.to_dict() for c in components]
         product_versions = set()
         product_streams = set()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            for affect in affects:
-                futures.append(
-                    executor.submit(
-                        self.corgi_session.components.retrieve_list,
-                        name=affect.ps_component,
-                        latest_components_by_streams=True,
-                        include_fields="product_streams.name,product_versions.name",
-                    )
-                )
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    for c in future.result().results:
-                        results.append(c.to_dict())
-                except Exception as exc:
-                    logger.error("%r generated an exception: %s" % (future, exc))
-                    exit(0)
-
-            for c in results:
-                for ps in c["product_streams"]:
-                    product_streams.add(ps["name"])
-                for pv in c["product_versions"]:
-                    product_versions.add(ps["name"])
+
+        for c in results:
+            for ps in c["product_streams"]:
+                product_streams.add(ps["name"])
+            for pv in c["product_versions"]:
+                product_versions.add(pv["name"])
         return {
             "link": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw.cve_id}",
             "cve_id": flaw.cve_id,
@@ -161,6 +238,7 @@ class products_versions_affected_by_specific_cve_query:
             "product_versions": sorted(list(product_versions)),
             "product_streams": sorted(list(product_streams)),
             # "components": results,
+            "errors": errors,
         }
 
 
@@ -201,31 +279,6 @@ class products_containing_specific_component_query:
         return c["product_streams"]
 
 
-def async_retrieve_components(corgi_session, params, components_initial, component_cnt):
-    components = list()
-    if component_cnt < 120:
-        components.extend(components_initial.results)
-    elif component_cnt > 120:
-        components.extend(components_initial.results)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            for batch in range(120, 1200, 120):
-                futures.append(
-                    executor.submit(
-                        corgi_session.components.retrieve_list,
-                        **params,
-                        offset=batch,
-                        limit=120,  # noqa
-                    )
-                )
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    components.extend(future.result().results)
-                except Exception as exc:
-                    logger.warning("%r generated an exception: %s" % (future, exc))
-    return components
-
-
 class products_containing_component_query:
     """What products contain a component?"""
 
@@ -248,8 +301,11 @@ class products_containing_component_query:
         "filter_rh_naming",
         "no_community",
         "no_middleware",
+        "output_fields",
     ]
 
+    include_fields = "link,purl,type,name,related_url,namespace,software_build,nvr,sources.nvr,sources.purl,sources.name,sources.download_url,sources.related_url,upstreams.nvr,upstreams.purl,upstreams.name,upstreams.download_url,upstreams.related_url,release,version,arch,product_streams.product_versions,product_streams.name,product_streams.ofuri"  # noqa
+
     def __init__(self, params: dict) -> None:
         self.corgi_session = CorgiService.create_session()
         self.params = params
@@ -267,11 +323,21 @@ class products_containing_component_query:
         self.search_upstreams = self.params.get("search_upstreams")
         self.filter_rh_naming = self.params.get("filter_rh_naming")
         self.no_community = self.params.get("no_community")
+        self.output_fields = self.params.get("output_fields")
 
     def execute(self) -> List[Dict[str, Any]]:
+        return query_engine.run(self.execute_async())
+
+    async def execute_async(self) -> List[Dict[str, Any]]:
+        # all searches run concurrently, each with a snapshot of the params built so far
+        corgi = AsyncSession(self.corgi_session)
+        searches = []
+        community_searches = []
         results = []
         params = {
-            "include_fields": "link,purl,type,name,related_url,namespace,software_build,nvr,sources.nvr,sources.purl,sources.name,sources.download_url,sources.related_url,upstreams.nvr,upstreams.purl,upstreams.name,upstreams.download_url,upstreams.related_url,release,version,arch,product_streams.product_versions,product_streams.name,product_streams.ofuri",  # noqa
+            "include_fields": project_fields(
+                self.include_fields, self.output_fields, required=["name"]
+            ),
         }
 
         if self.search_latest:
@@ -283,11 +349,7 @@ class products_containing_component_query:
             if self.ns:
                 params["namespace"] = self.ns
 
-            component_initial = self.corgi_session.components.retrieve_list(limit=120, **params)
-            latest_components: list = async_retrieve_components(
-                self.corgi_session, params, component_initial, component_initial.count
-            )
-            results.extend(latest_components)
+            searches.append(corgi.components.retrieve_all(**params))
 
         if self.search_related_url:
             # Note: related_url filter has no concept of strict
@@ -297,11 +359,7 @@ class products_containing_component_query:
             if self.component_type:
                 params["type"] = self.component_type
 
-            component_initial = self.corgi_session.components.retrieve_list(limit=120, **params)
-            related_url_components: list = async_retrieve_components(
-                self.corgi_session, params, component_initial, component_initial.count
-            )
-            results.extend(related_url_components)
+            searches.append(corgi.components.retrieve_all(**params))
 
         if self.search_all:
             if not self.strict_name_search:
@@ -313,14 +371,7 @@ class products_containing_component_query:
             if self.ns:
                 params["namespace"] = self.ns
 
-            all_component_initial = self.corgi_session.components.retrieve_list(limit=120, **params)
-            all_components: list = async_retrieve_components(
-                self.corgi_session,
-                params,
-                all_component_initial,
-                all_component_initial.count,
-            )
-            results.extend(all_components)
+            searches.append(corgi.components.retrieve_all(**params))
 
         if self.search_all_roots:
             params["type"] = "RPM"
@@ -332,28 +383,10 @@ class products_containing_component_query:
             if self.ns:
                 params["namespace"] = self.ns
 
-            all_src_component_initial = self.corgi_session.components.retrieve_list(
-                limit=120, **params
-            )
-            all_src_components: list = async_retrieve_components(
-                self.corgi_session,
-                params,
-                all_src_component_initial,
-                all_src_component_initial.count,
-            )
+            searches.append(corgi.components.retrieve_all(**params))
             params["type"] = "OCI"
             params["arch"] = "noarch"
-            all_noarch_component_initial = self.corgi_session.components.retrieve_list(
-                limit=120, **params
-            )
-            all_noarch_components: list = async_retrieve_components(
-                self.corgi_session,
-                params,
-                all_noarch_component_initial,
-                all_noarch_component_initial.count,
-            )
-            all_root_components = all_src_components + all_noarch_components
-            results.extend(all_root_components)
+            searches.append(corgi.components.retrieve_all(**params))
 
         if self.search_upstreams:
             # Note: upstreams only takes a purl ... so we must use re_upstreams for
@@ -366,11 +399,36 @@ class products_containing_component_query:
             if self.component_type:
                 params["type"] = self.component_type
 
-            component_initial = self.corgi_session.components.retrieve_list(limit=120, **params)
-            upstream_components: list = async_retrieve_components(
-                self.corgi_session, params, component_initial, component_initial.count
-            )
-            results.extend(upstream_components)
+            searches.append(corgi.components.retrieve_all(**params))
+
+        if not self.no_community and (
+            self.search_community or self.search_all or self.search_all_roots
+        ):
+            self.community_session = CommunityComponentService.create_session()
+            params["type"] = "RPM"
+            params["arch"] = "src"
+            if not self.strict_name_search:
+                params["re_name"] = self.component_name
+            else:
+                params["name"] = self.component_name
+            if self.search_upstreams:
+                params["namespace"] = "UPSTREAM"
+            if self.ns:
+                params["namespace"] = self.ns
+
+            if self.component_type:
+                params["type"] = self.component_type
+
+            community = AsyncSession(self.community_session)
+            community_searches.append(community.components.retrieve_all(**params))
+            params["type"] = "OCI"
+            params["arch"] = "noarch"
+            community_searches.append(community.components.retrieve_all(**params))
+
+        corgi_results = asyncio.gather(*searches)
+        community_results = asyncio.gather(*community_searches)
+        for components in await corgi_results:
+            results.extend(components)
 
         if self.filter_rh_naming:
             flags = re.IGNORECASE
@@ -411,41 +469,9 @@ class products_containing_component_query:
 
             results = filtered_results
 
-        if not self.no_community and (
-            self.search_community or self.search_all or self.search_all_roots
-        ):
-            self.community_session = CommunityComponentService.create_session()
-            params["type"] = "RPM"
-            params["arch"] = "src"
-            if not self.strict_name_search:
-                params["re_name"] = self.component_name
-            else:
-                params["name"] = self.component_name
-            if self.search_upstreams:
-                params["namespace"] = "UPSTREAM"
-            if self.ns:
-                params["namespace"] = self.ns
-
-            if self.component_type:
-                params["type"] = self.component_type
-
-            component_initial = self.community_session.components.retrieve_list(limit=120, **params)
-            commmunity_src_components: list = async_retrieve_components(
-                self.community_session, params, component_initial, component_initial.count
-            )
-            params["type"] = "OCI"
-            params["arch"] = "noarch"
-            component_initial_noarch = self.community_session.components.retrieve_list(
-                limit=120, **params
-            )
-            commmunity_noarch_components: list = async_retrieve_components(
-                self.community_session,
-                params,
-                component_initial_noarch,
-                component_initial_noarch.count,
-            )
-            community_components = commmunity_src_components + commmunity_noarch_components
-            results.extend(community_components)
+        # community results are not subject to rh naming filter
+        for components in await community_results:
+            results.extend(components)
 
         return results
 
@@ -530,28 +556,12 @@ class components_containing_component_query:
         if self.namespace:
             cond["namespace"] = self.namespace
 
-        components: List[Any] = []
         logger.debug("starting parallel http requests")
-        component_cnt = self.corgi_session.components.retrieve_list(**cond).count
-        if component_cnt < 3000000:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = []
-                components = list()
-                for batch in range(0, component_cnt, 120):
-                    futures.append(
-                        executor.submit(
-                            self.corgi_session.components.retrieve_list,
-                            **cond,
-                            offset=batch,
-                            include_fields="link,name,type,arch,version,purl,nvr,sources,related_url,download_url",  # noqa
-                            limit=120,
-                        )
-                    )
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        components.extend(future.result().results)
-                    except Exception as exc:
-                        logger.warning("%r generated an exception: %s" % (future, exc))
+        components: List[Any] = retrieve_all(
+            self.corgi_session.components.retrieve_list,
+            **cond,
+            include_fields="link,name,type,arch,version,purl,nvr,sources,related_url,download_url",  # noqa
+        )
 
         results = []
         for c in components:
@@ -603,6 +613,9 @@ class components_affected_by_specific_cve_query:
         self.namespace = self.params.get("namespace")
 
     def execute(self) -> dict:
+        return query_engine.run(self.execute_async())
+
+    async def execute_async(self) -> dict:
         cond = {}
         if self.affectedness:
             cond["affectedness"] = self.affectedness
@@ -617,27 +630,14 @@ class components_affected_by_specific_cve_query:
         if self.component_type:
             component_cond["type"] = self.component_type
 
-        flaw = self.osidb_session.flaws.retrieve(self.cve_id)
-        affects = flaw.affects
-        results = list()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            for affect in affects:
-                futures.append(
-                    executor.submit(
-                        self.corgi_session.components.retrieve_list,
-                        name=affect.ps_component,
-                        latest_components_by_streams=True,
-                        include_fields="purl,product_streams,product_versions,software_build",
-                    )
-                )
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    for c in future.result().results:
-                        results.append(c.to_dict())
-                except Exception as exc:
-                    logger.error("%r generated an exception: %s" % (future, exc))
-                    exit(0)
+        osidb = AsyncSession(self.osidb_session)
+        flaw, (components, errors) = await asyncio.gather(
+            osidb.flaws.retrieve(self.cve_id, include_fields="cve_id,title,description"),
+            latest_components_of_flaw(
+                self.cve_id, "purl,product_streams,product_versions,software_build"
+            ),
+        )
+        results = [c.to_dict() for c in components]
 
         return {
             "link": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw.cve_id}",
@@ -645,6 +645,7 @@ class components_affected_by_specific_cve_query:
             "title": flaw.title,
             "description": flaw.description,
             "components": results,
+            "errors": errors,
         }
 
 
@@ -664,8 +665,12 @@ class cves_for_specific_component_query:
         "affect_resolution",
         "affect_impact",
         "strict_name_search",
+        "output_fields",
     ]
 
+    include_fields = "cve_id,title,state,resolution,impact,affects"
+    required_fields = ["cve_id", "state", "resolution", "impact", "affects"]
+
     def __init__(self, params: dict) -> None:
         self.corgi_session = CorgiService.create_session()
         self.osidb_session = OSIDBService.create_session()
@@ -678,13 +683,16 @@ class cves_for_specific_component_query:
         self.affectedness = self.params.get("affectedness")
         self.affect_resolution = self.params.get("affect_resolution")
         self.affect_impact = self.params.get("affect_impact")
+        self.output_fields = self.params.get("output_fields")
 
     def execute(self) -> List[Dict[str, Any]]:
         components = []
         if self.component_name:
             affects: list = []
             params = {
-                "include_fields": "cve_id,title,state,resolution,impact,affects",
+                "include_fields": project_fields(
+                    self.include_fields, self.output_fields, required=self.required_fields
+                ),
             }
             params["affects__ps_component"] = self.component_name
             if self.flaw_state:
@@ -700,63 +708,42 @@ class cves_for_specific_component_query:
             if self.affect_impact:
                 params["affects__impact"] = self.affect_impact
 
-            res = requests.get(f"{OSIDB_API_URL}/osidb/api/v1/flaws", params=params)
-            flaws = res.json()
-            flaws_cnt = int(flaws["count"])
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = []
-                flaws = list()
-                for batch in range(0, flaws_cnt, 75):
-                    params["offset"] = batch  # type: ignore
-                    params["limit"] = 75  # type: ignore
-                    futures.append(
-                        executor.submit(
-                            requests.get,
-                            f"{OSIDB_API_URL}/osidb/api/v1/flaws",
-                            params=params,
-                        )
+            flaws = Paginator(osidb_flaws_list, params, page_size=75).results()
+            for flaw in flaws:
+                for affect in flaw["affects"]:
+                    if self.affectedness:
+                        if self.affectedness != affect["affectedness"]:
+                            continue
+                    if self.affect_resolution:
+                        if self.affect_resolution != affect["resolution"]:
+                            continue
+                    if self.affect_impact:
+                        if self.affect_impact != affect["impact"]:
+                            continue
+                    affects.append(
+                        {
+                            "link_affect": f"{OSIDB_API_URL}/osidb/api/v1/affects/{affect['uuid']}",  # noqa
+                            "link_cve": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw['cve_id']}",  # noqa
+                            "link_component": f"{CORGI_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
+                            "link_community_component": f"{COMMUNITY_COMPONENTS_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
+                            "flaw_cve_id": flaw["cve_id"],
+                            "title": flaw.get("title"),
+                            "flaw_state": flaw["state"],
+                            "flaw_resolution": flaw["resolution"],
+                            "affect_component_name": affect["ps_component"],
+                            "affect_product_version": affect["ps_module"],
+                            "affect_affectedness": affect["affectedness"],
+                            "affect_impact": affect["impact"],
+                            "affect_resolution": affect["resolution"],
+                        }
                     )
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        flaws.extend(future.result().json()["results"])
-                    except Exception as exc:
-                        logger.warning("%r generated an exception: %s" % (future, exc))
-
-                for flaw in flaws:
-                    for affect in flaw["affects"]:
-                        if self.affectedness:
-                            if self.affectedness != affect["affectedness"]:
-                                continue
-                        if self.affect_resolution:
-                            if self.affect_resolution != affect["resolution"]:
-                                continue
-                        if self.affect_impact:
-                            if self.affect_impact != affect["impact"]:
-                                continue
-                        affects.append(
-                            {
-                                "link_affect": f"{OSIDB_API_URL}/osidb/api/v1/affects/{affect['uuid']}",  # noqa
-                                "link_cve": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw['cve_id']}",  # noqa
-                                "link_component": f"{CORGI_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
-                                "link_community_component": f"{COMMUNITY_COMPONENTS_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
-                                "flaw_cve_id": flaw["cve_id"],
-                                "title": flaw["title"],
-                                "flaw_state": flaw["state"],
-                                "flaw_resolution": flaw["resolution"],
-                                "affect_component_name": affect["ps_component"],
-                                "affect_product_version": affect["ps_module"],
-                                "affect_affectedness": affect["affectedness"],
-                                "affect_impact": affect["impact"],
-                                "affect_resolution": affect["resolution"],
-                            }
-                        )
-                components.append(
-                    {
-                        "link": f"{CORGI_API_URL}/api/v1/components?name={self.component_name}",
-                        "name": self.component_name,
-                        "affects": affects,
-                    }
-                )
+            components.append(
+                {
+                    "link": f"{CORGI_API_URL}/api/v1/components?name={self.component_name}",
+                    "name": self.component_name,
+                    "affects": affects,
+                }
+            )
 
         if self.purl:
             pass
@@ -777,8 +764,12 @@ class cves_for_specific_product_query:
         "affect_resolution",
         "affect_impact",
         "strict_name_search",
+        "output_fields",
     ]
 
+    include_fields = "cve_id,title,state,resolution,impact,affects"
+    required_fields = ["cve_id", "state", "resolution", "impact", "affects"]
+
     def __init__(self, params: dict) -> None:
         self.corgi_session = CorgiService.create_session()
         self.osidb_session = OSIDBService.create_session()
@@ -791,13 +782,16 @@ class cves_for_specific_product_query:
         self.affectedness = self.params.get("affectedness")
         self.affect_resolution = self.params.get("affect_resolution")
         self.affect_impact = self.params.get("affect_impact")
+        self.output_fields = self.params.get("output_fields")
 
     def execute(self) -> List[Dict[str, Any]]:
         components = []
         if self.product_version_name:
             affects: list = []
             params = {
-                "include_fields": "cve_id,title,state,resolution,impact,affects",
+                "include_fields": project_fields(
+                    self.include_fields, self.output_fields, required=self.required_fields
+                ),
             }
             params["affects__ps_module"] = self.product_version_name
             if self.flaw_state:
@@ -813,62 +807,41 @@ class cves_for_specific_product_query:
             if self.affect_impact:
                 params["affects__impact"] = self.affect_impact
 
-            res = requests.get(f"{OSIDB_API_URL}/osidb/api/v1/flaws", params=params)
-            flaws = res.json()
-            flaws_cnt = int(flaws["count"])
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = []
-                flaws = list()
-                for batch in range(0, flaws_cnt, 75):
-                    params["offset"] = batch  # type: ignore
-                    params["limit"] = 75  # type: ignore
-                    futures.append(
-                        executor.submit(
-                            requests.get,
-                            f"{OSIDB_API_URL}/osidb/api/v1/flaws",
-                            params=params,
-                        )
+            flaws = Paginator(osidb_flaws_list, params, page_size=75).results()
+            for flaw in flaws:
+                for affect in flaw["affects"]:
+                    if self.affectedness:
+                        if self.affectedness != affect["affectedness"]:
+                            continue
+                    if self.affect_resolution:
+                        if self.affect_resolution != affect["resolution"]:
+                            continue
+                    if self.affect_impact:
+                        if self.affect_impact != affect["impact"]:
+                            continue
+                    affects.append(
+                        {
+                            "link_affect": f"{OSIDB_API_URL}/osidb/api/v1/affects/{affect['uuid']}",  # noqa
+                            "link_cve": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw['cve_id']}",  # noqa
+                            "link_component": f"{CORGI_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
+                            "link_community_component": f"{COMMUNITY_COMPONENTS_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
+                            "flaw_cve_id": flaw["cve_id"],
+                            "title": flaw.get("title"),
+                            "flaw_state": flaw["state"],
+                            "flaw_resolution": flaw["resolution"],
+                            "affect_component_name": affect["ps_component"],
+                            "affect_product_version": affect["ps_module"],
+                            "affect_affectedness": affect["affectedness"],
+                            "affect_impact": affect["impact"],
+                            "affect_resolution": affect["resolution"],
+                        }
                     )
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        flaws.extend(future.result().json()["results"])
-                    except Exception as exc:
-                        logger.warning("%r generated an exception: %s" % (future, exc))
-
-                for flaw in flaws:
-                    for affect in flaw["affects"]:
-                        if self.affectedness:
-                            if self.affectedness != affect["affectedness"]:
-                                continue
-                        if self.affect_resolution:
-                            if self.affect_resolution != affect["resolution"]:
-                                continue
-                        if self.affect_impact:
-                            if self.affect_impact != affect["impact"]:
-                                continue
-                        affects.append(
-                            {
-                                "link_affect": f"{OSIDB_API_URL}/osidb/api/v1/affects/{affect['uuid']}",  # noqa
-                                "link_cve": f"{OSIDB_API_URL}/osidb/api/v1/flaws/{flaw['cve_id']}",  # noqa
-                                "link_component": f"{CORGI_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
-                                "link_community_component": f"{COMMUNITY_COMPONENTS_API_URL}/api/v1/components?name={affect['ps_component']}&latest_components_by_streams=True",  # noqa
-                                "flaw_cve_id": flaw["cve_id"],
-                                "title": flaw["title"],
-                                "flaw_state": flaw["state"],
-                                "flaw_resolution": flaw["resolution"],
-                                "affect_component_name": affect["ps_component"],
-                                "affect_product_version": affect["ps_module"],
-                                "affect_affectedness": affect["affectedness"],
-                                "affect_impact": affect["impact"],
-                                "affect_resolution": affect["resolution"],
-                            }
-                        )
-                components.append(
-                    {
-                        "link": f"{CORGI_API_URL}/api/v1/product_versions?name={self.product_version_name}",  # noqa
-                        "name": self.product_version_name,
-                        "affects": affects,
-                    }
-                )
+            components.append(
+                {
+                    "link": f"{CORGI_API_URL}/api/v1/product_versions?name={self.product_version_name}",  # noqa
+                    "name": self.product_version_name,
+                    "affects": affects,
+                }
+            )
 
         return components
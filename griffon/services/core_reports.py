@@ -2,19 +2,47 @@
     read only queries
 
 """
-import concurrent
+import asyncio
+import itertools
 import logging
+import re
+from collections import Counter
 from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
 
-import requests
+from packageurl import PackageURL
 
-from griffon import OSIDB_API_URL, CorgiService, OSIDBService
+from griffon import OSIDB_API_URL, CorgiService, get_http_session
+from griffon.cache import CachedCall
+from griffon.distinct import distinct_counter
+from griffon.services.engine import AsyncSession, query_engine
+from griffon.services.pagination import stream_all
 
 logger = logging.getLogger("griffon")
 
 
+def _osidb_affects_list(**params) -> dict:
+    """raw osidb affects list, bindings do not support include_fields on affects"""
+    response = get_http_session().get(f"{OSIDB_API_URL}/osidb/api/v1/affects", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+osidb_affects_list = CachedCall(
+    _osidb_affects_list, f"{OSIDB_API_URL}/osidb/api/v1/affects", "affects"
+)
+
+AFFECT_IMPACTS = ("critical", "important", "moderate", "low")
+
+
 class example_affects_report:
-    """ """
+    """
+    affected components and products per impact
+
+    Affected affects (narrowed server side to a product version and component) are
+    paged through once, in parallel pages, and counted per impact, component and
+    product version while they stream in.
+    """
 
     name = "example_affects_report"
     description = " "
@@ -31,7 +59,6 @@ class example_affects_report:
 
     def __init__(self, params) -> None:
         self.corgi_session = CorgiService.create_session()
-        self.osidb_session = OSIDBService.create_session()
         self.params = params
         self.product_version_name = self.params.get("product_version_name")
         self.show_components = self.params.get("show_components")
@@ -43,132 +70,81 @@ class example_affects_report:
         self.product_name = self.params.get("product_name")
 
     def generate(self) -> dict:
-        affects = self.osidb_session.affects.retrieve_list()
-
-        affects_affected = self.osidb_session.affects.retrieve_list(affectedness="AFFECTED")
-
-        # TODO osidb_session.affects does not support include_fields, do it manually for now
-        affect_critical_res = requests.get(
-            f"{OSIDB_API_URL}/osidb/api/v1/affects?affectedness=AFFECTED&impact=CRITICAL&include_fields=ps_component,ps_module,impact&limit=10000"  # noqa
-        )
-        affects_critical = affect_critical_res.json()
-        critical_components = {}
-        critical_products = {}
-        for affect in affects_critical["results"]:
-            component_name = affect.get("ps_component", "no_name")
-            if component_name not in critical_components:
-                critical_components[component_name] = 0
-            critical_components[component_name] += 1
-
-            product_version_name = affect.get("ps_module", "no_name")
-            if product_version_name not in critical_products:
-                critical_products[product_version_name] = 0
-            critical_products[product_version_name] += 1
-
-        top_critical_component = max(critical_components, key=critical_components.get)  # type: ignore # noqa
-        top_critical_product = max(critical_products, key=critical_products.get)  # type: ignore
-
-        affect_important_res = requests.get(
-            f"{OSIDB_API_URL}/osidb/api/v1/affects?affectedness=AFFECTED&impact=IMPORTANT&include_fields=ps_component,ps_module,impact&limit=10000"  # noqa
-        )
-        affects_important = affect_important_res.json()
-        important_components = {}
-        important_products = {}
-        for affect in affects_important["results"]:
-            component_name = affect.get("ps_component", "no_name")
-            if component_name not in important_components:
-                important_components[component_name] = 0
-            important_components[component_name] += 1
-
-            product_version_name = affect.get("ps_module", "no_name")
-            if product_version_name not in important_products:
-                important_products[product_version_name] = 0
-            important_products[product_version_name] += 1
-        top_important_component = max(important_components, key=important_components.get)  # type: ignore # noqa
-        top_important_product = max(important_products, key=important_products.get)  # type: ignore # noqa
-
-        affect_moderate_res = requests.get(
-            f"{OSIDB_API_URL}/osidb/api/v1/affects?affectedness=AFFECTED&impact=MODERATE&include_fields=ps_component,ps_module,impact&limit=10000"  # noqa
-        )
-        affects_moderate = affect_moderate_res.json()
-        moderate_components = {}
-        moderate_products = {}
-        for affect in affects_moderate["results"]:
-            component_name = affect.get("ps_component", "no_name")
-            if component_name not in moderate_components:
-                moderate_components[component_name] = 0
-            moderate_components[component_name] += 1
-
-            product_version_name = affect.get("ps_module", "no_name")
-            if product_version_name not in moderate_products:
-                moderate_products[product_version_name] = 0
-            moderate_products[product_version_name] += 1
-        top_moderate_component = max(moderate_components, key=moderate_components.get)  # type: ignore # noqa
-        top_moderate_product = max(moderate_products, key=moderate_products.get)  # type: ignore
-
-        affect_low_res = requests.get(
-            f"{OSIDB_API_URL}/osidb/api/v1/affects?affectedness=AFFECTED&impact=LOW&include_fields=ps_component,ps_module,impact&limit=10000"  # noqa
+        return query_engine.run(self.generate_async())
+
+    async def affect_filters(self) -> Dict[str, str]:
+        """osidb affects filters of the report params"""
+        filters = {}
+        product_version_name = self.product_version_name
+        if not product_version_name and self.ofuri:
+            product_stream = await AsyncSession(self.corgi_session).product_streams.retrieve_list(
+                ofuri=self.ofuri
+            )
+            product_version_name = product_stream["product_versions"][0]["name"]
+        if product_version_name:
+            filters["ps_module"] = product_version_name
+        component_name = self.component_name
+        if not component_name and self.purl:
+            component_name = PackageURL.from_string(self.purl).name
+        if component_name:
+            filters["ps_component"] = component_name
+        return filters
+
+    def count_affected(self, filters: Dict[str, str]) -> Counter:
+        """affected affects counted by (impact, component, product version), in one pass"""
+        counts: Counter = Counter()
+        affects = stream_all(
+            osidb_affects_list,
+            affectedness="AFFECTED",
+            include_fields="ps_component,ps_module,impact",
+            **filters,
         )
-        affects_low = affect_low_res.json()
-        low_components = {}
-        low_products = {}
-        for affect in affects_low["results"]:
-            component_name = affect.get("ps_component", "no_name")
-            if component_name not in low_components:
-                low_components[component_name] = 0
-            low_components[component_name] += 1
-
-            product_version_name = affect.get("ps_module", "no_name")
-            if product_version_name not in low_products:
-                low_products[product_version_name] = 0
-            low_products[product_version_name] += 1
-        top_low_component = max(low_components, key=low_components.get)  # type: ignore
-        top_low_product = max(low_products, key=low_products.get)  # type: ignore
-
-        critical = {
-            "affected": affects_critical["count"],
-            "top_component": top_critical_component,
-            "top_product": top_critical_product,
-        }
-        important = {
-            "affected": affects_important["count"],
-            "top_component": top_important_component,
-            "top_product": top_important_product,
-        }
-        moderate = {
-            "affected": affects_moderate["count"],
-            "top_component": top_moderate_component,
-            "top_product": top_moderate_product,
-        }
-        low = {
-            "affected": affects_low["count"],
-            "top_component": top_low_component,
-            "top_product": top_low_product,
-        }
-
-        if self.show_components:
-            critical["components"] = critical_components
-            important["components"] = important_components
-            moderate["components"] = moderate_components
-            low["components"] = low_components
+        for page in affects:
+            counts.update(
+                (
+                    (affect.get("impact") or "").lower(),
+                    affect.get("ps_component", "no_name"),
+                    affect.get("ps_module", "no_name"),
+                )
+                for affect in page
+            )
+        return counts
 
-        if self.show_products:
-            critical["products"] = critical_products
-            important["products"] = important_products
-            moderate["products"] = moderate_products
-            low["products"] = low_products
+    async def generate_async(self) -> dict:
+        filters = await self.affect_filters()
+        all_affects, counts = await asyncio.gather(
+            query_engine.call(osidb_affects_list, limit=1, include_fields="uuid", **filters),
+            query_engine.call(self.count_affected, filters),
+        )
+        components: Dict[str, Counter] = {impact: Counter() for impact in AFFECT_IMPACTS}
+        products: Dict[str, Counter] = {impact: Counter() for impact in AFFECT_IMPACTS}
+        for (impact, component_name, product_version_name), count in counts.items():
+            if impact in components:
+                components[impact][component_name] += count
+                products[impact][product_version_name] += count
 
         report = {
             "title": "Example Affects report",
             "ts": str(datetime.now()),
-            "total_affects": affects.count,
-            "total_affected": affects_affected.count,
-            "critical": critical,
-            "important": important,
-            "moderate": moderate,
-            "low": low,
+            "total_affects": all_affects["count"],
+            "total_affected": sum(counts.values()),
         }
-
+        for impact in AFFECT_IMPACTS:
+            top_component = components[impact].most_common(1)
+            top_product = products[impact].most_common(1)
+            summary = {
+                "affected": sum(components[impact].values()),
+                "top_component": top_component[0][0] if top_component else None,
+                "top_product": top_product[0][0] if top_product else None,
+            }
+            if self.show_components:
+                summary["components"] = dict(components[impact].most_common())
+            if self.show_products:
+                summary["products"] = dict(products[impact].most_common())
+            report[impact] = summary
+
+        if self.product_version_name:
+            report["product_version"] = self.product_version_name
         if self.purl:
             report["purl"] = self.purl
         if self.component_name:
@@ -177,149 +153,84 @@ class example_affects_report:
             report["product_ofuri"] = self.ofuri
         if self.product_name:
             report["product"] = self.product_name
+        return report
 
-        return {
-            "title": "Example Affects report",
-            "ts": str(datetime.now()),
-            "total_affects": affects.count,
-            "total_affected": affects_affected.count,
-            "critical": critical,
-            "important": important,
-            "moderate": moderate,
-            "low": low,
-        }
+
+# filters of the distinct component names counted by entity_report by default, other
+# component types and arches are counted with the component_types and arch params
+ENTITY_COMPONENT_FILTERS = {
+    "rpm_components": {"type": "RPM", "arch": "src", "namespace": "REDHAT"},
+    "oci_components": {"type": "OCI", "arch": "noarch"},
+    "npm_components": {"type": "NPM"},
+    "golang_components": {"type": "GOLANG"},
+}
 
 
 class entity_report:
-    """ """
+    """
+    counts of corgi entities
+
+    Distinct component names of every counted type (RPM, OCI, NPM and GOLANG unless
+    component_types or arch are given) are counted concurrently while their pages stream
+    in, estimated by HyperLogLog or, with exact, counted in a set of name hashes.
+    """
 
     name = "entity_report"
     description = " "
-    allowed_params = ["all"]
+    allowed_params = ["all", "exact", "component_types", "arch"]
 
     def __init__(self, params) -> None:
         self.corgi_session = CorgiService.create_session()
-        self.osidb_session = OSIDBService.create_session()
         self.params = params
+        self.exact = bool(self.params.get("exact"))
+        self.component_types = list(self.params.get("component_types") or [])
+        self.arch = self.params.get("arch")
+
+    def component_filters(self) -> Dict[str, Dict[str, str]]:
+        """report key -> components filter of each counted component type"""
+        if not self.component_types and not self.arch:
+            return ENTITY_COMPONENT_FILTERS
+        defaults = {filters["type"]: filters for filters in ENTITY_COMPONENT_FILTERS.values()}
+        component_types = self.component_types or list(defaults)
+        counted = {}
+        for component_type in component_types:
+            filters = dict(defaults.get(component_type, {"type": component_type}))
+            if self.arch:
+                filters["arch"] = self.arch
+            counted[f"{component_type.lower()}_components"] = filters
+        return counted
 
     def generate(self) -> dict:
-        component_arches = CorgiService.get_component_arches()
-        component_types = [
-            component_type.value for component_type in CorgiService.get_component_types()
-        ]
-        corgi_status = self.corgi_session.status()
-        active_product_streams_count = self.corgi_session.product_streams.retrieve_list().count
-        component_instances_count = self.corgi_session.components.retrieve_list(limit=1).count
-
-        # get src RPM count
-        component_cnt = self.corgi_session.components.retrieve_list(
-            arch="src", namespace="REDHAT", type="RPM", include_fields="name"
-        ).count
-        components = list()
-        if component_cnt < 3000000:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = []
-                for batch in range(0, component_cnt, 5000):
-                    futures.append(
-                        executor.submit(
-                            self.corgi_session.components.retrieve_list,
-                            arch="src",
-                            namespace="REDHAT",
-                            type="RPM",
-                            include_fields="name",
-                            offset=batch,
-                            limit=5000,  # noqa
-                        )
-                    )
+        return query_engine.run(self.generate_async())
 
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        components.extend(future.result().results)
-                    except Exception as exc:
-                        logger.warning("%r generated an exception: %s" % (future, exc))
-
-        # # get OCI noarch count
-        # component_cnt = self.corgi_session.components.retrieve_list(
-        #     arch="noarch", type="OCI", include_fields="name"
-        # ).count
-        # oci_components = list()
-        # if component_cnt < 3000000:
-        #     with concurrent.futures.ThreadPoolExecutor() as executor:
-        #         futures = []
-        #         for batch in range(0, component_cnt, 3000):
-        #             futures.append(
-        #                 executor.submit(
-        #                     self.corgi_session.components.retrieve_list,
-        #                     arch="noarch",
-        #                     type="OCI",
-        #                     include_fields="name",
-        #                     offset=batch,
-        #                     limit=3000,  # noqa
-        #                 )
-        #             )
-        #
-        #         for future in concurrent.futures.as_completed(futures):
-        #             try:
-        #                 oci_components.extend(future.result().results)
-        #             except Exception as exc:
-        #                 logger.warning("%r generated an exception: %s" % (future, exc))
-
-        # # get NPM noarch count
-        # component_cnt = self.corgi_session.components.retrieve_list(type="NPM",
-        #                                                             include_fields="name").count
-        # npm_components = list()
-        # if component_cnt < 3000000:
-        #     with concurrent.futures.ThreadPoolExecutor() as executor:
-        #         futures = []
-        #         for batch in range(0, component_cnt, 3000):
-        #             futures.append(
-        #                 executor.submit(
-        #                     self.corgi_session.components.retrieve_list,
-        #                     type="NPM", include_fields="name",
-        #                     offset=batch,
-        #                     limit=3000,  # noqa
-        #                 )
-        #             )
-        #
-        #         for future in concurrent.futures.as_completed(futures):
-        #             try:
-        #                 npm_components.extend(future.result().results)
-        #             except Exception as exc:
-        #                 logger.warning("%r generated an exception: %s" % (future, exc))
-
-        # get GOLANG noarch count
-        # component_cnt = self.corgi_session.components.retrieve_list(type="GOLANG",
-        #                                                             include_fields="name").count
-        # golang_components = list()
-        # if component_cnt < 3000000:
-        #     with concurrent.futures.ThreadPoolExecutor() as executor:
-        #         futures = []
-        #         for batch in range(0, component_cnt, 3000):
-        #             futures.append(
-        #                 executor.submit(
-        #                     self.corgi_session.components.retrieve_list,
-        #                     type="GOLANG", include_fields="name",
-        #                     offset=batch,
-        #                     limit=3000,  # noqa
-        #                 )
-        #             )
-        #
-        #         for future in concurrent.futures.as_completed(futures):
-        #             try:
-        #                 golang_components.extend(future.result().results)
-        #             except Exception as exc:
-        #                 logger.warning("%r generated an exception: %s" % (future, exc))
-
-        rpm_components_cnt: int = len(list(set([component.name for component in components])))
-
-        # TODO: baking these values in as we will eventually process these server side
-        oci_components_cnt: int = 2873
-        npm_components_cnt: int = 8677
-        golang_components_cnt: int = 48359
-
-        total_component_cnt = (
-            rpm_components_cnt + oci_components_cnt + npm_components_cnt + golang_components_cnt
+    def count_distinct_names(self, **filters) -> int:
+        """distinct names of the components matching filters"""
+        names = distinct_counter(exact=self.exact)
+        pages = stream_all(
+            self.corgi_session.components.retrieve_list, include_fields="name", **filters
+        )
+        for page in pages:
+            names.update(component.name for component in page)
+        return len(names)
+
+    async def generate_async(self) -> dict:
+        corgi = AsyncSession(self.corgi_session)
+        component_filters = self.component_filters()
+        (
+            corgi_status,
+            product_streams,
+            component_instances,
+            *distinct_counts,
+        ) = await asyncio.gather(
+            corgi.status(),
+            corgi.product_streams.retrieve_list(limit=1),
+            corgi.components.retrieve_list(limit=1),
+            *(
+                query_engine.call(self.count_distinct_names, **filters)
+                for filters in component_filters.values()
+            ),
         )
+        distinct_components = dict(zip(component_filters, distinct_counts))
 
         return {
             "corgi": {
@@ -327,19 +238,20 @@ class entity_report:
                 "ts": str(datetime.now()),
                 "db_size": corgi_status["db_size"],
                 "components": {
-                    "types": component_types,
-                    "arches": component_arches,
-                    "total_component_instances": component_instances_count,
-                    "total_distinct_components": total_component_cnt,
-                    "rpm_components": rpm_components_cnt,
-                    "oci_components": oci_components_cnt,
-                    "npm_components": npm_components_cnt,
-                    "golang_components": golang_components_cnt,
+                    "types": [
+                        component_type.value
+                        for component_type in CorgiService.get_component_types()
+                    ],
+                    "arches": CorgiService.get_component_arches(),
+                    "total_component_instances": component_instances.count,
+                    "total_distinct_components": sum(distinct_counts),
+                    "distinct_counts": "exact" if self.exact else "approximate",
+                    **distinct_components,
                 },
                 "products": {
                     "products": corgi_status["products"]["count"],
                     "product_versions": corgi_status["product_versions"]["count"],
-                    "active_product_streams": active_product_streams_count,
+                    "active_product_streams": product_streams.count,
                     "product_streams": corgi_status["product_streams"]["count"],
                     "product_variants": corgi_status["product_variants"]["count"],
                     "channels": corgi_status["channels"]["count"],
@@ -348,8 +260,61 @@ class entity_report:
         }
 
 
+# distinct child purls looked up by a single re_purl request
+CHILD_LOOKUP_BATCH = 20
+CHILD_FIELDS = "purl,type,license_concluded,license_declared,related_url,download_url"
+# Container Catalog search page, the fallback download_url of containers
+CONTAINER_SEARCH_URL = "https://catalog.redhat.com/software/containers/search"
+
+
+def license_entry(component, **fields) -> dict:
+    """license fields of a component, fields are added after its urls"""
+    entry = {
+        "license_declared": component.license_declared,
+        "related_url": component.related_url,
+        **fields,
+    }
+    if component.license_concluded:
+        # Some components can't be scanned, e.g. binary RPMs
+        entry["license_concluded"] = component.license_concluded
+    # Report container's exact repository_url if present, the Container Catalog search
+    # page is only a fallback, just ignore it if no specific URL is available
+    rpm = str(component.type) in ("RPM", "RPMMOD")
+    if not rpm and component.download_url != CONTAINER_SEARCH_URL:
+        entry["download_url"] = component.download_url
+    return entry
+
+
+def provided_purls(component) -> Optional[List[str]]:
+    """
+    distinct purls of the inline provides of a component, None if they are not inline
+
+    corgi serialises provides as a list of {"link", "purl"} (the bindings type the method
+    field as str), anything else is looked up through the sources filter instead
+    """
+    provides = component.provides
+    if not isinstance(provides, list) or not all(isinstance(p, dict) for p in provides):
+        return None
+    return list(
+        dict.fromkeys(
+            provided["purl"]
+            for provided in provides
+            if provided.get("purl") and provided["purl"] != component.purl
+        )
+    )
+
+
 class license_report:
-    """ """
+    """
+    licenses of the components of a product stream (or a single component)
+
+    Root components are paged in and yielded as soon as their children are resolved.
+    Children are taken from the provides of each root, every distinct child purl is
+    looked up once (shared children are reused across roots) in batches of a single
+    re_purl alternation, running on the query engine while further roots are paged in.
+    Roots without inline provides fall back to a sources lookup, children which cannot
+    be looked up are reported with their error.
+    """
 
     name = "license_report"
     description = " "
@@ -363,109 +328,130 @@ class license_report:
         self.exclude_children = params.get("exclude_children")
 
     def generate(self) -> dict:
+        return query_engine.run(self.generate_async())
+
+    async def generate_async(self) -> dict:
         output = {}
+        async for entry in self.entries(ordered=True):
+            output[entry.pop("purl")] = entry
+        return output
+
+    async def root_pages(self, corgi: AsyncSession) -> AsyncIterator[list]:
         component_filter = {
             "include_fields": "uuid,purl,type,"
             "license_concluded,license_declared,"
             "related_url,download_url,"
-            "software_build.build_id,provides",
+            "software_build.build_id,provides.purl",
         }
         if self.purl:
-            component_filter["purl"] = self.purl
+            initial_component = await corgi.components.retrieve_list(purl=self.purl)
+            yield [await corgi.components.retrieve(initial_component.to_dict()["uuid"])]
+            return
         if self.product_stream_name:
-            product_stream = self.corgi_session.product_streams.retrieve_list(
+            product_stream = await corgi.product_streams.retrieve_list(
                 name=self.product_stream_name
             )
-            stream_ofuri = product_stream["ofuri"]
-            component_filter["ofuri"] = stream_ofuri
-        initial_component = self.corgi_session.components.retrieve_list(**component_filter)
-        component_cnt = initial_component.count
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = []
-            components = list()
-            if self.purl:
-                components.append(
-                    self.corgi_session.components.retrieve(initial_component.to_dict()["uuid"])
-                )
-            else:
-                for batch in range(0, component_cnt, 120):
-                    futures.append(
-                        executor.submit(
-                            self.corgi_session.components.retrieve_list,
-                            **component_filter,
-                            offset=batch,
-                            limit=120,
-                        )
+            component_filter["ofuri"] = product_stream["ofuri"]
+        pages = stream_all(self.corgi_session.components.retrieve_list, **component_filter)
+        async for page in query_engine.iterate(pages):
+            yield page
+
+    async def entries(self, ordered: bool = False) -> AsyncIterator[dict]:
+        """
+        license entry of every root component, as soon as it is complete
+
+        entries are yielded in order of completion, or with ordered in the order of
+        their root components (an entry waits for the entries before it)
+        """
+        corgi = AsyncSession(self.corgi_session)
+        children: Dict[str, asyncio.Future] = {}
+        queued: List[str] = []
+        lookups = []
+        pending: List[asyncio.Future] = []
+
+        async def lookup(purls: List[str]) -> None:
+            # always re_purl, corgi answers a purl filter with a single record, not a page
+            params = {
+                "include_fields": CHILD_FIELDS,
+                "re_purl": f"^({'|'.join(re.escape(purl) for purl in purls)})$",
+            }
+            try:
+                found = await corgi.components.retrieve_all(**params)
+            except Exception as exc:
+                if len(purls) > 1:
+                    # retry purl by purl, a single failed purl does not fail its batch
+                    await asyncio.gather(*[lookup([purl]) for purl in purls])
+                    return
+                logger.warning(f"looking up {purls[0]} failed: {exc}")
+                if not children[purls[0]].done():
+                    children[purls[0]].set_result({"purl": purls[0], "error": str(exc)})
+                return
+            # re_purl is a case insensitive regex, keep exact matches only
+            for component in found:
+                if component.purl in children and not children[component.purl].done():
+                    children[component.purl].set_result(
+                        {"purl": component.purl, **license_entry(component)}
                     )
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        components.extend(future.result().results)
-                    except Exception as exc:
-                        logger.warning("%r generated an exception: %s" % (future, exc))
-
-            for component in components:
-                purl = component.purl
-                logger.debug(purl)
-                output[purl] = {
-                    "license_declared": component.license_declared,
-                    "related_url": component.related_url,
-                    "build_id": component.software_build.build_id,
-                }
-                if component.license_concluded:
-                    # Some components can't be scanned, e.g. binary RPMs
-                    output[purl]["license_concluded"] = component.license_concluded
-                if str(component.type) not in ("RPM", "RPMMOD") and (
-                    # Report container's exact repository_url if present
-                    # Container Catalog search page is used as a fallback
-                    # Just ignore it if no specific URL is available
-                    component.download_url
-                    != "https://catalog.redhat.com/software/containers/search"
-                ):
-                    output[purl]["download_url"] = component.download_url
-
-                children = []
-                provides_filter = {
-                    "sources": purl,
-                    "include_fields": "purl,type,"
-                    "license_concluded,license_declared,"
-                    "related_url,download_url",
+            for purl in purls:
+                if not children[purl].done():
+                    children[purl].set_result(None)
+
+        async def source_lookup(purl: str) -> List[dict]:
+            # components listing the root in their sources, if its provides are not inline
+            try:
+                found = await corgi.components.retrieve_all(
+                    sources=purl, include_fields=CHILD_FIELDS
+                )
+            except Exception as exc:
+                logger.warning(f"looking up children of {purl} failed: {exc}")
+                return [{"purl": purl, "error": str(exc)}]
+            return [
+                {"purl": component.purl, **license_entry(component)}
+                for component in found
+                if component.purl != purl
+            ]
+
+        def flush() -> None:
+            if queued:
+                lookups.append(asyncio.ensure_future(lookup(queued[:])))
+                queued.clear()
+
+        async def complete(entry: dict, child_purls: Optional[List[str]]) -> dict:
+            if child_purls is None:
+                entry["children"] = await source_lookup(entry["purl"])
+                return entry
+            resolved = await asyncio.gather(*[children[purl] for purl in child_purls])
+            entry["children"] = [child for child in resolved if child is not None]
+            return entry
+
+        loop = asyncio.get_running_loop()
+        async for page in self.root_pages(corgi):
+            for component in page:
+                logger.debug(component.purl)
+                entry = {
+                    "purl": component.purl,
+                    **license_entry(component, build_id=component.software_build.build_id),
                 }
-                provides_cnt = self.corgi_session.components.retrieve_list(**provides_filter).count
-                logger.debug(provides_cnt)
-
-                if not self.exclude_children:
-                    futures_children = []
-                    for batch in range(0, provides_cnt, 120):
-                        futures_children.append(
-                            executor.submit(
-                                self.corgi_session.components.retrieve_list,
-                                **provides_filter,
-                                offset=batch,
-                                limit=120,
-                            )
-                        )
-                    for future in concurrent.futures.as_completed(futures_children):
-                        try:
-                            for c in future.result().results:
-                                child = {
-                                    "purl": c.purl,
-                                    "license_declared": c.license_declared,
-                                    "related_url": c.related_url,
-                                }
-                                if c.license_concluded:
-                                    # Some components can't be scanned, e.g. binary RPMs
-                                    child["license_concluded"] = c.license_concluded
-                                if str(c.type) not in ("RPM", "RPMMOD") and (
-                                    # Report container's exact repository_url if present
-                                    # Container Catalog search page is used as a fallback
-                                    # Just ignore it if no specific URL is available
-                                    c.download_url
-                                    != "https://catalog.redhat.com/software/containers/search"
-                                ):
-                                    child["download_url"] = c.download_url
-                                children.append(child)
-                        except Exception as exc:
-                            logger.warning("%r generated an exception: %s" % (future, exc))
-
-                    output[purl]["children"] = children
-        return output
+                if self.exclude_children:
+                    yield entry
+                    continue
+                child_purls = provided_purls(component)
+                for purl in child_purls or []:
+                    if purl not in children:
+                        children[purl] = loop.create_future()
+                        queued.append(purl)
+                        if len(queued) >= CHILD_LOOKUP_BATCH:
+                            flush()
+                pending.append(asyncio.ensure_future(complete(entry, child_purls)))
+            # partial batches are looked up once the page is done, not held for later pages
+            flush()
+            if ordered:
+                done = list(itertools.takewhile(lambda task: task.done(), pending))
+            else:
+                done = [task for task in pending if task.done()]
+            for task in done:
+                pending.remove(task)
+                yield task.result()
+        for task in pending if ordered else asyncio.as_completed(pending):
+            yield await task
+        await asyncio.gather(*lookups)
@@ -0,0 +1,241 @@
+"""
+    asyncio query engine
+
+    A single event loop, running in a background thread, drives the fan-outs of all
+    queries and reports. Blocking bindings calls run in worker threads of the loop and
+    every request counts against the limit of its upstream host (see
+    griffon.HostLimiter), so concurrent stages never pile up on a single service.
+
+"""
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import threading
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterable,
+    Iterator,
+    Optional,
+)
+
+from griffon import GRIFFON_MAX_PER_HOST, GRIFFON_MAX_WORKERS
+from griffon.services.pagination import retrieve_all
+
+logger = logging.getLogger("griffon")
+
+# blocking calls wait for their host limit inside worker threads, leave room for all hosts
+ENGINE_THREADS = 4 * max(GRIFFON_MAX_WORKERS, GRIFFON_MAX_PER_HOST)
+
+
+class QueryExit(Exception):
+    """
+    exit() or Ctrl-C within a blocking call of the engine
+
+    raised as a regular exception within the engine loop, where SystemExit would end
+    the loop thread, run() raises the original exception again to its caller
+    """
+
+    def __init__(self, exc: BaseException) -> None:
+        super().__init__(*exc.args)
+        self.exc = exc
+
+
+def _exit_as_exception(func: Callable) -> Callable:
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except (SystemExit, KeyboardInterrupt) as exc:
+            raise QueryExit(exc) from exc
+
+    return call
+
+
+class QueryEngine:
+    """
+    Event loop shared by all async queries of the process.
+
+    run() is called from synchronous code (cli commands, services) and blocks until
+    the coroutine is done. Ctrl-C cancels the coroutine with all its pending stages,
+    blocking calls which did not start yet are dropped.
+    """
+
+    def __init__(self, threads: int = ENGINE_THREADS) -> None:
+        self.threads = threads
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def _new_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="griffon-engine"
+        )
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """engine loop, started on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._executor = self._new_executor()
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(self._executor)
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(loop,), name="griffon-engine-loop", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        while True:
+            try:
+                loop.run_forever()
+                return
+            except (SystemExit, KeyboardInterrupt):
+                # exit() in a nested task (not a blocking call) escapes run_forever, the
+                # task keeps the exception for the query awaiting it
+                logger.debug("exit() within an engine task, resuming engine loop")
+
+    async def _guard(self, coroutine: Awaitable) -> tuple:
+        # exit() within a query has to end the calling thread, not the engine loop
+        try:
+            return True, await coroutine
+        except (SystemExit, KeyboardInterrupt) as exc:
+            return False, exc
+        except QueryExit as exc:
+            return False, exc.exc
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """run coroutine on the engine loop and wait for its result"""
+        loop = self.loop()
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("QueryEngine.run() called from the engine loop, await instead")
+        future = asyncio.run_coroutine_threadsafe(self._guard(coroutine), loop)
+        try:
+            ok, value = future.result()
+        except KeyboardInterrupt:
+            self.cancel(future)
+            raise
+        if not ok:
+            raise value
+        return value
+
+    def stream(self, iterable: AsyncIterable) -> Iterator:
+        """
+        iterate async iterable (eg. a report's entries) from synchronous code
+
+        items are handed over one at a time, stages started by the iterable keep
+        running on the engine loop in between
+        """
+        loop = self.loop()
+        iterator = iterable.__aiter__()
+        while True:
+            future = asyncio.run_coroutine_threadsafe(self._guard(iterator.__anext__()), loop)
+            try:
+                ok, value = future.result()
+            except StopAsyncIteration:
+                return
+            except KeyboardInterrupt:
+                self.cancel(future)
+                raise
+            if not ok:
+                raise value
+            yield value
+
+    def cancel(self, future: concurrent.futures.Future) -> None:
+        """cancel running coroutine and drop blocking calls which did not start yet"""
+        logger.debug("cancelling running query")
+        future.cancel()
+        with self._lock:
+            executor = self._executor
+            self._executor = self._new_executor()
+            assert self._loop is not None
+            self._loop.call_soon_threadsafe(self._loop.set_default_executor, self._executor)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def call(self, func: Callable, *args, **kwargs) -> Any:
+        """run blocking func in a worker thread, exit() of func raises QueryExit"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(_exit_as_exception(func), *args, **kwargs)
+        )
+
+    async def iterate(self, iterable: Iterable) -> AsyncIterator:
+        """
+        iterate blocking iterable (eg. Paginator pages) in a worker thread
+
+        items are yielded as soon as they are produced, so consumers can start work on
+        the first pages while the following ones are still being fetched
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for item in iterable:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        producer = loop.run_in_executor(None, _exit_as_exception(produce))
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        # raises exception of the producer, if any
+        await producer
+
+
+query_engine = QueryEngine()
+
+
+class AsyncOperations:
+    """
+    async view of a bindings operations group
+
+    eg. await session.components.retrieve_list(name="curl")
+    """
+
+    def __init__(self, group, engine: QueryEngine) -> None:
+        self._group = group
+        self._engine = engine
+
+    def __getattr__(self, name):
+        operation = getattr(self._group, name)
+        if not callable(operation):
+            return operation
+
+        async def call(*args, **kwargs):
+            return await self._engine.call(operation, *args, **kwargs)
+
+        return call
+
+    async def retrieve_all(self, **params) -> list:
+        """all results of retrieve_list, paginated"""
+        return await self._engine.call(retrieve_all, self._group.retrieve_list, **params)
+
+
+class AsyncSession:
+    """async adapter around a bindings (eg. corgi or osidb) session"""
+
+    def __init__(self, session, engine: QueryEngine = query_engine) -> None:
+        self._session = session
+        self._engine = engine
+
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if hasattr(attr, "retrieve_list") or hasattr(attr, "retrieve"):
+            return AsyncOperations(attr, self._engine)
+        if callable(attr):
+            return functools.partial(self._engine.call, attr)
+        return attr
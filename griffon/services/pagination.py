@@ -0,0 +1,441 @@
+"""
+    shared pagination of list endpoints
+
+"""
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from griffon import GRIFFON_MAX_PER_HOST, GRIFFON_MAX_WORKERS, host_limits
+from griffon.cache import CachedCall
+from griffon.timings import service_stage, timings
+
+logger = logging.getLogger("griffon")
+
+DEFAULT_PAGE_SIZE = 120
+MIN_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 5000
+# aim for pages which return within this many seconds
+TARGET_PAGE_LATENCY = 2.0
+# upper bound of (estimated) page payload
+MAX_PAGE_BYTES = 8 * 1024 * 1024
+MAX_IN_FLIGHT = GRIFFON_MAX_WORKERS
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+# page fetches of all paginators, requests beyond the host limits only wait for a slot
+PAGE_THREADS = 4 * max(GRIFFON_MAX_WORKERS, GRIFFON_MAX_PER_HOST)
+
+_page_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_page_executor_lock = threading.Lock()
+
+
+def transient(exc: Exception) -> bool:
+    """
+    whether a failed page fetch is worth retrying
+
+    Client errors (4xx) fail the same way again. Statuses retried by the transport of
+    the pooled http session raise RetryError once exhausted and are not retried again,
+    other server errors are (the bindings send requests without transport retries).
+    """
+    import requests
+
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and exc.response.status_code >= 500
+    if isinstance(exc, requests.exceptions.SSLError):
+        return False
+    return isinstance(
+        exc, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)
+    )
+
+
+def page_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    process wide pool fetching pages, started on first use
+
+    Paginators mostly run in worker threads of the query engine, a pool per paginator
+    would multiply the threads of the process. Page fetches never wait for other
+    tasks of the pool, so paginators can share it without deadlocking, unlike the
+    engine pool whose workers wait for pages.
+    """
+    global _page_executor
+    with _page_executor_lock:
+        if _page_executor is None:
+            _page_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=PAGE_THREADS, thread_name_prefix="griffon-pages"
+            )
+        return _page_executor
+
+
+class PageError(Exception):
+    """page of a list endpoint which still failed after retries"""
+
+
+def page_count(page) -> int:
+    """return total count of a list response (bindings model or raw json)"""
+    if isinstance(page, dict):
+        return int(page.get("count", 0))
+    return int(page.count)
+
+
+def page_results(page) -> list:
+    """return results of a list response (bindings model or raw json)"""
+    if isinstance(page, dict):
+        return page.get("results", [])
+    return page.results
+
+
+def _row_size(row) -> int:
+    """estimate serialised size of a single result row"""
+    if hasattr(row, "to_dict"):
+        row = row.to_dict()
+    return len(json.dumps(row, default=str))
+
+
+def freeze_params(params: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    """immutable, ordered snapshot of request params"""
+    frozen = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, list):
+            value = tuple(value)
+        frozen.append((name, value))
+    return tuple(frozen)
+
+
+class PageRequest(NamedTuple):
+    """immutable snapshot of a single page request"""
+
+    offset: int
+    limit: int
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    def kwargs(self) -> Dict[str, Any]:
+        """fresh keyword arguments for the list endpoint"""
+        return {**dict(self.params), "offset": self.offset, "limit": self.limit}
+
+
+class RequestPlan:
+    """
+    Immutable list of page requests, built up front and executed in parallel.
+
+    Each request carries its own params snapshot so workers never share mutable
+    state, duplicate requests are dropped when the plan is built.
+    """
+
+    def __init__(self, requests: Iterable[PageRequest]) -> None:
+        planned: List[PageRequest] = []
+        seen: Set[PageRequest] = set()
+        for request in requests:
+            if request in seen:
+                logger.debug(f"dropping duplicate page request {request}")
+                continue
+            seen.add(request)
+            planned.append(request)
+        self.requests: Tuple[PageRequest, ...] = tuple(planned)
+
+    @classmethod
+    def for_range(
+        cls,
+        params: Dict[str, Any],
+        start: int,
+        stop: int,
+        page_size: int,
+        max_pages: Optional[int] = None,
+    ) -> "RequestPlan":
+        """plan pages of page_size covering offsets start..stop"""
+        frozen = freeze_params(params)
+        requests: List[PageRequest] = []
+        for offset in range(start, stop, page_size):
+            if max_pages is not None and len(requests) >= max_pages:
+                break
+            requests.append(PageRequest(offset, page_size, frozen))
+        return cls(requests)
+
+    def __iter__(self) -> Iterator[PageRequest]:
+        return iter(self.requests)
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    @property
+    def stop(self) -> int:
+        """first offset not covered by this plan"""
+        if not self.requests:
+            return 0
+        return max(request.offset + request.limit for request in self.requests)
+
+    def execute(
+        self, fetch: Callable[[PageRequest], Any], executor: concurrent.futures.Executor
+    ) -> Iterator[Tuple[PageRequest, concurrent.futures.Future]]:
+        """submit all requests, yield (request, future) pairs in plan order"""
+        futures = [(request, executor.submit(fetch, request)) for request in self.requests]
+        yield from futures
+
+
+class FetchLedger:
+    """thread safe record of fetched pages, guards against fetching a page twice"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._fetched: Set[PageRequest] = set()
+
+    def claim(self, request: PageRequest) -> bool:
+        """mark request as fetched, return False if it already was"""
+        with self._lock:
+            if request in self._fetched:
+                return False
+            self._fetched.add(request)
+            return True
+
+    def __contains__(self, request: PageRequest) -> bool:
+        with self._lock:
+            return request in self._fetched
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._fetched)
+
+
+class Paginator:
+    """
+    Page through the full result count of a list endpoint.
+
+    The first page is used as a probe, it returns total count and its latency and
+    payload size are used to size the following pages. Remaining pages are then
+    requested as a series of RequestPlans of at most max_in_flight parallel requests,
+    each plan being resized from the measurements of the previous ones. Failed pages
+    are retried (a page still failing raises PageError rather than leaving results
+    incomplete), no page is fetched twice and pages are always yielded in offset order.
+
+    retrieve is any callable accepting list params plus offset/limit, eg.
+    session.components.retrieve_list. When it is a CachedCall the complete result
+    set is cached rather than single pages, unless cache is False. Page requests
+    count against the request limit of the endpoint host (see griffon.HostLimiter),
+    endpoint defaults to the one of a CachedCall. Pages are fetched by executor, the
+    shared page_executor() by default.
+    """
+
+    def __init__(
+        self,
+        retrieve: Callable,
+        params: Optional[Dict[str, Any]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        min_page_size: int = MIN_PAGE_SIZE,
+        max_page_size: int = MAX_PAGE_SIZE,
+        target_latency: float = TARGET_PAGE_LATENCY,
+        max_page_bytes: int = MAX_PAGE_BYTES,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        retries: int = RETRIES,
+        cache: bool = True,
+        endpoint: Optional[str] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ) -> None:
+        self.cached = retrieve if isinstance(retrieve, CachedCall) and cache else None
+        self.retrieve = retrieve.call if isinstance(retrieve, CachedCall) else retrieve
+        self.timed: Callable[[], ContextManager[None]] = nullcontext
+        if isinstance(retrieve, CachedCall):
+            self.timed = retrieve.timed
+        if endpoint is None and isinstance(retrieve, CachedCall):
+            endpoint = retrieve.endpoint
+        self.endpoint = endpoint
+        self.params = dict(params) if params else {}
+        # paging is driven by the paginator itself
+        self.params.pop("offset", None)
+        self.params.pop("limit", None)
+        self.page_size = page_size
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.target_latency = target_latency
+        self.max_page_bytes = max_page_bytes
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.executor = executor
+        self.ledger = FetchLedger()
+        self.count: Optional[int] = None
+        self.row_bytes: Optional[int] = None
+        # seconds per returned row, smoothed across pages
+        self.row_latency: Optional[float] = None
+
+    def request(self, offset: int, limit: int) -> PageRequest:
+        return PageRequest(offset, limit, freeze_params(self.params))
+
+    def fetch(self, request: PageRequest):
+        """fetch a single page, retrying transient failures"""
+        if not self.ledger.claim(request):
+            raise RuntimeError(f"page {request.offset}:{request.limit} was already fetched")
+        attempt = 0
+        while True:
+            try:
+                with host_limits.limit_for(self.endpoint) if self.endpoint else nullcontext():
+                    start = time.monotonic()
+                    with self.timed():
+                        page = self.retrieve(**request.kwargs())
+                if self.endpoint:
+                    timings.count(service_stage(self.endpoint), "pages")
+                return page, time.monotonic() - start
+            except Exception as exc:
+                attempt += 1
+                if attempt > self.retries or not transient(exc):
+                    raise
+                if self.endpoint:
+                    timings.count(service_stage(self.endpoint), "page_retries")
+                logger.debug(
+                    f"page offset={request.offset} limit={request.limit} failed ({exc}), retrying"
+                )
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    def measure(self, rows: list, latency: float) -> None:
+        """update latency and payload estimates from a completed page"""
+        if not rows:
+            return
+        if self.row_bytes is None:
+            self.row_bytes = max(1, _row_size(rows[0]))
+        row_latency = latency / len(rows)
+        if self.row_latency is None:
+            self.row_latency = row_latency
+        else:
+            self.row_latency = 0.7 * self.row_latency + 0.3 * row_latency
+
+    def next_page_size(self) -> int:
+        """size the next pages so they fit target latency and payload bounds"""
+        size = self.page_size
+        if self.row_latency:
+            size = int(self.target_latency / self.row_latency)
+        if self.row_bytes:
+            size = min(size, self.max_page_bytes // self.row_bytes)
+        return max(self.min_page_size, min(self.max_page_size, size))
+
+    def page_error(self, request: PageRequest, exc: Exception) -> PageError:
+        """error for a page which failed, after retries when the failure was transient"""
+        endpoint = f"{self.endpoint} " if self.endpoint else ""
+        total = f" of {self.count} results" if self.count is not None else ""
+        retries = f" after {self.retries} retries" if transient(exc) else ""
+        return PageError(
+            f"{endpoint}page offset={request.offset} limit={request.limit}{total} "
+            f"failed{retries}: {exc}"
+        )
+
+    def fetch_page(self, request: PageRequest) -> Tuple[Any, float]:
+        """fetch page, raising PageError once retries are exhausted"""
+        try:
+            return self.fetch(request)
+        except Exception as exc:
+            raise self.page_error(request, exc) from exc
+
+    def fill(self, offset: int, limit: int) -> list:
+        """sequentially fetch rows missing from a page truncated by the server"""
+        rows: list = []
+        while limit > 0:
+            page, _ = self.fetch_page(self.request(offset, min(limit, self.max_page_size)))
+            page_rows = page_results(page)
+            if not page_rows:
+                break
+            rows.extend(page_rows)
+            offset += len(page_rows)
+            limit -= len(page_rows)
+        return rows
+
+    def complete(self, rows: list, request: PageRequest) -> list:
+        """ensure page holds all expected rows, servers may cap the page size"""
+        expected = request.limit
+        if self.count is not None:
+            expected = min(request.limit, self.count - request.offset)
+        if 0 < len(rows) < expected:
+            logger.debug(f"server capped page size at {len(rows)}")
+            self.max_page_size = len(rows)
+            rows = rows + self.fill(request.offset + len(rows), expected - len(rows))
+        return rows
+
+    def __iter__(self) -> Iterator[list]:
+        """yield list of results for each page, in offset order"""
+        if self.cached is None:
+            yield from self.pages()
+            return
+        rows = self.cached.lookup_all(self.params)
+        if rows is not None:
+            self.count = len(rows)
+            yield rows
+            return
+        collected: list = []
+        for rows in self.pages():
+            collected.extend(rows)
+            yield rows
+        self.cached.store_all(self.params, collected)
+
+    def pages(self) -> Iterator[list]:
+        """fetch pages from the service"""
+        first_page, latency = self.fetch_page(self.request(0, self.page_size))
+        self.count = page_count(first_page)
+        rows = page_results(first_page)
+        self.measure(rows, latency)
+        if 0 < len(rows) < min(self.page_size, self.count):
+            self.max_page_size = len(rows)
+        logger.debug(f"paginating {self.count} results")
+        yield rows
+
+        offset = len(rows) or self.page_size
+        if offset >= self.count:
+            return
+
+        executor = self.executor or page_executor()
+        while offset < self.count:
+            plan = RequestPlan.for_range(
+                self.params,
+                offset,
+                self.count,
+                self.next_page_size(),
+                max_pages=self.max_in_flight,
+            )
+            offset = plan.stop
+            submitted = list(plan.execute(self.fetch, executor))
+            try:
+                for request, future in submitted:
+                    try:
+                        page, latency = future.result()
+                    except Exception as exc:
+                        # partial results would be reported as complete (counts, totals)
+                        raise self.page_error(request, exc) from exc
+                    rows = page_results(page)
+                    self.measure(rows, latency)
+                    yield self.complete(rows, request)
+            finally:
+                # failed or abandoned (eg. streamed output closed) plans drop their pages
+                for _, future in submitted:
+                    future.cancel()
+
+    def results(self) -> List[Any]:
+        """retrieve all results"""
+        results: List[Any] = []
+        for rows in self:
+            results.extend(rows)
+        return results
+
+
+def retrieve_all(retrieve: Callable, **params) -> List[Any]:
+    """retrieve all results of a list endpoint"""
+    return Paginator(retrieve, params).results()
+
+
+def stream_all(retrieve: Callable, **params) -> Paginator:
+    """
+    pages of a list endpoint, fetched as they are iterated
+
+    streamed results bypass the response cache, storing them would collect the
+    whole result set in memory
+    """
+    return Paginator(retrieve, params, cache=False)
@@ -0,0 +1,269 @@
+"""
+    streaming spdx manifest reader
+
+    Manifests of large products and containers are tens of MB of json. Top level
+    arrays (packages, relationships) are read incrementally from a file or http
+    response, decoding a single entry at a time, so packages can be filtered (and
+    printed) without holding the document in memory.
+
+"""
+import codecs
+import json
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# relationships naming the child first (eg. A CONTAINED_BY B), others name the parent first
+REVERSED_RELATIONSHIP = re.compile(r"_(OF|BY)$")
+DOCUMENT_ID = "SPDXRef-DOCUMENT"
+
+
+class JsonReader:
+    """incremental reader of a json document, values are decoded from a sliding buffer"""
+
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int = CHUNK_SIZE) -> bool:
+        """append at least size characters (unless at end of stream) to buffer"""
+        if self.eof:
+            return False
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunks = []
+        read = 0
+        while read < size:
+            chunk = self.stream.read(CHUNK_SIZE)
+            if not chunk:
+                self.eof = True
+                break
+            text = self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            chunks.append(text)
+            read += len(text)
+        self.buffer += "".join(chunks)
+        return read > 0
+
+    def peek(self) -> str:
+        """next non whitespace character, empty at end of document"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()  # type: ignore
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} at {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """decode next value, reading more of the stream until it is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                end = None
+            # a value ending with the buffer may continue (eg. numbers)
+            if end is not None and (end < len(self.buffer) or self.eof):
+                self.pos = end
+                return value
+            # grow geometrically, values larger than a chunk are not decoded over and over
+            if not self.fill(max(CHUNK_SIZE, len(self.buffer) - self.pos)):
+                if end is None:
+                    raise ValueError(f"malformed json at {self.pos}")
+
+    def items(self) -> Iterator[Any]:
+        """decode entries of the array starting at the current position"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def skip(self) -> None:
+        """skip next value, arrays entry by entry"""
+        if self.peek() == "[":
+            for _ in self.items():
+                pass
+        else:
+            self.value()
+
+
+def iter_arrays(stream, keys: Sequence[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    (key, entry) of the top level arrays keys of a json object, in document order
+
+    other members are skipped without being kept, reading stops after the last of keys
+    """
+    reader = JsonReader(stream)
+    remaining = set(keys)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while remaining:
+        key = reader.value()
+        reader.expect(":")
+        if key in remaining and reader.peek() == "[":
+            remaining.discard(key)
+            for entry in reader.items():
+                yield key, entry
+        else:
+            reader.skip()
+        if reader.peek() != ",":
+            reader.expect("}")
+            return
+        reader.pos += 1
+
+
+def iter_packages(stream) -> Iterator[dict]:
+    """packages of a spdx manifest, one at a time"""
+    for _, package in iter_arrays(stream, ("packages",)):
+        yield package
+
+
+def package_purl(package: dict) -> Optional[str]:
+    for ref in package.get("externalRefs") or []:
+        locator = ref.get("referenceLocator") or ""
+        if locator.startswith("pkg:"):
+            return locator
+    return None
+
+
+def select_elements(stream, elements: Set[str]) -> Dict[str, Any]:
+    """
+    manifest without packages (skipped entry by entry), relationships and described
+    elements are limited to elements
+    """
+
+    def kept(element) -> bool:
+        # NOASSERTION, NONE and references to other documents are kept
+        return element in elements or not str(element).startswith("SPDXRef-")
+
+    reader = JsonReader(stream)
+    document: Dict[str, Any] = {}
+    reader.expect("{")
+    if reader.peek() == "}":
+        return document
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "packages":
+            reader.skip()
+            document[key] = []
+        elif key == "documentDescribes" and reader.peek() == "[":
+            document[key] = [element for element in reader.items() if kept(element)]
+        elif key == "relationships" and reader.peek() == "[":
+            document[key] = [
+                relationship
+                for relationship in reader.items()
+                if kept(relationship.get("spdxElementId"))
+                and kept(relationship.get("relatedSpdxElement"))
+            ]
+        else:
+            document[key] = reader.value()
+        if reader.peek() != ",":
+            reader.expect("}")
+            return document
+        reader.pos += 1
+
+
+def relationship_depths(stream, max_depth: Optional[int] = None) -> Dict[str, int]:
+    """
+    depth of packages below the document, packages it describes have depth 0
+
+    only element ids and relationships are kept, not the packages
+    """
+    children: Dict[str, List[str]] = defaultdict(list)
+    has_parent = set()
+    for key, entry in iter_arrays(stream, ("documentDescribes", "relationships")):
+        if key == "documentDescribes":
+            children[DOCUMENT_ID].append(entry)
+            continue
+        parent, child = entry.get("spdxElementId"), entry.get("relatedSpdxElement")
+        if REVERSED_RELATIONSHIP.search(entry.get("relationshipType") or ""):
+            parent, child = child, parent
+        if parent and child:
+            children[parent].append(child)
+            has_parent.add(child)
+    if DOCUMENT_ID in children:
+        level = children.pop(DOCUMENT_ID)
+    else:
+        level = [element for element in children if element not in has_parent]
+    depths: Dict[str, int] = {}
+    depth = 0
+    while level and (max_depth is None or depth <= max_depth):
+        next_level = []
+        for element in level:
+            if element not in depths:
+                depths[element] = depth
+                next_level.extend(children.get(element, []))
+        level = next_level
+        depth += 1
+    return depths
+
+
+class ManifestFilter:
+    """select manifest packages by purl type, name regex and relationship depth"""
+
+    def __init__(
+        self,
+        purl_type: Optional[str] = None,
+        name: Optional[str] = None,
+        max_depth: Optional[int] = None,
+    ) -> None:
+        self.purl_type = purl_type.lower() if purl_type else None
+        self.name = re.compile(name) if name else None
+        self.max_depth = max_depth
+
+    def __bool__(self) -> bool:
+        return bool(self.purl_type or self.name or self.max_depth is not None)
+
+    def packages(self, open_manifest: Callable[[], Any]) -> Iterator[dict]:
+        """
+        stream selected packages of the manifest opened by open_manifest
+
+        a depth filter reads the manifest twice, relationships first, then packages
+        """
+        depths = None
+        if self.max_depth is not None:
+            with open_manifest() as stream:
+                depths = relationship_depths(stream, self.max_depth)
+        with open_manifest() as stream:
+            for package in iter_packages(stream):
+                if depths is not None and package.get("SPDXID") not in depths:
+                    continue
+                if self.name and not self.name.search(package.get("name") or ""):
+                    continue
+                if self.purl_type:
+                    purl = package_purl(package) or ""
+                    if purl[4:].split("/", 1)[0].lower() != self.purl_type:
+                        continue
+                yield package
+
+    def document(self, open_manifest: Callable[[], Any]) -> Dict[str, Any]:
+        """
+        spdx document of the selected packages, with the members of the manifest and
+        relationships between selected packages
+        """
+        packages = list(self.packages(open_manifest))
+        elements = {package["SPDXID"] for package in packages if package.get("SPDXID")}
+        elements.add(DOCUMENT_ID)
+        with open_manifest() as stream:
+            document = select_elements(stream, elements)
+        document["packages"] = packages
+        return document
@@ -0,0 +1,225 @@
+"""
+    columnar table output
+
+    Records are turned into typed columns once, repeated strings (product streams,
+    types, arches, ...) are dictionary encoded, then written in bulk as csv/tsv or,
+    when pyarrow is installed, as parquet/arrow.
+
+"""
+import csv
+import json
+import os
+import sys
+from array import array
+from itertools import chain
+from operator import methodcaller
+from typing import Any, Dict, Iterable, List, Optional
+
+import click
+
+from griffon.formats import TABLE_FORMATS
+
+# string columns with at most this share of distinct values are dictionary encoded
+DICTIONARY_RATIO = 0.5
+# rows decoded at once when writing csv/tsv
+CHUNK_ROWS = 65536
+
+NESTED_TYPES = frozenset((list, dict))
+
+json_encoder = json.JSONEncoder(default=str)
+
+
+def encode_json(value: Any) -> Optional[str]:
+    return None if value is None else json_encoder.encode(value)
+
+
+def column_kind(values: List[Any]) -> str:
+    """infer column type, one of bool, int, float, string or json (nested values)"""
+    types = set(map(type, values))
+    types.discard(type(None))
+    if not types or types == {str}:
+        return "string"
+    if types == {bool}:
+        return "bool"
+    if types == {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types <= {str, int, float, bool}:
+        return "mixed"
+    return "json"
+
+
+class Column:
+    """
+    typed column of a table
+
+    Strings with few distinct values are kept as codes into a dictionary of values,
+    nested values (lists, dicts) are json encoded.
+    """
+
+    def __init__(self, name: str, values: List[Any]) -> None:
+        self.name = name
+        self.kind = column_kind(values)
+        if self.kind == "json":
+            values = [encode_json(value) for value in values]
+        elif self.kind == "mixed":
+            values = [None if value is None else str(value) for value in values]
+        self.values: Optional[List[Any]] = values
+        self.dictionary: Optional[List[Any]] = None
+        self.codes: Optional[array] = None
+        if self.kind in ("string", "json", "mixed"):
+            self.encode()
+
+    def encode(self) -> None:
+        """dictionary encode values, unless most of them are distinct"""
+        assert self.values is not None
+        distinct = dict.fromkeys(self.values)
+        distinct.pop(None, None)
+        if len(distinct) > DICTIONARY_RATIO * len(self.values):
+            return
+        self.dictionary = list(distinct)
+        index = {value: code for code, value in enumerate(self.dictionary)}
+        index[None] = -1
+        self.codes = array("i", map(index.__getitem__, self.values))
+        self.values = None
+
+    def __len__(self) -> int:
+        return len(self.codes if self.codes is not None else self.values)  # type: ignore
+
+    def decoded(self, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """plain values of rows start..stop"""
+        if self.codes is None:
+            return self.values[start:stop]  # type: ignore
+        # code -1 (missing value) picks the trailing None
+        lookup = self.dictionary + [None]  # type: ignore
+        return list(map(lookup.__getitem__, self.codes[start:stop]))
+
+    def to_arrow(self, pa):
+        if self.codes is None:
+            types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64()}
+            return pa.array(self.values, type=types.get(self.kind, pa.string()))
+        import pyarrow.compute as pc
+
+        indices = pa.Array.from_buffers(pa.int32(), len(self), [None, pa.py_buffer(self.codes)])
+        indices = pc.if_else(pc.less(indices, 0), pa.scalar(None, pa.int32()), indices)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.dictionary, pa.string()))
+
+
+def iter_row_pages(records: Iterable, explode: Optional[str] = None) -> Iterable[List[dict]]:
+    """
+    pages of row dicts from records or pages (lists) of records
+
+    with explode, each item of the nested explode list becomes a row, merged with
+    the other fields of its parent record
+    """
+    for page in records:
+        rows = []
+        for record in page if isinstance(page, list) else [page]:
+            if not isinstance(record, dict):
+                record = record.to_dict()
+            if explode is None or not isinstance(record.get(explode), list):
+                rows.append(record)
+                continue
+            parent = {name: value for name, value in record.items() if name != explode}
+            for item in record[explode]:
+                rows.append(
+                    {**parent, **item} if isinstance(item, dict) else {**parent, explode: item}
+                )
+        yield rows
+
+
+class Table:
+    """columns of equal length"""
+
+    def __init__(self, columns: List[Column]) -> None:
+        self.columns = columns
+
+    @property
+    def names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    @classmethod
+    def from_records(cls, records: Iterable, explode: Optional[str] = None) -> "Table":
+        """
+        build table in a single pass over records
+
+        records may be dicts, bindings models or pages of them (eg. Paginator), only
+        column arrays are kept, not the records
+        """
+        values: Dict[str, List[Any]] = {}
+        count = 0
+        for rows in iter_row_pages(records, explode):
+            # transpose page by page, rows of a page mostly share their fields
+            for name in dict.fromkeys(chain.from_iterable(rows)):
+                if name not in values:
+                    values[name] = [None] * count
+            for name, column in values.items():
+                page_values = list(map(methodcaller("get", name), rows))
+                if NESTED_TYPES.intersection(map(type, page_values)):
+                    # encode nested values right away, rather than keeping them alive
+                    page_values = [encode_json(value) for value in page_values]
+                column.extend(page_values)
+            count += len(rows)
+        columns = []
+        for name in list(values):
+            columns.append(Column(name, values.pop(name)))
+        return cls(columns)
+
+    def write_csv(self, out, delimiter: str = ",") -> None:
+        if not self.columns:
+            return
+        writer = csv.writer(out, delimiter=delimiter, lineterminator="\n")
+        writer.writerow(self.names)
+        for start in range(0, len(self), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            writer.writerows(zip(*[column.decoded(start, stop) for column in self.columns]))
+
+    def to_arrow(self):
+        pa = import_pyarrow()
+        return pa.Table.from_arrays(
+            [column.to_arrow(pa) for column in self.columns], names=self.names
+        )
+
+    def write(self, table_format: Optional[str] = None, path: Optional[str] = None) -> None:
+        """
+        write table to path (default stdout)
+
+        format defaults to the path extension, otherwise csv
+        """
+        if table_format is None:
+            extension = os.path.splitext(path or "")[1].lstrip(".").lower()
+            table_format = extension if extension in TABLE_FORMATS else "csv"
+        if table_format in ("csv", "tsv"):
+            delimiter = "\t" if table_format == "tsv" else ","
+            if path is None:
+                self.write_csv(sys.stdout, delimiter)
+                return
+            with open(path, "w", newline="") as f:
+                self.write_csv(f, delimiter)
+            return
+
+        arrow_table = self.to_arrow()
+        sink = path if path is not None else sys.stdout.buffer
+        if table_format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(arrow_table, sink)
+            return
+        import pyarrow as pa
+
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise click.ClickException(
+            "parquet and arrow table output require pyarrow, install with pip install pyarrow"
+        )
+    return pyarrow
@@ -0,0 +1,199 @@
+"""
+    request and stage timings
+
+    With --timings, every outgoing http request is recorded against its service,
+    together with queries and reports, the middleware cli and rendering. Direct
+    requests are recorded by a response hook of the pooled griffon session, bindings
+    requests (made outside of it) by timing their calls. Stages run concurrently, so
+    besides the summed time of their calls the report shows their wall time (the
+    union of their call intervals).
+
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class Stage:
+    """aggregated calls of a stage"""
+
+    # retries are made by the http transport (urllib3), page_retries by the paginator
+    # fetching a failed page again, a page retry is not also a transport retry
+    COUNTERS = ("bytes", "pages", "retries", "page_retries", "cache_hits")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.intervals: List[Tuple[float, float]] = []
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def wall_seconds(self) -> float:
+        """time during which at least one call of the stage was running"""
+        total = 0.0
+        running_end: Optional[float] = None
+        for start, end in sorted(self.intervals):
+            if running_end is None or start > running_end:
+                total += end - start
+                running_end = end
+            elif end > running_end:
+                total += end - running_end
+                running_end = end
+        return total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_seconds(), 4),
+            "seconds": round(self.seconds, 4),
+            "max_seconds": round(self.max_seconds, 4),
+            **self.counters,
+        }
+
+
+class Timings:
+    """process wide timings of the running command, collected once enabled"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Stage] = {}
+        self.started = time.perf_counter()
+
+    def enable(self) -> None:
+        """start collecting (again)"""
+        with self._lock:
+            self.stages = {}
+            self.started = time.perf_counter()
+            self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def _stage(self, name: str) -> Stage:
+        if name not in self.stages:
+            self.stages[name] = Stage()
+        return self.stages[name]
+
+    def record(self, name: str, start: float, end: float, **counters: int) -> None:
+        """record a call of stage, counters are added to the stage counters"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stage(name)
+            stage.calls += 1
+            stage.seconds += end - start
+            stage.max_seconds = max(stage.max_seconds, end - start)
+            stage.intervals.append((start, end))
+            for counter, value in counters.items():
+                stage.counters[counter] += value
+
+    def count(self, name: str, counter: str, value: int = 1) -> None:
+        """add to a counter (eg. pages, cache_hits) of stage without recording a call"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stage(name).counters[counter] += value
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """record the enclosed block as a call of stage, also when it exits"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = sorted(
+                (
+                    (name, stage.wall_seconds(), stage.to_dict())
+                    for name, stage in self.stages.items()
+                ),
+                key=lambda item: item[1],
+                reverse=True,
+            )
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": {name: stage for name, _, stage in stages},
+        }
+
+    def format_report(self, report: Dict[str, Any]) -> str:
+        lines = [
+            f"{'stage':<48} {'calls':>6} {'wall s':>8} {'sum s':>8} {'max s':>7} "
+            f"{'KB':>9} {'pages':>6} {'retries':>7} {'page retries':>12} {'cached':>6}"
+        ]
+        for name, stage in report["stages"].items():
+            lines.append(
+                f"{name[:48]:<48} {stage['calls']:>6} {stage['wall_seconds']:>8.3f} "
+                f"{stage['seconds']:>8.3f} {stage['max_seconds']:>7.3f} "
+                f"{stage['bytes'] / 1e3:>9.1f} {stage['pages']:>6} {stage['retries']:>7} "
+                f"{stage['page_retries']:>12} {stage['cache_hits']:>6}"
+            )
+        lines.append(f"total {report['wall_seconds']:.3f} s")
+        return "\n".join(lines)
+
+    def write_report(self, path: Optional[str] = None) -> None:
+        """print report to stderr, or write it as json to path"""
+        import click
+
+        report = self.report()
+        self.disable()
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return
+        click.echo(self.format_report(report), err=True)
+
+
+timings = Timings()
+
+_service_stages: Dict[str, str] = {}
+
+
+def service_stage(url: str) -> str:
+    """stage of requests to the host of url, named after its service"""
+    host = urlparse(url).netloc or url
+    if host not in _service_stages:
+        from griffon import COMMUNITY_COMPONENTS_API_URL, CORGI_API_URL, OSIDB_API_URL
+
+        services = {
+            urlparse(CORGI_API_URL).netloc: "component registry",
+            urlparse(COMMUNITY_COMPONENTS_API_URL).netloc: "community component registry",
+            urlparse(OSIDB_API_URL).netloc: "osidb",
+        }
+        services.pop("", None)
+        _service_stages[host] = services.get(host, f"http {host}")
+    return _service_stages[host]
+
+
+def record_response(response, *args, **kwargs) -> None:
+    """requests response hook, records request latency, body size and transport retries"""
+    if not timings.enabled:
+        return
+    elapsed = response.elapsed.total_seconds()
+    if kwargs.get("stream"):
+        size = int(response.headers.get("Content-Length") or 0)
+    else:
+        # body is read right after the hook anyway, time it as part of the request
+        start = time.perf_counter()
+        size = len(response.content or b"")
+        elapsed += time.perf_counter() - start
+    retries = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+    end = time.perf_counter()
+    timings.record(
+        service_stage(response.url), end - elapsed, end, bytes=size, retries=len(retries)
+    )
+
+
+def install_requests_hook(session) -> None:
+    """add record_response to the response hooks of a requests session owned by griffon"""
+    if record_response not in session.hooks["response"]:
+        session.hooks["response"].append(record_response)
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+    offline Component Registry and OSIDB stand-in, serves recorded (or built-in) data
+
+    usage: scripts/mock_services.py [--port 8900] [--recordings recordings.json]
+                                    [--latency-ms 20] [--jitter-ms 10] [--max-page-size 100]
+           scripts/mock_services.py --record https://corgi.example.com --output recordings.json
+
+    List endpoints filter, page (offset/limit, capped at max-page-size) and project
+    (include_fields) the records of a collection like the real services do, so page
+    counts and payload sizes follow griffon's requests. Recordings are written by the
+    --record proxy, which forwards requests to a live service and keeps the returned
+    records with user data (names, emails, descriptions) anonymised.
+
+    GET /__stats returns the number of requests served per path, POST /__reset clears it.
+
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode, urlparse
+from urllib.request import urlopen
+
+COMPONENTS = "/api/v1/components"
+PRODUCT_STREAMS = "/api/v1/product_streams"
+FLAWS = "/osidb/api/v1/flaws"
+AFFECTS = "/osidb/api/v1/affects"
+STATUS = "/api/v1/status"
+STATUS_ENTITIES = (
+    "builds",
+    "products",
+    "product_versions",
+    "product_streams",
+    "product_variants",
+    "channels",
+    "components",
+    "relations",
+)
+
+# paging, projection and ordering params, not record filters
+NON_FILTER_PARAMS = {"limit", "offset", "include_fields", "exclude_fields", "view", "order"}
+# collections answering a single record (not a page) when filtered by one of these
+SINGLE_RECORD_PARAMS = {
+    COMPONENTS: {"purl"},
+    PRODUCT_STREAMS: {"name", "ofuri"},
+    "/api/v1/product_versions": {"name", "ofuri"},
+    "/api/v1/products": {"name", "ofuri"},
+}
+# relations matched against the purl (or name) of their entries, eg. sources=<purl>
+RELATION_PARAMS = {"sources", "provides", "upstreams"}
+ANONYMISED_FIELDS = {"owner", "reporter", "assignee", "email", "description", "comment"}
+
+DEFAULT_SEED_COMPONENTS = 2000
+DEFAULT_SEED_FLAWS = 300
+# host of links in the built-in data, served as the host of the request
+SEED_BASE_URL = "http://mock"
+
+
+def anonymise(value, field=None):
+    """replace user data in a recorded record by a stable digest"""
+    if isinstance(value, dict):
+        return {key: anonymise(item, key) for key, item in value.items()}
+    if isinstance(value, list):
+        return [anonymise(item, field) for item in value]
+    if field in ANONYMISED_FIELDS and isinstance(value, str) and value:
+        return f"anon-{hashlib.sha256(value.encode()).hexdigest()[:12]}"
+    return value
+
+
+def seed_data(components=DEFAULT_SEED_COMPONENTS, flaws=DEFAULT_SEED_FLAWS, seed=0):
+    """built-in collections, used when no recordings are given"""
+    rng = random.Random(seed)
+    base_url = SEED_BASE_URL
+    streams = []
+    for major in (8, 9):
+        for minor in range(10):
+            name = f"rhel-{major}.{minor}.0.z"
+            uuid = f"ps-{major}-{minor}"
+            streams.append(
+                {
+                    "uuid": uuid,
+                    "link": f"{base_url}{PRODUCT_STREAMS}/{uuid}",
+                    "name": name,
+                    "ofuri": f"o:redhat:rhel:{major}.{minor}.0.z",
+                    "active": True,
+                    "products": [{"name": "rhel"}],
+                    "product_versions": [{"name": f"rhel-{major}"}],
+                    "manifest": f"{base_url}{PRODUCT_STREAMS}/{uuid}/manifest",
+                }
+            )
+    names = ["curl", "openssl", "kernel", "bash", "python3", "glibc", "systemd", "nodejs"]
+    names += [f"component-{n}" for n in range(components // 10)]
+    records = []
+    for n in range(components):
+        name = names[n % len(names)]
+        version = f"{rng.randint(1, 9)}.{rng.randint(0, 20)}"
+        release = f"{n}.el{rng.choice((8, 9))}"
+        nvr = f"{name}-{version}-{release}"
+        root = n % 4 == 0
+        component_type = rng.choice(("RPM", "RPM", "RPM", "OCI", "NPM", "GOLANG"))
+        purl = f"pkg:{component_type.lower()}/redhat/{name}@{version}-{release}" + (
+            "?arch=src" if root else "?arch=x86_64"
+        )
+        in_streams = rng.sample(streams, rng.randint(1, 4))
+        upstream = f"pkg:generic/{name}@{version}"
+        records.append(
+            {
+                "uuid": f"c-{n}",
+                "link": f"{base_url}{COMPONENTS}/c-{n}",
+                "purl": purl,
+                "name": name,
+                "nvr": nvr,
+                "version": version,
+                "release": release,
+                "arch": "src" if root else "x86_64",
+                "type": component_type,
+                "namespace": "REDHAT",
+                "related_url": f"https://example.com/{name}",
+                "download_url": f"https://example.com/{name}/{nvr}.tar.gz",
+                "license_declared": rng.choice(("MIT", "GPLv2", "ASL 2.0", "BSD")),
+                "license_concluded": "",
+                "product_streams": [
+                    {
+                        "name": ps["name"],
+                        "ofuri": ps["ofuri"],
+                        "link": ps["link"],
+                        "product_versions": ps["product_versions"],
+                    }
+                    for ps in in_streams
+                ],
+                "sources": [],
+                "provides": [],
+                "upstreams": [{"purl": upstream, "name": name, "nvr": f"{name}-{version}"}],
+                "software_build": {"build_id": str(n), "source": f"git://example.com/{name}#{n}"},
+                "root_component": root,
+            }
+        )
+    # each root (every 4th component) provides the 3 components after it, and shares
+    # one of them with the next root
+    for n, child in enumerate(records):
+        if child["root_component"]:
+            continue
+        parents = [records[n - n % 4]]
+        if n % 4 == 1 and n + 3 < len(records):
+            parents.append(records[n + 3])
+        for parent in parents:
+            child["sources"].append({"purl": parent["purl"], "link": parent["link"]})
+            parent["provides"].append({"purl": child["purl"], "link": child["link"]})
+
+    flaw_records, affect_records = [], []
+    for n in range(flaws):
+        cve_id = f"CVE-2023-{10000 + n}"
+        impact = rng.choice(("LOW", "MODERATE", "IMPORTANT", "CRITICAL"))
+        affects = []
+        for component in rng.sample(names[:50], rng.randint(1, 5)):
+            affect = {
+                "uuid": f"a-{n}-{component}",
+                "flaw": f"f-{n}",
+                "flaw_cve_id": cve_id,
+                "ps_module": f"rhel-{rng.choice((8, 9))}",
+                "ps_component": component,
+                "affectedness": rng.choice(("AFFECTED", "NOTAFFECTED", "NEW")),
+                "resolution": rng.choice(("FIX", "DEFER", "WONTFIX", "")),
+                "impact": impact,
+                "trackers": [],
+            }
+            affects.append(affect)
+            affect_records.append(affect)
+        flaw_records.append(
+            {
+                "uuid": f"f-{n}",
+                "cve_id": cve_id,
+                "title": f"{cve_id} issue in {affects[0]['ps_component']}",
+                "description": f"description of {cve_id}",
+                "impact": impact,
+                "state": rng.choice(("NEW", "TRIAGE", "DONE")),
+                "resolution": rng.choice(("", "FIX", "DEFER", "WONTFIX")),
+                "classification": {"workflow": "DEFAULT", "state": "NEW"},
+                "affects": affects,
+            }
+        )
+    return {
+        COMPONENTS: records,
+        PRODUCT_STREAMS: streams,
+        FLAWS: flaw_records,
+        AFFECTS: affect_records,
+    }
+
+
+def lookup(record, path):
+    """values at a dotted (or django __) path of record, lists are flattened"""
+    values = [record]
+    for key in re.split(r"\.|__", path):
+        found = []
+        for value in values:
+            items = value if isinstance(value, list) else [value]
+            found.extend(item[key] for item in items if isinstance(item, dict) and key in item)
+        values = found
+    return [item for value in values for item in (value if isinstance(value, list) else [value])]
+
+
+def matches(record, param, value):
+    if param.startswith("re_"):
+        pattern = re.compile(value)
+        return any(pattern.search(str(item)) for item in lookup(record, param[3:]))
+    if param in RELATION_PARAMS:
+        return any(value in (item.get("purl"), item.get("name")) for item in record.get(param, []))
+    if param in ("ofuri", "product_streams") and "product_streams" in record:
+        return any(value in (ps.get("ofuri"), ps.get("name")) for ps in record["product_streams"])
+    if param == "root_components":
+        return record.get("root_component") == (value.lower() == "true")
+    found = lookup(record, param)
+    if not found:
+        # filters without a matching field (eg. latest_components_by_streams) select all
+        return "." not in param and "__" not in param and param not in record
+    accepted = {item.lower() for item in value.split(",")}
+    return any(str(item).lower() in accepted for item in found)
+
+
+def project(record, fields):
+    """record reduced to dotted include_fields"""
+    projected = {}
+    for field in fields:
+        key, _, rest = field.partition(".")
+        if key not in record:
+            continue
+        value = record[key]
+        if not rest:
+            projected[key] = value
+        elif isinstance(value, list):
+            existing = projected.setdefault(key, [{} for _ in value])
+            for target, item in zip(existing, value):
+                if isinstance(item, dict):
+                    target.update(project(item, [rest]))
+        elif isinstance(value, dict):
+            projected.setdefault(key, {}).update(project(value, [rest]))
+    return projected
+
+
+def spdx_manifest(components):
+    packages = [
+        {
+            "SPDXID": f"SPDXRef-{component['uuid']}",
+            "name": component["name"],
+            "versionInfo": component["version"],
+            "licenseDeclared": component.get("license_declared") or "NOASSERTION",
+            "externalRefs": [
+                {
+                    "referenceCategory": "PACKAGE-MANAGER",
+                    "referenceLocator": component["purl"],
+                    "referenceType": "purl",
+                }
+            ],
+        }
+        for component in components
+    ]
+    return {
+        "spdxVersion": "SPDX-2.3",
+        "dataLicense": "CC0-1.0",
+        "SPDXID": "SPDXRef-DOCUMENT",
+        "documentDescribes": [package["SPDXID"] for package in packages],
+        "packages": packages,
+        "relationships": [],
+    }
+
+
+class MockServices:
+    """collections served by the stand-in, with request statistics"""
+
+    def __init__(self, collections, latency=0.0, jitter=0.0, max_page_size=100, seed=0):
+        self.collections = collections
+        self.latency = latency
+        self.jitter = jitter
+        self.max_page_size = max_page_size
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self._lock:
+                jitter = self.rng.uniform(-self.jitter, self.jitter)
+            time.sleep(max(0.0, self.latency + jitter))
+
+    def status(self):
+        """component registry status, entity counts of the served collections"""
+        counts = {
+            entity: {"count": len(self.collections.get(f"/api/v1/{entity}", []))}
+            for entity in STATUS_ENTITIES
+        }
+        status = {
+            "status": "ok",
+            "dt": "2023-01-01T00:00:00Z",
+            "service_version": "mock",
+            "db_size": "0 MB",
+            **counts,
+        }
+        return {"count": 1, "next": None, "previous": None, "results": [status], **status}
+
+    def collection(self, path):
+        """collection and record uuid (or None) of a request path"""
+        for name, records in self.collections.items():
+            if path.rstrip("/") == name:
+                return name, None
+            if path.startswith(f"{name}/"):
+                return name, path[len(name) + 1 :].strip("/")
+        return None, None
+
+    def respond(self, path, params, base_url):
+        """(status, body) of a GET request"""
+        if path.rstrip("/") == STATUS:
+            return 200, self.status()
+        name, rest = self.collection(path)
+        if name is None:
+            return 404, {"detail": "Not found."}
+        records = self.collections[name]
+        if rest:
+            uuid, _, sub = rest.partition("/")
+            record = next((r for r in records if r.get("uuid") == uuid), None)
+            if record is None:
+                return 404, {"detail": "Not found."}
+            if sub == "manifest":
+                if name == PRODUCT_STREAMS:
+                    members = [
+                        c
+                        for c in self.collections.get(COMPONENTS, [])
+                        if any(ps.get("ofuri") == record["ofuri"] for ps in c["product_streams"])
+                    ]
+                else:
+                    members = [record]
+                return 200, spdx_manifest(members)
+            return 200, record
+        filters = {k: v for k, v in params.items() if k not in NON_FILTER_PARAMS}
+        selected = [r for r in records if all(matches(r, k, v) for k, v in filters.items())]
+        fields = [f for f in params.get("include_fields", "").split(",") if f]
+        if fields:
+            selected = [project(record, fields) for record in selected]
+        if SINGLE_RECORD_PARAMS.get(name, set()) & filters.keys() and len(selected) == 1:
+            return 200, selected[0]
+        offset = int(params.get("offset", 0))
+        limit = min(int(params.get("limit", self.max_page_size)), self.max_page_size)
+        next_url = None
+        if offset + limit < len(selected):
+            next_url = f"{base_url}{path}?{urlencode({**params, 'offset': offset + limit})}"
+        return 200, {
+            "count": len(selected),
+            "next": next_url,
+            "previous": None,
+            "results": selected[offset : offset + limit],
+        }
+
+
+def make_handler(services):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, status, body):
+            data = json.dumps(body).replace(SEED_BASE_URL, self.base_url()).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def base_url(self):
+            return f"http://{self.headers.get('Host')}"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/__stats":
+                self.send_json(200, dict(services.stats))
+                return
+            with services._lock:
+                services.stats[url.path] += 1
+            services.delay()
+            status, body = services.respond(url.path, dict(parse_qsl(url.query)), self.base_url())
+            self.send_json(status, body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path == "/__reset":
+                with services._lock:
+                    services.stats.clear()
+                self.send_json(200, {})
+                return
+            with services._lock:
+                services.stats[urlparse(self.path).path] += 1
+            if self.path.startswith("/auth/token"):
+                # osidb credentials auth
+                self.send_json(200, {"access": "mock-access", "refresh": "mock-refresh"})
+                return
+            self.send_json(404, {"detail": "Not found."})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(services, port=0):
+    """serve in a background thread, returns the server (server.server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(services))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(upstream, output, port):
+    """proxy to upstream, keeping anonymised records of list and detail responses"""
+    collections = {}
+    upstream = upstream.rstrip("/")
+
+    class Recorder(BaseHTTPRequestHandler):
+        def do_GET(self):
+            try:
+                with urlopen(f"{upstream}{self.path}") as response:
+                    data = response.read()
+            except HTTPError as exc:
+                self.send_response(exc.code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.loads(data)
+            url = urlparse(self.path)
+            path = url.path.rstrip("/")
+            records = body.get("results", [body]) if isinstance(body, dict) else []
+            # detail requests (/<collection>/<uuid>) are stored with their collection
+            name = path if "results" in body or url.query else path.rsplit("/", 1)[0]
+            stored = collections.setdefault(name, {})
+            for item in records:
+                key = item.get("uuid") or item.get("link") or json.dumps(item, sort_keys=True)
+                stored[key] = anonymise(item)
+            # next page links lead back through the proxy
+            data = data.replace(upstream.encode(), f"http://{self.headers.get('Host')}".encode())
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Recorder)
+    print(f"recording {upstream} on http://127.0.0.1:{port}, Ctrl-C to write {output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    with open(output, "w") as f:
+        json.dump({name: list(records.values()) for name, records in collections.items()}, f)
+
+
+def load_collections(recordings=None, components=DEFAULT_SEED_COMPONENTS, flaws=DEFAULT_SEED_FLAWS):
+    if recordings:
+        with open(recordings) as f:
+            return json.load(f)
+    return seed_data(components, flaws)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--recordings", help="recorded collections (default built-in data)")
+    parser.add_argument("--components", type=int, default=DEFAULT_SEED_COMPONENTS)
+    parser.add_argument("--flaws", type=int, default=DEFAULT_SEED_FLAWS)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--record", metavar="UPSTREAM_URL", help="record a live service")
+    parser.add_argument("--output", default="recordings.json", help="recordings file written")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.output, args.port)
+        return
+    services = MockServices(
+        load_collections(args.recordings, args.components, args.flaws),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        max_page_size=args.max_page_size,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(services))
+    print(f"serving on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
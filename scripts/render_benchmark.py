@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+    render benchmark, runs text output renderers over synthetic results
+
+    usage: scripts/render_benchmark.py [--sizes 10000 100000] [--renderers list tree]
+                                       [--max-ratio 20] [--rich] [--json render.json]
+
+    Every text_output_* renderer (and raw_json_transform) is run over synthetic payloads
+    (see scripts/synthetic_data.py) of each size, reporting time, throughput in results per
+    second and peak memory allocated while rendering (traced in a separate run). Sizes of
+    1000000 are supported, --depth sets the length of sources/upstreams lists.
+
+    rich console rendering is left out by default, it is linear in printed lines and would
+    otherwise hide the cost of building the output
+
+"""
+import argparse
+import configparser
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# griffon refuses to start without service urls, rendering never contacts them
+os.environ.setdefault("CORGI_API_URL", "http://localhost")
+os.environ.setdefault("OSIDB_API_URL", "http://localhost")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import click  # noqa: E402
+import synthetic_data  # noqa: E402
+
+from griffon import output  # noqa: E402
+
+DEFAULT_GRIFFONRC = os.path.join(os.path.dirname(output.__file__), "static", "default_griffonrc")
+
+
+def profile_excludes(profile="latest"):
+    """exclusion matchers of a profile from the packaged default griffonrc"""
+    config = configparser.ConfigParser()
+    config.read(DEFAULT_GRIFFONRC)
+    return (
+        output.ExclusionMatcher(config[profile]["exclude"].split("\n"), full_match=True),
+        output.ExclusionMatcher(config["default"]["exclude_components"].split("\n")),
+    )
+
+
+def synthetic_results(size, depth=8, seed=0):
+    """products-contain-component style results of size components"""
+    results = synthetic_data.components(size, depth=depth, seed=seed)
+    return {"count": len(results), "results": results}
+
+
+class NullConsole:
+    """stands in for the rich console, discards printed lines without rendering them"""
+
+    def print(self, *objects, **kwargs):
+        pass
+
+
+class Dataset:
+    """synthetic payloads of a size, built on first use"""
+
+    def __init__(self, size, depth):
+        self.size = size
+        self.depth = depth
+        self._built = {}
+
+    def get(self, name, build):
+        if name not in self._built:
+            self._built[name] = build()
+        return self._built[name]
+
+    @property
+    def components(self):
+        return self.get("components", lambda: synthetic_results(self.size, self.depth))
+
+    @property
+    def flaws(self):
+        names = [synthetic_data.SEARCH] + [f"component-{n}" for n in range(self.size // 20 or 1)]
+        return self.get("flaws", lambda: synthetic_data.flaws(self.size // 5 or 1, names))
+
+    @property
+    def component_flaws(self):
+        return self.get(
+            "component_flaws",
+            lambda: {"results": synthetic_data.component_affects(self.flaws)},
+        )
+
+    @property
+    def streams(self):
+        return self.get(
+            "streams",
+            lambda: {"results": synthetic_data.product_streams(self.size)},
+        )
+
+    @property
+    def tree(self):
+        return self.get("tree", lambda: synthetic_data.component_tree(self.size))
+
+    @property
+    def affected_components(self):
+        def build():
+            streams = [ps["name"] for ps in synthetic_data.product_streams()]
+            return {
+                "title": "CVE-2023-10000 kernel: issue in parser",
+                "components": [
+                    {
+                        "purl": component["purl"],
+                        "product_versions": component["product_streams"][0]["product_versions"],
+                        "product_streams": ",".join(streams[n % 20 : n % 20 + 3]),
+                        "build_source_url": component["software_build"]["source"],
+                        "related_url": component["related_url"],
+                        "download_url": component["download_url"],
+                    }
+                    for n, component in enumerate(self.components["results"])
+                ],
+            }
+
+        return self.get("affected_components", build)
+
+    @property
+    def affected_products(self):
+        def build():
+            streams = [ps["name"] for ps in self.streams["results"]]
+            return {
+                "link": "https://example.com/osidb/api/v1/flaws/CVE-2023-10000",
+                "cve_id": "CVE-2023-10000",
+                "title": "CVE-2023-10000 kernel: issue in parser",
+                "product_versions": sorted({name.split(".z")[0] for name in streams}),
+                "product_streams": streams,
+            }
+
+        return self.get("affected_products", build)
+
+    @property
+    def manifest(self):
+        def build():
+            return {
+                "packages": [
+                    {
+                        "SPDXID": f"SPDXRef-{component['uuid']}",
+                        "name": component["name"],
+                        "externalRefs": [{"referenceLocator": component["purl"]}],
+                    }
+                    for component in self.components["results"]
+                ]
+            }
+
+        return self.get("manifest", build)
+
+    @property
+    def manifest_diff(self):
+        def build():
+            purls = [component["purl"] for component in self.components["results"]]
+            return {
+                "product_stream": "rhel-9.2.0.z",
+                "synced": "2023-06-14T00:00:00+00:00",
+                "previous_sync": "2023-06-13T00:00:00+00:00",
+                "added": purls[::2],
+                "removed": purls[1::2],
+            }
+
+        return self.get("manifest_diff", build)
+
+    @property
+    def license_report(self):
+        """report-license output, text output renders it key by key (text_output_generic)"""
+
+        def build():
+            return {
+                component["purl"]: {
+                    "license_declared": component["license_declared"],
+                    "related_url": component["related_url"],
+                    "build_id": component["software_build"]["build_id"],
+                }
+                for component in self.components["results"]
+            }
+
+        return self.get("license_report", build)
+
+    @property
+    def flaw_list(self):
+        return self.get("flaw_list", lambda: {"count": len(self.flaws), "results": self.flaws})
+
+    @property
+    def component_list(self):
+        return self.components["results"]
+
+    @property
+    def models(self):
+        return self.get("models", lambda: [ModelStub(c) for c in self.components["results"]])
+
+
+class ModelStub:
+    """bindings model, raw_json_transform converts it with to_dict"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def to_dict(self):
+        return dict(self.data)
+
+
+PCC_PARAMS = {
+    "component_name": synthetic_data.SEARCH,
+    "purl": None,
+    "affect_mode": False,
+    "flaw_mode": "dry_run",
+}
+
+
+def count_results(payload):
+    return len(payload["results"])
+
+
+def count_affects(payload):
+    return sum(len(item["affects"]) for item in payload["results"])
+
+
+def count_nodes(payload):
+    return sum(1 + count_nodes(node) for node in payload["deps"])
+
+
+# renderer: (command, ctx params, Dataset payload, call(ctx, payload, excludes), result count)
+RENDERER_CASES = {
+    "products-contain-component": (
+        "products-contain-component",
+        PCC_PARAMS,
+        "components",
+        lambda ctx, payload, excludes: output.text_output_products_contain_component(
+            ctx, payload, *excludes
+        ),
+        count_results,
+    ),
+    "products-contain-component-affects": (
+        "products-contain-component",
+        {**PCC_PARAMS, "affect_mode": True},
+        "components",
+        lambda ctx, payload, excludes: output.text_output_products_contain_component(
+            ctx, payload, *excludes
+        ),
+        count_results,
+    ),
+    "components-contain-component": (
+        "components-contain-component",
+        {},
+        "components",
+        lambda ctx, payload, excludes: output.text_output_components_contain_component(
+            ctx, payload, None, excludes[1]
+        ),
+        count_results,
+    ),
+    "product-summary": (
+        "product-summary",
+        {},
+        "streams",
+        lambda ctx, payload, excludes: output.text_output_product_summary(
+            ctx, payload, None, excludes[0]
+        ),
+        count_results,
+    ),
+    "components-affected-by-flaw": (
+        "components-affected-by-flaw",
+        {},
+        "affected_components",
+        lambda ctx, payload, excludes: output.text_output_components_affected_by_cve(
+            ctx, payload, None
+        ),
+        lambda payload: len(payload["components"]),
+    ),
+    "products-affected-by-flaw": (
+        "products-affected-by-flaw",
+        {},
+        "affected_products",
+        lambda ctx, payload, excludes: output.text_output_products_affected_by_cve(
+            ctx, payload, None, excludes[0]
+        ),
+        lambda payload: len(payload["product_streams"]),
+    ),
+    "get-manifest": (
+        "get-manifest",
+        {},
+        "manifest",
+        lambda ctx, payload, excludes: output.text_output_get_manifest(ctx, payload, None),
+        lambda payload: len(payload["packages"]),
+    ),
+    "manifest-diff": (
+        "manifest-diff",
+        {},
+        "manifest_diff",
+        lambda ctx, payload, excludes: output.text_output_manifest_diff(ctx, payload, None),
+        lambda payload: len(payload["added"]) + len(payload["removed"]),
+    ),
+    "component-flaws": (
+        "component-flaws",
+        {},
+        "component_flaws",
+        lambda ctx, payload, excludes: output.text_output_component_flaws(ctx, payload, None),
+        count_affects,
+    ),
+    "product-flaws": (
+        "product-flaws",
+        {},
+        "component_flaws",
+        lambda ctx, payload, excludes: output.text_output_product_flaws(ctx, payload, None),
+        count_affects,
+    ),
+    "list": (
+        "list",
+        {},
+        "components",
+        lambda ctx, payload, excludes: output.text_output_list(ctx, payload, None, excludes[1]),
+        count_results,
+    ),
+    "list-flaws": (
+        "list",
+        {},
+        "flaw_list",
+        lambda ctx, payload, excludes: output.text_output_list(ctx, payload, None, excludes[1]),
+        count_results,
+    ),
+    "purls": (
+        "provides",
+        {},
+        "components",
+        lambda ctx, payload, excludes: output.text_output_purls(ctx, payload, None),
+        count_results,
+    ),
+    "tree": (
+        "tree",
+        {"show_purl": False},
+        "tree",
+        lambda ctx, payload, excludes: output.text_output_tree(ctx, payload),
+        count_nodes,
+    ),
+    "generic": (
+        "generic",
+        {},
+        "license_report",
+        lambda ctx, payload, excludes: output.text_output_generic(ctx, payload, None),
+        len,
+    ),
+    "raw_json_transform": (
+        None,
+        {},
+        "component_list",
+        lambda ctx, payload, excludes: output.raw_json_transform(payload, True),
+        len,
+    ),
+    "raw_json_transform-models": (
+        None,
+        {},
+        "models",
+        lambda ctx, payload, excludes: output.raw_json_transform(payload, True),
+        len,
+    ),
+}
+RENDERERS = list(RENDERER_CASES)
+
+
+def render(case, payload, excludes, verbose, rich=False, trace=False):
+    """run renderer with output discarded, return (elapsed seconds, peak traced bytes)"""
+    command, params, _, call, _ = case
+    ctx = click.Context(
+        click.Command(command or "raw"),
+        obj={"VERBOSE": verbose, "SHOW_PURL": False, "SHORT_VERSION_VALUES": True},
+    )
+    ctx.params = dict(params)
+    console = output.console
+    if rich:
+        console.file = io.StringIO()
+    else:
+        output.console = NullConsole()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        call(ctx, payload, excludes)
+    except click.exceptions.Exit:
+        pass
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        output.console = console
+        console.file = sys.stdout
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--renderers", nargs="+", choices=RENDERERS, default=RENDERERS)
+    parser.add_argument("--verbose", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--depth", type=int, default=8, help="sources/upstreams per component")
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        help="fail if render time grows more than this factor between smallest and largest size",
+    )
+    parser.add_argument(
+        "--rich", action="store_true", help="include rich console rendering (slow, linear)"
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced memory run")
+    parser.add_argument("--json", dest="json_file", help="write results to this file")
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    excludes = profile_excludes()
+    results = {}
+    print(f"{'renderer':<42} {'size':>8} {'ms':>9} {'results/s':>11} {'peak MB':>8}")
+    for size in sizes:
+        data = Dataset(size, args.depth)
+        results[size] = {}
+        for name in args.renderers:
+            case = RENDERER_CASES[name]
+            payload = getattr(data, case[2])
+            count = case[4](payload)
+            for verbose in args.verbose if case[0] else [0]:
+                label = f"{name} -{'v' * verbose}" if verbose else name
+                seconds, _ = render(case, payload, excludes, verbose, rich=args.rich)
+                peak = 0
+                if not args.no_memory:
+                    peak = render(case, payload, excludes, verbose, trace=True)[1]
+                results[size][label] = {
+                    "ms": round(seconds * 1000, 1),
+                    "results_per_s": round(count / max(seconds, 1e-9)),
+                    "peak_mb": round(peak / 1e6, 1),
+                }
+                print(
+                    f"{label:<42} {size:>8} {seconds * 1000:>9.1f} "
+                    f"{count / max(seconds, 1e-9):>11.0f} {peak / 1e6:>8.1f}"
+                )
+    if args.json_file:
+        with open(args.json_file, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_ratio is not None and len(sizes) > 1:
+        failed = False
+        for label, result in results[sizes[0]].items():
+            ratio = results[sizes[-1]][label]["ms"] / max(result["ms"], 1e-3)
+            if ratio > args.max_ratio:
+                print(f"{label} render time grew {ratio:.1f}x from {sizes[0]} to {sizes[-1]}")
+                failed = True
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
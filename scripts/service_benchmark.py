@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+    service benchmark, runs griffon commands against a local Component Registry/OSIDB stand-in
+
+    usage: scripts/service_benchmark.py [--runs 3] [--latency-ms 20] [--recordings recordings.json]
+                                        [--json service.json] [--baseline service.json]
+
+    Every scenario runs as a fresh griffon process (without daemon or response cache) against
+    scripts/mock_services.py, recording median wall time, requests served by the stand-in and
+    peak memory. Compared to a --baseline, more requests or peak memory above --max-memory-ratio
+    fail the run, wall time only with --max-slowdown as it depends on the machine.
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_services import MockServices, load_collections, start_server  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMAND = "import sys; sys.argv[0] = 'griffon'; from griffon.cli import cli; cli()"
+
+SCENARIOS = {
+    "products-contain-component": ["service", "products-contain-component", "curl"],
+    "components-list": [
+        "entities",
+        "component-registry",
+        "components",
+        "list",
+        "--re-name",
+        "^component-1",
+    ],
+    "component-flaws": ["service", "component-flaws", "kernel"],
+    "report-license": ["service", "report-license", "rhel-9.2.0.z"],
+    "report-entities": ["service", "report-entities"],
+    "report-affects": ["service", "report-affects", "--all"],
+}
+
+
+def scenario_env(port, home):
+    """environment pointing griffon at the stand-in, the services get distinct hosts"""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.startswith(("CORGI_", "OSIDB_", "GRIFFON_"))
+    }
+    env.update(
+        HOME=home,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        CORGI_API_URL=f"http://127.0.0.1:{port}",
+        OSIDB_API_URL=f"http://localhost:{port}",
+        OSIDB_AUTH_METHOD="credentials",
+        OSIDB_USERNAME="benchmark",
+        OSIDB_PASSWORD="benchmark",
+        GRIFFON_NO_DAEMON="1",
+    )
+    return env
+
+
+def stand_in(port, path, method="GET"):
+    request = Request(
+        f"http://127.0.0.1:{port}{path}", method=method, data=b"" if method == "POST" else None
+    )
+    with urlopen(request) as response:
+        return json.load(response)
+
+
+def run_once(args, env, port):
+    """(wall seconds, requests served, peak rss MB) of a griffon process"""
+    stand_in(port, "/__reset", method="POST")
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-c", COMMAND, "--no-cache", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+            env=env,
+        )
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            stderr.seek(0)
+            sys.exit(f"griffon {' '.join(args)} failed:\n{stderr.read().decode()[-2000:]}")
+    requests = sum(stand_in(port, "/__stats").values())
+    # ru_maxrss is in KB on linux
+    return wall, requests, rusage.ru_maxrss / 1024
+
+
+def compare(results, baseline, max_memory_ratio, max_slowdown):
+    """regressions of results against baseline"""
+    failures = []
+    for name, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if result["requests"] > previous["requests"]:
+            failures.append(f"{name}: {result['requests']} requests, was {previous['requests']}")
+        if result["peak_rss_mb"] > previous["peak_rss_mb"] * max_memory_ratio:
+            failures.append(
+                f"{name}: peak memory {result['peak_rss_mb']} MB, was {previous['peak_rss_mb']} MB"
+            )
+        if max_slowdown and result["wall_s"] > previous["wall_s"] * max_slowdown:
+            failures.append(f"{name}: {result['wall_s']} s, was {previous['wall_s']} s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3, help="number of measured runs")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--recordings", help="recorded collections (default built-in data)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="latency of the stand-in")
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--max-page-size", type=int, default=100)
+    parser.add_argument("--json", dest="json_file", help="write results to this file")
+    parser.add_argument("--baseline", help="fail on regressions against these results")
+    parser.add_argument("--max-memory-ratio", type=float, default=1.5)
+    parser.add_argument("--max-slowdown", type=float, help="fail if wall time grows by this ratio")
+    args = parser.parse_args()
+
+    services = MockServices(
+        load_collections(args.recordings),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        max_page_size=args.max_page_size,
+    )
+    server = start_server(services)
+    port = server.server_port
+    results = {
+        "runs": args.runs,
+        "latency_ms": args.latency_ms,
+        "max_page_size": args.max_page_size,
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as home:
+        env = scenario_env(port, home)
+        print(f"{'scenario':<28} {'wall s':>8} {'requests':>9} {'peak MB':>8}")
+        for name in args.scenarios:
+            # warm up bytecode caches
+            run_once(SCENARIOS[name], env, port)
+            runs = [run_once(SCENARIOS[name], env, port) for _ in range(args.runs)]
+            result = {
+                "wall_s": round(statistics.median(run[0] for run in runs), 3),
+                "requests": max(run[1] for run in runs),
+                "peak_rss_mb": round(max(run[2] for run in runs), 1),
+            }
+            results["scenarios"][name] = result
+            print(
+                f"{name:<28} {result['wall_s']:>8.3f} {result['requests']:>9} "
+                f"{result['peak_rss_mb']:>8.1f}"
+            )
+    server.shutdown()
+
+    if args.json_file:
+        with open(args.json_file, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.max_memory_ratio, args.max_slowdown)
+        for failure in failures:
+            print(failure)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+    startup benchmark, tracks import time of `griffon --version`
+
+    fails when packages which are only needed by commands (eg. rich) are imported
+
+    usage: scripts/startup_benchmark.py [--runs 5] [--max-ms 150] [--json startup.json]
+
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+COMMAND = "import sys; sys.argv = ['griffon', '--version']; from griffon.cli import cli; cli()"
+
+# packages only needed once a command runs, --version must not import them
+LAZY_PACKAGES = ("rich",)
+
+# griffon refuses to start without service urls, --version never contacts them
+ENV = {"CORGI_API_URL": "http://localhost", "OSIDB_API_URL": "http://localhost", **os.environ}
+
+
+def parse_importtime(output):
+    """parse `python -X importtime` stderr into {module: (self us, cumulative us)}"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        modules[module.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once():
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", COMMAND],
+        capture_output=True,
+        text=True,
+        env=ENV,
+    )
+    if process.returncode != 0:
+        sys.exit(f"griffon --version failed:\n{process.stderr[-2000:]}")
+    return time.perf_counter() - start, parse_importtime(process.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="number of measured runs")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules shown")
+    parser.add_argument("--max-ms", type=float, help="fail if median import time exceeds this")
+    parser.add_argument("--json", dest="json_file", help="write results to this file")
+    args = parser.parse_args()
+
+    # warm up filesystem and bytecode caches
+    run_once()
+    wall_times, import_times, modules = [], [], {}
+    for _ in range(args.runs):
+        wall_time, modules = run_once()
+        wall_times.append(wall_time * 1000)
+        import_times.append(modules.get("griffon.cli", (0, 0))[1] / 1000)
+
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    results = {
+        "command": "griffon --version",
+        "runs": args.runs,
+        "wall_ms": round(statistics.median(wall_times), 1),
+        "import_ms": round(statistics.median(import_times), 1),
+        "modules": len(modules),
+        "slowest": {module: round(times[0] / 1000, 1) for module, times in slowest},
+    }
+
+    print(f"griffon --version: {results['wall_ms']} ms wall, {results['import_ms']} ms imports")
+    print(f"{results['modules']} modules imported, slowest (self ms):")
+    for module, self_ms in results["slowest"].items():
+        print(f"  {self_ms:8.1f}  {module}")
+    if args.json_file:
+        with open(args.json_file, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    eager = sorted({module.split(".")[0] for module in modules} & set(LAZY_PACKAGES))
+    if eager:
+        print(f"griffon --version imports {', '.join(eager)}")
+        failed = True
+    if args.max_ms is not None and results["import_ms"] > args.max_ms:
+        print(f"import time {results['import_ms']} ms exceeds {args.max_ms} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
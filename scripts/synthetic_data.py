@@ -0,0 +1,195 @@
+"""
+    synthetic service payloads for benchmarks
+
+    Components, product streams, flaws and affects shaped like Component Registry and OSIDB
+    results, at any scale. Components belong to many streams and carry deep sources and
+    upstreams lists, nested entries are drawn from shared pools (as the services repeat the
+    same sources across components) so a million components still fit in memory.
+
+"""
+import random
+
+SEARCH = "kernel"
+COMPONENT_TYPES = ("RPM", "RPM", "RPM", "OCI", "NPM", "GOLANG", "PYPI", "MAVEN")
+IMPACTS = ("LOW", "MODERATE", "IMPORTANT", "CRITICAL")
+AFFECTEDNESS = ("AFFECTED", "NOTAFFECTED", "NEW")
+RESOLUTIONS = ("FIX", "DEFER", "WONTFIX", "OOSS", "")
+FLAW_STATES = ("NEW", "TRIAGE", "PRE_SECONDARY_ASSESSMENT", "DONE")
+
+
+def product_streams(count=200):
+    """product streams spread over rhel-6 to rhel-9 product versions"""
+    product_versions = [f"rhel-{major}.{minor}" for major in range(6, 10) for minor in range(10)]
+    return [
+        {
+            "name": f"{pv}.z-{n}",
+            "ofuri": f"o:redhat:rhel:{pv[5:]}.z:{n}",
+            "product": "rhel",
+            "product_version": pv,
+            "product_versions": [{"name": pv}],
+            "brew_tags": [f"{pv}-z-{n}-candidate"],
+            "manifest_link": f"https://example.com/api/v1/product_streams/{pv}-{n}/manifest",
+            "link": f"https://example.com/api/v1/product_streams/{pv}-{n}",
+        }
+        for n in range(count // len(product_versions) or 1)
+        for pv in product_versions
+    ]
+
+
+def purl(component_type, name, version, arch):
+    namespace = "" if component_type in ("NPM", "PYPI") else "redhat/"
+    return f"pkg:{component_type.lower()}/{namespace}{name}@{version}?arch={arch}"
+
+
+def components(size, streams=None, depth=8, max_streams=6, seed=0):
+    """
+    size components, each with depth sources and upstreams and up to max_streams streams
+
+    a share of the components are named after (or derived from) SEARCH, as in
+    products-contain-component results
+    """
+    rng = random.Random(seed)
+    streams = streams or product_streams()
+    names = [SEARCH, f"{SEARCH}-container"] + [f"{SEARCH}-{n}" for n in range(size // 20 or 1)]
+    pool_size = max(size // 10, depth * 4)
+    sources = []
+    for n in range(pool_size):
+        component_type = rng.choice(COMPONENT_TYPES)
+        name = f"source-{n}"
+        version = f"{rng.randint(1, 9)}.{rng.randint(0, 99)}"
+        sources.append(
+            {
+                "name": name,
+                "nvr": f"{name}-{version}-{n}",
+                "purl": purl(component_type, name, version, rng.choice(("src", "noarch"))),
+                "type": component_type,
+                "link": f"https://example.com/api/v1/components?purl={name}",
+            }
+        )
+    upstreams = [
+        {
+            "name": f"upstream-{n}",
+            "nvr": f"upstream-{n}-1.{n}",
+            "purl": f"pkg:generic/upstream-{n}@1.{n}",
+            "link": f"https://example.com/api/v1/components?purl=upstream-{n}",
+        }
+        for n in range(pool_size)
+    ]
+    results = []
+    for n in range(size):
+        name = rng.choice(names)
+        component_type = rng.choice(COMPONENT_TYPES)
+        version = f"{rng.randint(1, 9)}.{rng.randint(0, 99)}"
+        nvr = f"{name}-{version}-{n}"
+        arch = rng.choice(("src", "noarch", "x86_64", "aarch64"))
+        results.append(
+            {
+                "uuid": f"c-{n}",
+                "link": f"https://example.com/api/v1/components/c-{n}",
+                "name": name,
+                "nvr": nvr,
+                "namespace": "REDHAT",
+                "type": component_type,
+                "arch": arch,
+                "version": version,
+                "release": str(n),
+                "purl": purl(component_type, name, f"{version}-{n}", arch),
+                "related_url": f"https://example.com/{name}",
+                "download_url": f"https://example.com/{name}/{nvr}.tar.gz",
+                "license_declared": rng.choice(("MIT", "GPLv2", "ASL 2.0", "BSD")),
+                "product_streams": rng.sample(streams, rng.randint(1, max_streams)),
+                "software_build": {"build_id": str(n), "source": f"git://example.com/{name}#{n}"},
+                "sources": rng.sample(sources, depth),
+                "upstreams": rng.sample(upstreams, depth),
+            }
+        )
+    return results
+
+
+def flaws(size, component_names=None, affects_per_flaw=5, seed=0):
+    """size osidb flaws, each affecting affects_per_flaw components"""
+    rng = random.Random(seed)
+    component_names = component_names or [f"component-{n}" for n in range(max(size // 4, 10))]
+    results = []
+    for n in range(size):
+        cve_id = f"CVE-2023-{10000 + n}"
+        impact = rng.choice(IMPACTS)
+        affects = [
+            {
+                "uuid": f"a-{n}-{m}",
+                "flaw": f"f-{n}",
+                "flaw_cve_id": cve_id,
+                "ps_module": f"rhel-{rng.randint(6, 9)}",
+                "ps_component": rng.choice(component_names),
+                "affectedness": rng.choice(AFFECTEDNESS),
+                "resolution": rng.choice(RESOLUTIONS),
+                "impact": rng.choice(IMPACTS),
+                "trackers": [],
+            }
+            for m in range(affects_per_flaw)
+        ]
+        results.append(
+            {
+                "uuid": f"f-{n}",
+                "cve_id": cve_id,
+                "title": f"{cve_id} {affects[0]['ps_component']}: issue in parser",
+                "impact": impact,
+                "state": rng.choice(FLAW_STATES),
+                "resolution": rng.choice(RESOLUTIONS),
+                "affects": affects,
+            }
+        )
+    return results
+
+
+def affects(flaws):
+    """affects of flaws, as osidb affects list results"""
+    return [affect for flaw in flaws for affect in flaw["affects"]]
+
+
+def component_affects(flaws):
+    """component-flaws/product-flaws style results, affects of flaws grouped by component"""
+    grouped = {}
+    for flaw in flaws:
+        for affect in flaw["affects"]:
+            grouped.setdefault(affect["ps_component"], []).append(
+                {
+                    "flaw_cve_id": flaw["cve_id"],
+                    "title": flaw["title"],
+                    "flaw_state": flaw["state"],
+                    "flaw_resolution": flaw["resolution"],
+                    "affect_component_name": affect["ps_component"],
+                    "affect_product_version": affect["ps_module"],
+                    "affect_affectedness": affect["affectedness"],
+                    "affect_impact": affect["impact"],
+                    "affect_resolution": affect["resolution"],
+                }
+            )
+    return [{"name": name, "affects": items} for name, items in grouped.items()]
+
+
+def component_tree(size, fanout=8, seed=0):
+    """dependency tree of about size nodes, as component provides tree results"""
+    rng = random.Random(seed)
+    count = 0
+
+    def node(depth):
+        nonlocal count
+        count += 1
+        name = f"node-{count}"
+        children = []
+        width = rng.randint(0, fanout) if depth < 12 else 0
+        while count < size and len(children) < width:
+            children.append(node(depth + 1))
+        return {
+            "node_type": "PROVIDES",
+            "nvr": f"{name}-1.0-1",
+            "type": rng.choice(COMPONENT_TYPES),
+            "purl": purl("RPM", name, "1.0-1", "x86_64"),
+            "deps": children,
+        }
+
+    roots = []
+    while count < size:
+        roots.append(node(0))
+    return {"link": "https://example.com/api/v1/components/root", "deps": roots}
@@ -41,7 +41,8 @@ setup(
         "component-registry-bindings",
         "packageurl-python",
     ],
-    entry_points={"console_scripts": ["griffon=griffon.cli:cli"]},
+    extras_require={"arrow": ["pyarrow"]},
+    entry_points={"console_scripts": ["griffon=griffon.daemon:main"]},
     author="James Fuller, Red Hat Product Security",
     license="MIT",
     classifiers=[
@@ -1,8 +1,45 @@
+import asyncio
+import base64
+import concurrent.futures
+import http.server
+import io
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
 import click
 import pytest
+import requests
+from click.testing import CliRunner
 
+from griffon import HostLimiter, OSIDBAccessToken
+from griffon.autocomplete import index
+from griffon.cache import CachedCall, CacheSettings, ResponseCache
+from griffon.cli import LazyGroup
+from griffon.commands.entities.helpers import OptionSpecCache
 from griffon.commands.queries import product_versions_affected_by_cve_query
-from griffon.output import OUTPUT_FORMAT, cprint
+from griffon.daemon import DaemonServer, forward, send_frame
+from griffon.distinct import HashedSet, HyperLogLog
+from griffon.manifests import ManifestMirror
+from griffon.output import (
+    OUTPUT_FORMAT,
+    ExclusionMatcher,
+    cprint,
+    group_rows,
+    jsonl_output,
+)
+from griffon.services import core_queries, core_reports, project_fields
+from griffon.services.batch import input_kind, read_inputs
+from griffon.services.engine import QueryEngine, query_engine
+from griffon.services.pagination import FetchLedger, PageError, Paginator, RequestPlan
+from griffon.spdx import ManifestFilter, iter_arrays
+from griffon.table import Table
+from griffon.timings import Timings
 
 pytestmark = pytest.mark.unit
 
@@ -40,3 +77,1142 @@ def test_output_formats():
     assert capture_err
     assert capture_err.type == SystemExit
     assert capture_err.value.code == 0
+
+
+def test_response_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_size=1000)
+    cache.set_json("components", {"name": "curl", "limit": None}, "components", {"count": 1})
+    assert cache.get_json("components", {"name": "curl"}, "components") == {"count": 1}
+    assert cache.get_json("components", {"name": "wget"}, "components") is None
+
+    for i in range(100):
+        cache.set_json("components", {"offset": i}, "components", {"results": [i] * 50})
+    assert cache._size <= 1000
+    assert cache.get_json("components", {"offset": 99}, "components") is not None
+    assert cache.get_json("components", {"offset": 0}, "components") is None
+
+
+def test_response_cache_permissions(tmp_path):
+    path = tmp_path / "griffon" / "cache.db"
+    cache = ResponseCache(str(path))
+    cache.set_json("flaws", {"cve_id": "CVE-2023-0001"}, "flaws", {"embargoed": True})
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+    for db_file in path.parent.iterdir():
+        assert db_file.stat().st_mode & 0o777 == 0o600, db_file
+
+    # caches created by earlier versions are restricted as well
+    path.chmod(0o644)
+    ResponseCache(str(path)).connection()
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+class CachedModel:
+    def __init__(self, name):
+        self.name = name
+
+    def to_dict(self):
+        return {"name": self.name}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"])
+
+
+def test_cached_call_stale_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(CacheSettings, "cache", cache)
+    monkeypatch.setattr(CacheSettings, "enabled", True)
+    monkeypatch.setattr(CacheSettings, "refresh", False)
+    fetched = []
+
+    def retrieve(name):
+        fetched.append(name)
+        return CachedModel(name)
+
+    call = CachedCall(retrieve, "models", "components")
+    assert call(name="curl").name == "curl"
+    assert call(name="curl").name == "curl"
+    assert fetched == ["curl"]
+
+    # entries of other bindings versions (or undecodable ones) are refetched, not raised
+    entry = cache.get_json("models", {"args": [], "name": "curl"}, "components")
+    for stale in (entry["model"].replace("@", "@0.0.1-"), f"{__name__}:Missing@unknown"):
+        cache.set_json(
+            "models", {"args": [], "name": "curl"}, "components", {**entry, "model": stale}
+        )
+        assert call(name="curl").name == "curl"
+    assert fetched == ["curl", "curl", "curl"]
+    assert call(name="curl").name == "curl"
+    assert len(fetched) == 3
+
+
+def test_option_spec_cache(tmp_path, monkeypatch):
+    versions = {"griffon": "1", "osidb-bindings": "3.1.0"}
+    monkeypatch.setattr("griffon.commands.entities.helpers.bindings_versions", lambda: versions)
+    path = tmp_path / "option_specs.json"
+    spec = {"option": "--name", "variable": "name", "type": str, "help": "Name", "multiple": False}
+    builds = []
+
+    def build():
+        builds.append(1)
+        return [dict(spec)]
+
+    cache = OptionSpecCache(str(path))
+    assert cache.get("query:components", build) == [spec]
+    cache.save()
+    # served from the file, the type is rebuilt from its import path
+    assert OptionSpecCache(str(path)).get("query:components", build) == [spec]
+    assert len(builds) == 1
+
+    # another bindings version drops the whole cache
+    monkeypatch.setitem(versions, "osidb-bindings", "3.2.0")
+    assert OptionSpecCache(str(path)).get("query:components", build) == [spec]
+    assert len(builds) == 2
+
+    # corrupt cache files are rebuilt rather than failing the cli
+    for corrupt in ("{not json", "[]", '{"versions": null}'):
+        path.write_text(corrupt)
+        assert OptionSpecCache(str(path)).get("query:components", build) == [spec]
+    assert len(builds) == 5
+
+
+def test_osidb_access_token():
+    class Client:
+        def __init__(self, headers=None):
+            self.headers = headers or {}
+
+        def with_headers(self, headers):
+            return Client({**self.headers, **headers})
+
+    class Group:
+        resource_name = "flaws"
+
+        def client(self):
+            raise AssertionError("token requested per operation")
+
+    class Session:
+        def __init__(self):
+            self.__client = Client()
+            self.flaws = Group()
+            self.tokens = 0
+
+        def __get_access_token(self):
+            self.tokens += 1
+            return "token"
+
+    session = Session()
+    token = OSIDBAccessToken(session).install()
+    assert session.flaws.client().headers == {"Authorization": "Bearer token"}
+    assert session.flaws.client() is session.flaws.client()
+    assert session.tokens == 1
+    # refreshed by the first operation after expiry, no background refresh
+    token._refresh_at = time.monotonic() - 1
+    threads = [threading.Thread(target=session.flaws.client) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.tokens == 2
+    assert not any(isinstance(t, threading.Timer) for t in threading.enumerate())
+
+    # tokens carrying their expiry are refreshed REFRESH_MARGIN seconds before it
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": time.time() + 600}).encode())
+    assert 560 < OSIDBAccessToken.lifetime(f"header.{claims.decode()}.signature") <= 600
+    assert OSIDBAccessToken.lifetime("opaque") == OSIDBAccessToken.DEFAULT_LIFETIME
+    expiring = base64.urlsafe_b64encode(json.dumps({"exp": time.time() + 10}).encode())
+    session._Session__get_access_token = lambda: f"header.{expiring.decode()}.signature"
+    token._refresh_at = time.monotonic() - 1
+    first = session.flaws.client()
+    # within the refresh margin, every operation refreshes the token
+    assert session.flaws.client() is not first
+
+    # bindings without the private token handling keep their own per operation token
+    for other in (
+        SimpleNamespace(flaws=Group()),
+        SimpleNamespace(flaws=Group(), _Session__get_access_token=None, _Session__client=object()),
+    ):
+        client = other.flaws.client
+        assert not OSIDBAccessToken(other).supported()
+        OSIDBAccessToken(other).install()
+        assert other.flaws.client == client
+
+
+def test_group_rows():
+    rows = [
+        {"pv": "rhel-9", "ps": "rhel-9.2", "nvr": "curl-2"},
+        {"pv": "rhel-8", "ps": "rhel-8.8", "nvr": "curl-1"},
+        {"pv": "rhel-9", "ps": "rhel-9.0", "nvr": "curl-1"},
+        {"pv": "rhel-9", "ps": "rhel-9.2", "nvr": "curl-3"},
+        {"pv": "rhel-9", "ps": "rhel-9.2", "nvr": "curl-2", "latest": True},
+    ]
+    tree = group_rows(rows, ("pv", "ps", "nvr"))
+    assert list(tree) == ["rhel-8", "rhel-9"]
+    assert list(tree["rhel-9"]) == ["rhel-9.0", "rhel-9.2"]
+    # leaves keep arrival order, later duplicates replace earlier rows
+    assert list(tree["rhel-9"]["rhel-9.2"]) == ["curl-2", "curl-3"]
+    assert tree["rhel-9"]["rhel-9.2"]["curl-2"]["latest"]
+
+
+def test_exclusion_matcher():
+    products = ExclusionMatcher(["amq-.*", "openstack-16.1", "rhel-7", ""], full_match=True)
+    assert "amq-7" in products
+    assert "openstack-16.1" in products
+    assert "openstack-1631" not in products
+    assert "rhel-7" in products
+    assert "rhel-7.9" not in products
+
+    components = ExclusionMatcher(["-debuginfo", "-javadoc ", "-testlib.*"])
+    assert "kernel-debuginfo" in components
+    assert "log4j-javadoc" in components
+    assert "log4j-testlib-2" in components
+    assert "kernel" not in components
+    assert not ExclusionMatcher([])
+
+    # only .* and re: entries are patterns, other regex syntax is matched literally
+    components = ExclusionMatcher(["libstdc++", "re:^python3?-", "re:("])
+    assert "libstdc++-devel" in components
+    assert "libstdc-devel" not in components
+    assert "python3-requests" in components
+    assert "cpython3-devel" not in components
+    # invalid regexes are matched literally rather than failing output
+    assert "glibc(" in components
+    products = ExclusionMatcher(["re:(?P<a>a)", "re:(?P<a>b)"], full_match=True)
+    assert "(?P<a>b)" in products
+
+
+def test_jsonl_output():
+    out = io.StringIO()
+    jsonl_output(iter([[{"name": "curl"}, {"name": "wget"}], [{"name": "zlib"}]]), file=out)
+    assert [json.loads(line)["name"] for line in out.getvalue().splitlines()] == [
+        "curl",
+        "wget",
+        "zlib",
+    ]
+
+    out = io.StringIO()
+    jsonl_output({"count": 1, "results": [{"name": "curl"}]}, file=out)
+    assert out.getvalue() == '{"name": "curl"}\n'
+
+
+def test_table():
+    pages = [
+        [{"name": "curl", "arch": "src", "affects": [{"cve": "CVE-1"}, {"cve": "CVE-2"}]}],
+        [{"name": "wget", "arch": "src", "count": 2, "affects": []}],
+    ]
+    table = Table.from_records(iter(pages))
+    assert len(table) == 2
+    assert table.names == ["name", "arch", "affects", "count"]
+    kinds = {column.name: column.kind for column in table.columns}
+    assert kinds["count"] == "int"
+    arch = table.columns[1]
+    assert arch.dictionary == ["src"] and list(arch.codes) == [0, 0]
+
+    out = io.StringIO()
+    table.write_csv(out, delimiter="\t")
+    assert out.getvalue().splitlines()[2] == "wget\tsrc\t[]\t2"
+
+    exploded = Table.from_records(iter(pages), explode="affects")
+    assert len(exploded) == 2
+    assert exploded.columns[-1].decoded() == ["CVE-1", "CVE-2"]
+
+
+def test_project_fields():
+    include_fields = "name,nvr,software_build,sources.name,sources.purl,upstreams.name"
+    assert project_fields(include_fields, None) == include_fields
+    assert project_fields(include_fields, ["name", "sources"]) == "name,sources.name,sources.purl"
+    assert project_fields(include_fields, ["software_build.source"], required=["nvr"]) == (
+        "nvr,software_build"
+    )
+
+
+def test_query_engine():
+    engine = QueryEngine(threads=8)
+    limiter = HostLimiter(limit=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def request(n):
+        with limiter.limit_for("https://corgi.example.com/api/v1/components"):
+            with lock:
+                running.append(n)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(n)
+        return n * 2
+
+    async def fan_out():
+        return [await engine.call(request, n) for n in range(2)] + sorted(
+            await asyncio.gather(*[engine.call(request, n) for n in range(6)])
+        )
+
+    assert engine.run(fan_out()) == [0, 2, 0, 2, 4, 6, 8, 10]
+    assert max(peak) == 2
+
+    async def stop():
+        exit(0)
+
+    with pytest.raises(SystemExit):
+        engine.run(stop())
+    # engine loop survives exit() of a query
+    assert engine.run(engine.call(request, 1)) == 2
+
+
+def test_query_engine_nested_exit():
+    engine = QueryEngine(threads=4)
+
+    def fail():
+        exit(3)
+
+    async def stop():
+        exit(4)
+
+    async def blocking_exit():
+        return await asyncio.gather(engine.call(fail), engine.call(time.sleep, 0.01))
+
+    async def task_exit():
+        return await asyncio.gather(stop(), engine.call(time.sleep, 0.01))
+
+    def run(query):
+        # a dead engine loop would leave run() waiting forever
+        outcome = []
+
+        def target():
+            try:
+                engine.run(query())
+            except SystemExit as exc:
+                outcome.append(exc.code)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(5)
+        return outcome
+
+    assert run(blocking_exit) == [3]
+    assert run(task_exit) == [4]
+    assert engine.run(engine.call(lambda: 1)) == 1
+
+
+def test_batch_inputs():
+    lines = ["curl\n", "\n", "# intake\n", "cve-2023-25166 # kernel\n", "curl\n", "pkg:rpm/curl\n"]
+    assert read_inputs(lines) == ["curl", "CVE-2023-25166", "pkg:rpm/curl"]
+    assert [input_kind(key) for key in read_inputs(lines)] == ["component_name", "cve_id", "purl"]
+    # only # at the start of a line or after whitespace starts a comment, not a purl subpath
+    lines = ["  # indented\n", "pkg:golang/example.com/mod@v1#sub/pkg\t# go module\n"]
+    assert read_inputs(lines) == ["pkg:golang/example.com/mod@v1#sub/pkg"]
+
+
+def test_daemon_forward(tmp_path, capsys, monkeypatch):
+    path = str(tmp_path / "griffon.sock")
+    assert forward(["--version"], path) is None
+    server = DaemonServer(path)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        assert forward(["--version"], path) == 0
+        assert "Version" in capsys.readouterr().out
+        assert forward(["no-such-command"], path) == 2
+        assert "No such command" in capsys.readouterr().err
+        # client only settings are not compared
+        monkeypatch.setenv("GRIFFON_SOCKET", path)
+        assert forward(["--version"], path) == 0
+        capsys.readouterr()
+        # the daemon would query the services it was started with, the client runs it
+        with monkeypatch.context() as env:
+            env.setenv("OSIDB_API_URL", "https://osidb.other.example")
+            assert forward(["--version"], path) is None
+        monkeypatch.setenv("GRIFFON_MAX_WORKERS", "2")
+        assert forward(["--version"], path) is None
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert forward(["--version"], path) is None
+
+
+def test_daemon_forward_stdin(tmp_path, monkeypatch):
+    path = str(tmp_path / "griffon.sock")
+    requests_seen = []
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            requests_seen.append(json.loads(self.rfile.readline()))
+            send_frame(self.connection, b"x", b"0")
+
+    def piped(data):
+        read_end, write_end = os.pipe()
+        os.write(write_end, data)
+        os.close(write_end)
+        return os.fdopen(read_end)
+
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            # commands reading stdin by default (eg. batch) run locally with piped input
+            monkeypatch.setattr("sys.stdin", piped(b"curl\n"))
+            assert forward(["service", "batch"], path) is None
+            assert sys.stdin.read() == "curl\n"
+            # commands given - explicitly, or without input, are forwarded with their stdin
+            monkeypatch.setattr("sys.stdin", piped(b"curl\n"))
+            assert forward(["service", "batch", "-"], path) == 0
+            monkeypatch.setattr("sys.stdin", open(os.devnull))
+            assert forward(["service", "batch"], path) == 0
+        finally:
+            sys.stdin.close()
+            server.shutdown()
+    assert [request["stdin"] for request in requests_seen] == ["curl\n", ""]
+
+
+def test_daemon_forward_query(tmp_path, capsys, monkeypatch):
+    """forwarded queries reach the services, here the offline stand-in of scripts/"""
+    import subprocess
+
+    from griffon.daemon import service_settings
+
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts"))
+    import mock_services
+    import service_benchmark
+
+    server = mock_services.start_server(
+        mock_services.MockServices(mock_services.load_collections())
+    )
+    env = service_benchmark.scenario_env(server.server_port, str(tmp_path))
+    # the client has the settings of the daemon, or the daemon would hand commands back
+    for name in service_settings(os.environ):
+        monkeypatch.delenv(name)
+    for name, value in service_settings(env).items():
+        monkeypatch.setenv(name, value)
+    path = str(tmp_path / "griffon.sock")
+    log = tmp_path / "serve.log"
+    daemon = subprocess.Popen(
+        [sys.executable, "-c", service_benchmark.COMMAND, "serve", "--socket", path],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=log.open("w"),
+    )
+    try:
+        for _ in range(300):
+            if os.path.exists(path) or daemon.poll() is not None:
+                break
+            time.sleep(0.1)
+        assert os.path.exists(path), log.read_text()
+
+        args = ["--no-cache", "--format", "json", "service", "products-contain-component"]
+        assert forward([*args, "curl"], path) == 0
+        output = json.loads(capsys.readouterr().out)
+        assert output["results"]
+        assert all("curl" in result["purl"] for result in output["results"])
+        assert sum(service_benchmark.stand_in(server.server_port, "/__stats").values())
+
+        # piped input of a command reading it explicitly
+        read_end, write_end = os.pipe()
+        os.write(write_end, b"curl\n")
+        os.close(write_end)
+        monkeypatch.setattr("sys.stdin", os.fdopen(read_end))
+        assert forward(["--no-cache", "--format", "json", "service", "batch", "-"], path) == 0
+        assert "curl" in capsys.readouterr().out
+    finally:
+        daemon.terminate()
+        daemon.wait(10)
+        server.shutdown()
+        server.server_close()
+
+
+def test_daemon_command_state():
+    import logging
+
+    from griffon import config_logging
+    from griffon.daemon import client_environment
+    from griffon.output import console
+
+    before = (console.no_color, console.highlighter, console._width)
+    stdout, stderr = io.TextIOWrapper(io.BytesIO()), io.TextIOWrapper(io.BytesIO())
+    with client_environment({}, stdout, stderr):
+        # eg. --no-color, --affect-mode and --width
+        console.no_color = True
+        console.highlighter = None
+        console.width = 20
+    assert (console.no_color, console.highlighter, console._width) == before
+
+    # every command sets its log level, not only the first one of the daemon
+    level = logging.getLogger().level
+    try:
+        config_logging("DEBUG")
+        config_logging("INFO")
+        assert logging.getLogger().level == logging.INFO
+        config_logging("DEBUG")
+        assert logging.getLogger().level == logging.DEBUG
+    finally:
+        logging.getLogger().setLevel(level)
+
+
+def test_daemon_completion(tmp_path, capsys, monkeypatch):
+    path = str(tmp_path / "griffon.sock")
+    server = DaemonServer(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        # serve is only the daemon command as first argument, not as a value
+        assert forward(["serve"], path) is None
+        assert forward(["no-such-command", "serve"], path) == 2
+        # serve after global options is handed back to run locally, not nested in the daemon
+        assert forward(["-d", "serve"], path) is None
+        assert forward(["--no-cache", "--format", "json", "serve"], path) is None
+        assert not server.command_lock.locked()
+        assert forward(["--version"], path) == 0
+        capsys.readouterr()
+        monkeypatch.setenv("_GRIFFON_COMPLETE", "bash_complete")
+        monkeypatch.setenv("COMP_WORDS", "griffon serv")
+        monkeypatch.setenv("COMP_CWORD", "1")
+        # completion does not wait for commands running on the daemon
+        with server.command_lock:
+            assert forward([], path) == 0
+        assert "plain,service" in capsys.readouterr().out.splitlines()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_manifest_mirror(tmp_path):
+    def manifest(*names):
+        refs = [{"externalRefs": [{"referenceLocator": f"pkg:rpm/{name}@1"}]} for name in names]
+        return json.dumps({"packages": refs}).encode()
+
+    served = {"body": manifest("curl", "bash"), "etag": '"1"'}
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == served["etag"]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", served["etag"])
+            self.send_header("Content-Length", str(len(served["body"])))
+            if served.get("encoding"):
+                self.send_header("Content-Encoding", served["encoding"])
+            self.end_headers()
+            self.wfile.write(served["body"])
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/manifest"
+    mirror = ManifestMirror(str(tmp_path))
+    try:
+        mirror.sync("rhel-9.2.0", url)
+        mirror.sync("rhel-9.2.0", url)
+        assert len(mirror.load("rhel-9.2.0")["packages"]) == 2
+        assert requests_seen == [None, '"1"']
+        assert mirror.diff("rhel-9.2.0")["previous_sync"] is None
+
+        served.update(body=manifest("curl", "zsh"), etag='"2"')
+        mirror.sync("rhel-9.2.0", url)
+        diff = mirror.diff("rhel-9.2.0")
+        assert diff["added"] == ["pkg:rpm/zsh@1"]
+        assert diff["removed"] == ["pkg:rpm/bash@1"]
+
+        # a download failing half way leaves no partial file behind
+        served.update(etag='"3"', encoding="gzip")
+        with pytest.raises(requests.RequestException):
+            mirror.sync("rhel-8.8.0", url)
+        mirror.sync("rhel-9.2.0", url)
+        assert mirror.diff("rhel-9.2.0")["added"] == ["pkg:rpm/zsh@1"]
+        assert not list(tmp_path.glob("*.tmp"))
+
+        # a manifest moved to another url is not compared, changes of the old url are dropped
+        served.update(etag='"4"', encoding=None)
+        mirror.sync("rhel-9.2.0", f"{url}?moved")
+        diff = mirror.diff("rhel-9.2.0")
+        assert (diff["added"], diff["removed"], diff["previous_sync"]) == ([], [], None)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_spdx_streaming(monkeypatch):
+    monkeypatch.setattr("griffon.spdx.CHUNK_SIZE", 7)
+    packages = [
+        {"SPDXID": "SPDXRef-root", "name": "ubi9", "externalRefs": []},
+        *[
+            {
+                "SPDXID": f"SPDXRef-{n}",
+                "name": f"curl-{n}",
+                "externalRefs": [{"referenceLocator": f"pkg:{'rpm' if n % 2 else 'npm'}/c-{n}@1"}],
+            }
+            for n in range(4)
+        ],
+    ]
+    manifest = {
+        "spdxVersion": "SPDX-2.3",
+        "creationInfo": {"comment": 'é ["{'},
+        "documentDescribes": ["SPDXRef-root"],
+        "packages": packages,
+        "relationships": [
+            {
+                "spdxElementId": f"SPDXRef-{n}",
+                "relationshipType": "CONTAINED_BY",
+                "relatedSpdxElement": "SPDXRef-0" if n > 1 else "SPDXRef-root",
+            }
+            for n in range(4)
+        ],
+    }
+    raw = json.dumps(manifest, indent=1, ensure_ascii=False).encode()
+
+    assert [entry for _, entry in iter_arrays(io.BytesIO(raw), ["packages"])] == packages
+
+    def select(**filters):
+        manifest_filter = ManifestFilter(**filters)
+        return [package["name"] for package in manifest_filter.packages(lambda: io.BytesIO(raw))]
+
+    assert select(purl_type="RPM") == ["curl-1", "curl-3"]
+    assert select(name=r"-[12]$") == ["curl-1", "curl-2"]
+    assert select(max_depth=1) == ["ubi9", "curl-0", "curl-1"]
+
+    # --spdx-json keeps a spdx document, relationships only between selected packages
+    document = ManifestFilter(purl_type="rpm").document(lambda: io.BytesIO(raw))
+    assert list(document) == list(manifest)
+    assert document["creationInfo"] == manifest["creationInfo"]
+    assert document["documentDescribes"] == []
+    assert [package["name"] for package in document["packages"]] == ["curl-1", "curl-3"]
+    assert document["relationships"] == []
+    document = ManifestFilter(max_depth=1).document(lambda: io.BytesIO(raw))
+    assert document["documentDescribes"] == ["SPDXRef-root"]
+    assert document["relationships"] == manifest["relationships"][:2]
+
+
+def test_timings():
+    timings = Timings()
+    timings.record("osidb", 0.0, 1.0)
+    assert timings.stages == {}
+
+    timings.enable()
+    timings.record("osidb", 0.0, 1.0, bytes=100)
+    timings.record("osidb", 0.5, 2.0, bytes=50, retries=1)
+    timings.record("osidb", 3.0, 3.5)
+    timings.count("osidb", "cache_hits")
+    with pytest.raises(SystemExit):
+        with timings.timed("render"):
+            exit(0)
+    report = timings.report()["stages"]
+    assert report["osidb"]["calls"] == 3
+    assert report["osidb"]["seconds"] == 3.0
+    # overlapping calls count once towards wall time
+    assert report["osidb"]["wall_seconds"] == 2.5
+    assert (report["osidb"]["bytes"], report["osidb"]["retries"]) == (150, 1)
+    assert report["osidb"]["cache_hits"] == 1
+    assert report["render"]["calls"] == 1
+
+
+def test_timings_requests_hook(monkeypatch):
+    import requests
+
+    import griffon
+    from griffon.timings import record_response, timings
+
+    call_timings = Timings()
+    monkeypatch.setattr("griffon.cache.timings", call_timings)
+    monkeypatch.setattr(timings, "enabled", False)
+    monkeypatch.setattr(griffon, "_http_session", None)
+    assert record_response not in griffon.get_http_session().hooks["response"]
+
+    timings.enable()
+    call_timings.enable()
+    assert record_response in griffon.get_http_session().hooks["response"]
+    # sessions griffon does not own (eg. of plugins) are left alone
+    assert record_response not in requests.Session().hooks["response"]
+    # bindings bypass the pooled session, their calls are timed instead
+    bindings_call = CachedCall(lambda: 1, f"{griffon.OSIDB_API_URL}/flaws", "flaws", bindings=True)
+    direct_call = CachedCall(lambda: 1, f"{griffon.OSIDB_API_URL}/affects", "affects")
+    assert bindings_call.request() == direct_call.request() == 1
+    assert call_timings.report()["stages"]["osidb"]["calls"] == 1
+
+
+def license_report_session(roots, children, lookups):
+    """fake corgi session, a purl filter is answered with a single record as by corgi"""
+
+    def retrieve_list(**params):
+        if "ofuri" in params:
+            return {"count": len(roots), "results": roots}
+        if "purl" in params:
+            return children[params["purl"]]
+        if "sources" in params:
+            found = [c for c in children.values() if params["sources"] in c.sources]
+            return {"count": len(found), "results": found}
+        lookups.append(params["re_purl"])
+        found = [c for purl, c in children.items() if re.fullmatch(lookups[-1], purl)]
+        return {"count": len(found), "results": found}
+
+    return SimpleNamespace(
+        components=SimpleNamespace(retrieve_list=retrieve_list),
+        product_streams=SimpleNamespace(retrieve_list=lambda **params: {"ofuri": "o:redhat:x"}),
+    )
+
+
+def license_component(purl, provides=(), sources=()):
+    return SimpleNamespace(
+        purl=purl,
+        type="RPM",
+        license_declared=f"license of {purl}",
+        license_concluded="",
+        related_url="",
+        download_url="",
+        software_build=SimpleNamespace(build_id="1"),
+        provides=[{"purl": child} for child in provides],
+        sources=list(sources),
+    )
+
+
+def test_license_report_children(monkeypatch):
+    component = license_component
+    roots = [
+        component(f"pkg:rpm/root-{n}", [f"pkg:rpm/lib-{n}", "pkg:rpm/shared"]) for n in range(3)
+    ]
+    children = {purl: component(purl) for purl in ["pkg:rpm/shared", "pkg:rpm/lib-1"]}
+    lookups = []
+    session = license_report_session(roots, children, lookups)
+    monkeypatch.setattr(core_reports.CorgiService, "create_session", lambda: session)
+    report = core_reports.license_report({"product_stream_name": "x"}).generate()
+
+    assert list(report) == ["pkg:rpm/root-0", "pkg:rpm/root-1", "pkg:rpm/root-2"]
+    assert [child["purl"] for child in report["pkg:rpm/root-1"]["children"]] == [
+        "pkg:rpm/lib-1",
+        "pkg:rpm/shared",
+    ]
+    # children not found are left out, shared children are looked up once, in a batch
+    assert [child["purl"] for child in report["pkg:rpm/root-0"]["children"]] == ["pkg:rpm/shared"]
+    assert len(lookups) == 1
+
+
+def test_license_report_single_child(monkeypatch):
+    roots = [license_component("pkg:rpm/root", ["pkg:rpm/lib", "pkg:rpm/broken"])]
+    roots.append(license_component("pkg:rpm/other"))
+    roots[1].provides = "https://corgi/api/v1/components/other/provides"
+    children = {
+        "pkg:rpm/lib": license_component("pkg:rpm/lib"),
+        "pkg:rpm/other-lib": license_component("pkg:rpm/other-lib", sources=["pkg:rpm/other"]),
+    }
+    lookups = []
+    session = license_report_session(roots, children, lookups)
+
+    def failing_lookup(**params):
+        if "broken" in params.get("re_purl", ""):
+            raise http_error(502, "bad gateway")
+        return retrieve_list(**params)
+
+    retrieve_list = session.components.retrieve_list
+    session.components.retrieve_list = failing_lookup
+    monkeypatch.setattr(core_reports, "CHILD_LOOKUP_BATCH", 1)
+    monkeypatch.setattr(core_reports.CorgiService, "create_session", lambda: session)
+    monkeypatch.setattr("griffon.services.pagination.RETRY_BACKOFF", 0)
+    report = core_reports.license_report({"product_stream_name": "x"}).generate()
+
+    # single children are looked up by re_purl too, a failed lookup is reported, not raised
+    lib, broken = report["pkg:rpm/root"]["children"]
+    assert lib == {
+        "purl": "pkg:rpm/lib",
+        "license_declared": "license of pkg:rpm/lib",
+        "related_url": "",
+    }
+    assert broken["purl"] == "pkg:rpm/broken"
+    assert broken["error"].endswith("retries: bad gateway")
+    assert lookups == ["^(pkg:rpm/lib)$"]
+    # provides which are not inline are looked up through sources
+    assert [child["purl"] for child in report["pkg:rpm/other"]["children"]] == ["pkg:rpm/other-lib"]
+
+
+def test_license_report_child_resolved_by_other_batch(monkeypatch):
+    roots = [license_component("pkg:rpm/root", ["pkg:rpm/lib", "pkg:rpm/LIB"])]
+    children = {purl: license_component(purl) for purl in ["pkg:rpm/lib", "pkg:rpm/LIB"]}
+    session = license_report_session(roots, children, [])
+    resolved = threading.Event()
+
+    def lookup(**params):
+        if "re_purl" not in params:
+            return retrieve_list(**params)
+        if "LIB" in params["re_purl"]:
+            # fails only once the other batch resolved pkg:rpm/LIB
+            resolved.wait(5)
+            raise ValueError("bad gateway")
+        # re_purl matches case insensitively, as by corgi
+        found = [c for purl, c in children.items() if re.fullmatch(params["re_purl"], purl, re.I)]
+        resolved.set()
+        return {"count": len(found), "results": found}
+
+    retrieve_list = session.components.retrieve_list
+    session.components.retrieve_list = lookup
+    monkeypatch.setattr(core_reports, "CHILD_LOOKUP_BATCH", 1)
+    monkeypatch.setattr(core_reports.CorgiService, "create_session", lambda: session)
+    monkeypatch.setattr("griffon.services.pagination.RETRY_BACKOFF", 0)
+    report = core_reports.license_report({"product_stream_name": "x"}).generate()
+
+    assert [child["purl"] for child in report["pkg:rpm/root"]["children"]] == [
+        "pkg:rpm/lib",
+        "pkg:rpm/LIB",
+    ]
+    assert "error" not in report["pkg:rpm/root"]["children"][1]
+
+
+def flaw_sessions(monkeypatch, ps_components, retrieve_components, affects_page=None):
+    """fake osidb session paging in affects and corgi session answering component lookups"""
+
+    def affects(offset, limit, **params):
+        if affects_page:
+            affects_page(offset)
+        rows = [SimpleNamespace(ps_component=name) for name in ps_components]
+        return {"count": len(rows), "results": rows[offset : offset + limit]}
+
+    corgi = SimpleNamespace(components=SimpleNamespace(retrieve_list=retrieve_components))
+    osidb = SimpleNamespace(affects=SimpleNamespace(retrieve_list=affects))
+    monkeypatch.setattr(core_queries.CorgiService, "create_session", lambda: corgi)
+    monkeypatch.setattr(core_queries.OSIDBService, "create_session", lambda: osidb)
+
+
+def test_latest_components_of_flaw(monkeypatch):
+    registry = [SimpleNamespace(name=name) for name in ["curl", "CURL", "openssl", "zlib"]]
+    lookups = []
+
+    def retrieve_components(offset, limit, **params):
+        assert params["latest_components_by_streams"]
+        lookups.append(params.get("re_name", params.get("name")))
+        if "broken" in lookups[-1]:
+            raise http_error(400, "bad request")
+        if "re_name" in params:
+            # re_name matches case insensitively, as by corgi
+            found = [c for c in registry if re.fullmatch(params["re_name"], c.name, re.I)]
+        else:
+            found = [c for c in registry if c.name == params["name"]]
+        return {"count": len(found), "results": found[offset : offset + limit]}
+
+    ps_components = ["curl", "openssl", "curl", "", "broken", "zlib"]
+    flaw_sessions(monkeypatch, ps_components, retrieve_components)
+    components, errors = query_engine.run(
+        core_queries.latest_components_of_flaw("CVE-2023-0001", "purl", batch_size=2)
+    )
+
+    # distinct names are looked up in batches, a failed batch name by name
+    assert lookups[:2] == ["^(curl|openssl)$", "^(broken|zlib)$"]
+    assert sorted(lookups[2:]) == ["broken", "zlib"]
+    # only exact matches of the case insensitive re_name are kept
+    assert sorted(c.name for c in components) == ["curl", "openssl", "zlib"]
+    assert errors == [
+        {"ps_component": "broken", "error": "page offset=0 limit=120 failed: bad request"}
+    ]
+
+
+def test_latest_components_of_flaw_failed_affects(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    tasks = []
+
+    def retrieve_components(offset, limit, **params):
+        started.set()
+        release.wait(5)
+        return {"count": 0, "results": []}
+
+    def affects_page(offset):
+        if offset:
+            # affects fail to page in while lookups of the first page are running
+            started.wait(5)
+            raise http_error(400, "bad request")
+
+    def ensure_future(coroutine):
+        tasks.append(asyncio_ensure_future(coroutine))
+        return tasks[-1]
+
+    asyncio_ensure_future = asyncio.ensure_future
+    monkeypatch.setattr(asyncio, "ensure_future", ensure_future)
+    monkeypatch.setattr(core_queries, "COMPONENT_LOOKUP_BATCH", 1)
+    ps_components = [f"component-{i}" for i in range(300)]
+    flaw_sessions(monkeypatch, ps_components, retrieve_components, affects_page)
+    try:
+        with pytest.raises(PageError, match="bad request"):
+            query_engine.run(core_queries.latest_components_of_flaw("CVE-2023-0001", "purl"))
+    finally:
+        release.set()
+    # lookups already started are cancelled, not left running
+    assert tasks
+    for _ in range(50):
+        if all(task.done() for task in tasks):
+            break
+        time.sleep(0.1)
+    assert all(task.cancelled() for task in tasks)
+
+
+def test_affects_report_single_pass(monkeypatch):
+    affects = [
+        {"impact": "CRITICAL", "ps_component": "curl", "ps_module": "rhel-9"},
+        {"impact": "CRITICAL", "ps_component": "curl", "ps_module": "rhel-8"},
+        {"impact": "LOW", "ps_component": "curl", "ps_module": "rhel-9"},
+    ]
+    requests = []
+
+    def affects_list(**params):
+        requests.append(params)
+        if params.get("affectedness") != "AFFECTED":
+            return {"count": 10, "results": []}
+        offset = int(params.get("offset", 0))
+        return {"count": len(affects), "results": affects[offset : offset + params["limit"]]}
+
+    monkeypatch.setattr(core_reports, "osidb_affects_list", affects_list)
+    report = core_reports.example_affects_report(
+        {"product_version_name": "rhel-9", "purl": "pkg:rpm/redhat/curl@7.0", "show_products": True}
+    ).generate()
+
+    assert report["total_affects"] == 10
+    assert report["total_affected"] == 3
+    assert report["critical"] == {
+        "affected": 2,
+        "top_component": "curl",
+        "top_product": "rhel-9",
+        "products": {"rhel-9": 1, "rhel-8": 1},
+    }
+    assert report["important"] == {
+        "affected": 0,
+        "top_component": None,
+        "top_product": None,
+        "products": {},
+    }
+    # filters are applied by osidb
+    assert all(
+        params["ps_module"] == "rhel-9" and params["ps_component"] == "curl" for params in requests
+    )
+
+
+def test_entity_report_component_filters(monkeypatch):
+    monkeypatch.setattr(core_reports.CorgiService, "create_session", lambda: None)
+    report = core_reports.entity_report({})
+    assert report.component_filters() == core_reports.ENTITY_COMPONENT_FILTERS
+    report = core_reports.entity_report({"component_types": ("RPM", "PYPI"), "arch": "x86_64"})
+    assert report.component_filters() == {
+        "rpm_components": {"type": "RPM", "arch": "x86_64", "namespace": "REDHAT"},
+        "pypi_components": {"type": "PYPI", "arch": "x86_64"},
+    }
+
+
+def test_distinct_counters():
+    names = [f"component-{n % 60000}" for n in range(100000)]
+    exact, estimate, other = HashedSet(), HyperLogLog(), HyperLogLog()
+    exact.update(names)
+    estimate.update(names[:50000])
+    other.update(names[50000:])
+    estimate.merge(other)
+
+    assert len(exact) == 60000
+    assert abs(len(estimate) - 60000) < 60000 * 0.03
+    # small counts fall back to linear counting, which is close to exact
+    small = HyperLogLog()
+    small.update(["curl", "kernel", "curl"])
+    assert len(small) == 2
+
+
+def test_completion_index_partial_kinds(tmp_path, monkeypatch):
+    completion_index = index.CompletionIndex(str(tmp_path))
+    completion_index.write("component_names", ["curl", "kernel"])
+    completion_index.write("component_purls", ["pkg:rpm/redhat/curl@8.0"])
+    completion_index.save_meta({"components": time.time()})
+    monkeypatch.setattr(index, "completion_index", completion_index)
+
+    assert index.complete("component_names", "cu") == ["curl"]
+    assert index.complete("component_names", "zlib") == []
+    assert index.complete("component_purls", "pkg:rpm/redhat/curl") == ["pkg:rpm/redhat/curl@8.0"]
+    # purls of other than latest components are not indexed, fall back to the live lookup
+    assert index.complete("component_purls", "pkg:rpm/redhat/zlib") is None
+    assert index.complete("cve_ids", "CVE-") is None
+
+
+def test_request_plan_deduplication():
+    sent = []
+    ledger = FetchLedger()
+
+    def fetch(request):
+        assert ledger.claim(request)
+        sent.append(request)
+        return request.kwargs()
+
+    # two queries of the same params over overlapping ranges, params order does not matter
+    first = RequestPlan.for_range({"name": "curl", "type": "RPM"}, 0, 300, 100)
+    second = RequestPlan.for_range({"type": "RPM", "name": "curl"}, 100, 500, 100)
+    other = RequestPlan.for_range({"name": "wget"}, 0, 100, 100)
+    plan = RequestPlan([*first, *second, *other])
+    assert len(plan) == 6
+    assert plan.stop == 500
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        pages = [future.result() for _, future in plan.execute(fetch, executor)]
+    assert len(sent) == len(set(sent)) == 6
+    assert [(page["offset"], page["name"]) for page in pages] == [
+        (0, "curl"),
+        (100, "curl"),
+        (200, "curl"),
+        (300, "curl"),
+        (400, "curl"),
+        (0, "wget"),
+    ]
+    # a request already fetched is not claimed again
+    assert not ledger.claim(first.requests[0])
+    assert len(ledger) == 6
+
+
+def test_paginator_page_size():
+    requested = []
+
+    def retrieve_list(offset, limit):
+        requested.append((offset, limit))
+        rows = [{"n": n, "pad": "x" * 90} for n in range(offset, min(offset + limit, 1000))]
+        return {"count": 1000, "results": rows}
+
+    paginator = Paginator(
+        retrieve_list, page_size=50, min_page_size=10, max_page_size=400, max_page_bytes=20000
+    )
+    assert [row["n"] for row in paginator.results()] == list(range(1000))
+    # fast pages are sized up to the payload bound
+    assert requested[0] == (0, 50)
+    assert {limit for _, limit in requested[1:-1]} == {20000 // paginator.row_bytes}
+
+    # and down to the target latency once rows get slow, within min/max page size
+    paginator.row_bytes = None
+    paginator.row_latency = 0.01
+    assert paginator.next_page_size() == 200
+    paginator.measure(list(range(10)), 1.0)
+    assert paginator.row_latency == pytest.approx(0.7 * 0.01 + 0.3 * 0.1)
+    paginator.row_latency = 1.0
+    assert paginator.next_page_size() == 10
+    paginator.row_latency = 0.0001
+    assert paginator.next_page_size() == 400
+
+
+def test_paginator_order():
+    fetched_by = set()
+
+    def retrieve_list(offset, limit):
+        # later pages return first
+        time.sleep((80 - offset) / 4000)
+        fetched_by.add(threading.current_thread().name.split("_")[0])
+        return {"count": 80, "results": list(range(offset, min(offset + limit, 80)))}
+
+    with concurrent.futures.ThreadPoolExecutor(thread_name_prefix="pages") as executor:
+        paginator = Paginator(
+            retrieve_list,
+            page_size=10,
+            min_page_size=10,
+            max_page_size=10,
+            max_in_flight=4,
+            executor=executor,
+        )
+        pages = list(paginator)
+    assert pages == [list(range(offset, offset + 10)) for offset in range(0, 80, 10)]
+    # the first page probes the count, the following ones are fetched by the executor
+    assert fetched_by == {"MainThread", "pages"}
+    assert len(paginator.ledger) == 8
+
+
+def test_paginator_capped_pages():
+    requested = []
+
+    def retrieve_list(offset, limit):
+        requested.append((offset, limit))
+        # the server caps pages at 40 rows, except for the first one
+        limit = limit if offset == 0 else min(limit, 40)
+        return {"count": 300, "results": list(range(offset, min(offset + limit, 300)))}
+
+    paginator = Paginator(retrieve_list, page_size=50, min_page_size=10, max_page_size=100)
+    assert paginator.results() == list(range(300))
+    # rows missing from capped pages are filled in at the capped size
+    assert paginator.max_page_size == 40
+    assert sorted(requested) == [
+        (0, 50),
+        (50, 100),
+        (90, 40),
+        (130, 20),
+        (150, 100),
+        (190, 40),
+        (230, 20),
+        (250, 100),
+        (290, 10),
+    ]
+
+
+def http_error(status, reason):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(reason, response=response)
+
+
+def test_paginator_retries(monkeypatch):
+    monkeypatch.setattr("griffon.services.pagination.RETRY_BACKOFF", 0)
+    attempts = []
+
+    def retrieve_list(offset, limit):
+        attempts.append(offset)
+        raise failure
+
+    # client errors fail the same way again and are raised at once
+    failure = http_error(400, "bad request")
+    with pytest.raises(PageError, match="offset=0 limit=50 failed: bad request"):
+        Paginator(retrieve_list, page_size=50).results()
+    assert len(attempts) == 1
+    # statuses retried by the transport of the pooled session are not retried again
+    attempts.clear()
+    failure = requests.exceptions.RetryError("too many 503 error responses")
+    with pytest.raises(PageError):
+        Paginator(retrieve_list, page_size=50).results()
+    assert len(attempts) == 1
+    # other server errors and connection failures are
+    for failure in [http_error(500, "server error"), requests.ConnectTimeout("timed out")]:
+        attempts.clear()
+        paginator = Paginator(retrieve_list, page_size=50)
+        with pytest.raises(PageError, match="after 3 retries"):
+            paginator.results()
+        assert len(attempts) == paginator.retries + 1
+
+
+def test_paginator_failed_page(monkeypatch):
+    monkeypatch.setattr("griffon.services.pagination.RETRY_BACKOFF", 0)
+    attempts = []
+
+    def retrieve_list(offset, limit):
+        attempts.append(offset)
+        if offset == 100:
+            raise ConnectionError("reset by peer")
+        return {"count": 250, "results": list(range(offset, min(offset + limit, 250)))}
+
+    page_timings = Timings()
+    page_timings.enable()
+    monkeypatch.setattr("griffon.services.pagination.timings", page_timings)
+    paginator = Paginator(
+        retrieve_list, page_size=50, min_page_size=50, max_page_size=50, endpoint="osidb"
+    )
+    # totals of partial results would be wrong, a page failing after retries raises
+    with pytest.raises(PageError, match="offset=100"):
+        paginator.results()
+    assert attempts.count(100) == paginator.retries + 1
+    # pages fetched again are not counted as transport retries
+    counters = page_timings.report()["stages"]["http osidb"]
+    assert (counters["page_retries"], counters["retries"]) == (paginator.retries, 0)
+
+
+def test_paginator_failed_first_page(monkeypatch):
+    monkeypatch.setattr("griffon.services.pagination.RETRY_BACKOFF", 0)
+
+    def retrieve_list(offset, limit):
+        raise ConnectionError("connection refused")
+
+    group = LazyGroup(name="griffon")
+
+    @group.command()
+    def report():
+        Paginator(retrieve_list).results()
+
+    with pytest.raises(PageError, match="offset=0"):
+        Paginator(retrieve_list).results()
+    # commands fail with a clean error instead of a traceback
+    result = CliRunner().invoke(group, ["report"])
+    assert result.exit_code == 1
+    assert "Error: page offset=0" in result.output
+    assert "Traceback" not in result.output